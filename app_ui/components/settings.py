@@ -21,10 +21,10 @@ def create_settings_section(app):
         with ui.column().classes('w-full gap-4 p-2'):
             ui.label('Wybierz silnik (backend):').classes('text-gray-600')
             
-            # Backend buttons
+            # Backend buttons (snapshot z tła - przed sondowaniem bez znaczników instalacji)
             backends_info = {}
             if app.transcriber_manager:
-                for b in app.transcriber_manager.get_available_backends():
+                for b in app.transcriber_manager.get_availability_snapshot() or []:
                     backends_info[b.type.value] = b
 
             backend_options = [
@@ -12,6 +12,7 @@ from nicegui import ui
 
 from core.models import Visit, Patient, VisitStatus
 from core.services.visit_service import get_visit_service
+from core.services.visit_draft_service import VisitDraftService
 from core.llm_service import LLMService
 from core.config_manager import ConfigManager
 
@@ -26,7 +27,8 @@ class VisitSaveDialog:
         procedures: List[Dict],
         model_used: str = "",
         existing_visit: Optional[Visit] = None,
-        on_save: Optional[Callable[[Visit], None]] = None
+        on_save: Optional[Callable[[Visit], None]] = None,
+        draft_service: Optional[VisitDraftService] = None
     ):
         self.transcript = transcript
         self.diagnoses = diagnoses
@@ -36,6 +38,7 @@ class VisitSaveDialog:
         self.on_save = on_save
 
         self.visit_service = get_visit_service()
+        self.draft_service = draft_service   # Szkice tej wizyty (None - bez szkicu)
         self.llm_service = LLMService()
         self.config_manager = ConfigManager()
         self.dialog = None
@@ -109,24 +112,44 @@ class VisitSaveDialog:
         self.soap_prefill_btn = None
         self.soap_spinner = None
         self.soap_model_label = None
+        self.save_btn = None
+        self._saving = False
         self._client = None
 
     def open(self) -> None:
-        """Otwiera dialog."""
-        with ui.dialog() as self.dialog, ui.card().classes('w-full max-w-lg'):
-            self._create_content()
-
+        """Otwiera dialog (po wczytaniu pacjentów z bazy w tle)."""
         # Capture client context for async UI updates
         self._client = ui.context.client
-        self._apply_initial_state()
-        self.dialog.open()
+        asyncio.create_task(self._open())
+
+    async def _open(self) -> None:
+        # Odczyt bazy w wątku roboczym - wolny dysk (np. udział sieciowy)
+        # nie blokuje pętli zdarzeń UI
+        recent_patients: List[Patient] = []
+        selected_patient: Optional[Patient] = None
+        try:
+            recent_patients = await self.visit_service.get_recent_patients_async(limit=10)
+            if self.selected_patient_id:
+                selected_patient = await self.visit_service.get_patient_async(self.selected_patient_id)
+        except Exception as e:
+            print(f"[VISIT] Patient list load error: {e}", flush=True)
+
+        with self._client:
+            with ui.dialog() as self.dialog, ui.card().classes('w-full max-w-lg'):
+                self._create_content(recent_patients, selected_patient)
+            self._apply_initial_state(selected_patient)
+            self.dialog.open()
+
+        # Nowa wizyta: pokaż szkic SOAP policzony w tle podczas wywiadu
+        if not self.existing_visit and not self._has_soap_content():
+            asyncio.create_task(self._prefill_soap(from_draft_only=True))
 
     def close(self) -> None:
         """Zamyka dialog."""
         if self.dialog:
             self.dialog.close()
 
-    def _create_content(self) -> None:
+    def _create_content(self, recent_patients: List[Patient], selected_patient: Optional[Patient]) -> None:
         """Tworzy zawartość dialogu."""
         ui.label('Zapisz wizytę').classes('text-xl font-bold')
         ui.separator()
@@ -135,15 +158,12 @@ class VisitSaveDialog:
         ui.label('Pacjent').classes('font-bold mt-2')
 
         # Wybór istniejącego pacjenta
-        recent_patients = self.visit_service.get_recent_patients(limit=10)
         patient_options = {
             0: '-- Nowy pacjent --',
             **{p.id: p.display_name for p in recent_patients}
         }
-        if self.selected_patient_id and self.selected_patient_id not in patient_options:
-            existing_patient = self.visit_service.patient_repo.get_by_id(self.selected_patient_id)
-            if existing_patient:
-                patient_options[self.selected_patient_id] = existing_patient.display_name
+        if selected_patient and selected_patient.id not in patient_options:
+            patient_options[selected_patient.id] = selected_patient.display_name
 
         self.patient_select = ui.select(
             label='Wybierz pacjenta',
@@ -293,13 +313,13 @@ class VisitSaveDialog:
         ui.separator().classes('mt-4')
         with ui.row().classes('w-full justify-end gap-2'):
             ui.button('Anuluj', on_click=self.close).props('flat')
-            ui.button(
+            self.save_btn = ui.button(
                 'Zapisz wizytę',
                 icon='save',
                 on_click=self._save_visit
             ).props('color=primary')
 
-    def _on_patient_select_change(self, patient_id: int) -> None:
+    async def _on_patient_select_change(self, patient_id: int) -> None:
         """Obsługa zmiany wybranego pacjenta."""
         if patient_id == 0:
             # Nowy pacjent
@@ -310,7 +330,9 @@ class VisitSaveDialog:
         else:
             # Istniejący pacjent
             self.selected_patient_id = patient_id
-            patient = self.visit_service.patient_repo.get_by_id(patient_id)
+            patient = await self.visit_service.get_patient_async(patient_id)
+            if self.selected_patient_id != patient_id:
+                return  # W międzyczasie wybrano innego pacjenta
             if patient:
                 self._set_patient_fields_from_patient(patient, overwrite=True)
             if self.patient_name_input:
@@ -364,14 +386,13 @@ class VisitSaveDialog:
             self.patient_email_input.value = self.patient_email
             self.patient_email_input.update()
 
-    def _apply_initial_state(self) -> None:
+    def _apply_initial_state(self, patient: Optional[Patient]) -> None:
         """Ustawia stan formularza po wyrenderowaniu."""
         if self.patient_select:
             self.patient_select.value = self.selected_patient_id or 0
             self.patient_select.update()
 
         if self.selected_patient_id:
-            patient = self.visit_service.patient_repo.get_by_id(self.selected_patient_id)
             if patient:
                 # Uzupelnij brakujace pola z kartoteki pacjenta
                 self._set_patient_fields_from_patient(patient, overwrite=False)
@@ -427,12 +448,20 @@ class VisitSaveDialog:
             self.soap_model_label.text = f"Model: {model_used}" if model_used else ""
             self.soap_model_label.update()
 
+    def _has_soap_content(self) -> bool:
+        return any((getattr(self, f) or "").strip() for f in ("subjective", "objective", "assessment", "plan"))
+
     def _prefill_soap_clicked(self) -> None:
         asyncio.create_task(self._prefill_soap())
 
-    async def _prefill_soap(self) -> None:
+    async def _prefill_soap(self, from_draft_only: bool = False) -> None:
+        """
+        Wypełnia SOAP: gotowy szkic z tła (od razu) + przebieg delta tylko
+        dla tekstu, który przybył po szkicu. Bez szkicu - pełne generowanie
+        (chyba że from_draft_only, czyli automatycznie przy otwarciu).
+        """
         if not self.transcript.strip():
-            if self._client:
+            if self._client and not from_draft_only:
                 with self._client:
                     ui.notify('Brak transkrypcji do analizy', type='warning')
             return
@@ -441,11 +470,28 @@ class VisitSaveDialog:
             with self._client:
                 self._set_soap_loading(True)
         try:
+            # Trwa ostatni przebieg szkicu (po zakończeniu wywiadu) - poczekaj na niego
+            draft, draft_model, remainder = {}, "", self.transcript
+            if self.draft_service is not None:
+                await self.draft_service.wait_idle(timeout=60)
+                draft, draft_model, remainder = self.draft_service.soap_for(self.transcript)
+            if draft and self._client:
+                with self._client:
+                    self._apply_soap_result(draft, draft_model)
+            # Szkice z tła liczone są bez rozpoznań i procedur - wybrane kody
+            # trzeba jeszcze wnieść do oceny i planu (przebieg aktualizujący)
+            codes_pending = bool(self.diagnoses or self.procedures)
+            if draft and not remainder and not codes_pending:
+                return
+            if not draft and from_draft_only:
+                return
+
             result, used_model = await self.llm_service.generate_soap(
-                transcript=self.transcript,
+                transcript=remainder if draft else self.transcript,
                 config=self.config_manager,
                 diagnoses=self.diagnoses,
                 procedures=self.procedures,
+                previous=draft or None,
             )
             if not isinstance(result, dict):
                 if self._client:
@@ -539,8 +585,8 @@ class VisitSaveDialog:
 
         return True
 
-    def _save_visit(self) -> None:
-        """Zapisuje wizytę."""
+    async def _save_visit(self) -> None:
+        """Zapisuje wizytę (w tle, przez kolejkę zapisów)."""
         # Walidacja
         if not self.selected_patient_id and not self.patient_name.strip():
             ui.notify('Podaj nazwę pacjenta', type='warning')
@@ -548,41 +594,31 @@ class VisitSaveDialog:
         if not self._validate_patient_fields():
             return
 
+        if self._saving:
+            return
+        self._saving = True
+        client = self._client
+        if self.save_btn:
+            self.save_btn.props('loading')
+
         try:
-            # Utwórz lub pobierz pacjenta
-            patient_id = self.selected_patient_id
-            patient_name = self.patient_name.strip()
-
-            if not patient_id and patient_name:
-                patient = self.visit_service.get_or_create_patient(
-                    display_name=patient_name,
-                    identifier=self.patient_identifier.strip(),
-                    birth_date=self.patient_birth_date.strip(),
-                    sex=self.patient_sex.strip(),
-                    address=self.patient_address.strip(),
-                    phone=self.patient_phone.strip(),
-                    email=self.patient_email.strip(),
-                )
-                patient_id = patient.id
-                patient_name = patient.display_name
-
-            # Zapisz wizytę
             status = VisitStatus.COMPLETED if self.save_as_completed else VisitStatus.DRAFT
 
-            visit = self.visit_service.save_visit(
+            # Pacjent (get_or_create) jest obsługiwany w save_visit - w wątku zapisującym
+            visit = await self.visit_service.save_visit_async(
                 transcript=self.transcript,
                 diagnoses=self.diagnoses,
                 procedures=self.procedures,
                 model_used=self.model_used,
                 visit_id=self.existing_visit.id if self.existing_visit else None,
-                patient_name=patient_name,
+                patient_name=self.patient_name.strip(),
                 patient_identifier=self.patient_identifier.strip(),
                 patient_birth_date=self.patient_birth_date.strip(),
                 patient_sex=self.patient_sex.strip(),
                 patient_address=self.patient_address.strip(),
                 patient_phone=self.patient_phone.strip(),
                 patient_email=self.patient_email.strip(),
-                patient_id=patient_id,
+                patient_id=self.selected_patient_id,
                 status=status,
                 visit_date=self.visit_date,
                 subjective=self.subjective.strip(),
@@ -598,19 +634,27 @@ class VisitSaveDialog:
                 additional_notes=self.additional_notes.strip()
             )
 
-            visit_id = getattr(visit, 'id', None)
-            if visit_id:
-                ui.notify(f'Wizyta zapisana: {visit_id[:8]}...', type='positive')
-            else:
-                ui.notify('Wizyta zapisana!', type='positive')
+            if client:
+                with client:
+                    visit_id = getattr(visit, 'id', None)
+                    if visit_id:
+                        ui.notify(f'Wizyta zapisana: {visit_id[:8]}...', type='positive')
+                    else:
+                        ui.notify('Wizyta zapisana!', type='positive')
 
-            if self.on_save:
-                self.on_save(visit)
+                    if self.on_save:
+                        self.on_save(visit)
 
-            self.close()
+                    self.close()
 
         except Exception as e:
-            ui.notify(f'Błąd zapisu: {e}', type='negative')
+            if client:
+                with client:
+                    ui.notify(f'Błąd zapisu: {e}', type='negative')
+        finally:
+            self._saving = False
+            if self.save_btn:
+                self.save_btn.props(remove='loading')
 
 
 def open_save_visit_dialog(
@@ -619,7 +663,8 @@ def open_save_visit_dialog(
     procedures: List[Dict],
     model_used: str = "",
     existing_visit: Optional[Visit] = None,
-    on_save: Optional[Callable[[Visit], None]] = None
+    on_save: Optional[Callable[[Visit], None]] = None,
+    draft_service: Optional[VisitDraftService] = None
 ) -> VisitSaveDialog:
     """
     Otwiera dialog zapisywania wizyty.
@@ -630,6 +675,7 @@ def open_save_visit_dialog(
         procedures: Lista procedur (format z AG-Grid)
         model_used: Nazwa użytego modelu AI
         on_save: Callback po zapisie
+        draft_service: Szkice SOAP/ICD tej wizyty (z widoku Live / ekranu głównego)
 
     Returns:
         Instancja dialogu
@@ -640,7 +686,8 @@ def open_save_visit_dialog(
         procedures=procedures,
         model_used=model_used,
         existing_visit=existing_visit,
-        on_save=on_save
+        on_save=on_save,
+        draft_service=draft_service
     )
     dialog.open()
     return dialog
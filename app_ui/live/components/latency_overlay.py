@@ -0,0 +1,99 @@
+"""
+Latency Overlay Component
+Nakładka deweloperska z p50/p95 per etap pipeline'u (core.latency_trace).
+
+Widoczna tylko przy włączonym śledzeniu (--trace-latency albo
+WYWIAD_TRACE_LATENCY=1). Odświeżana heartbeatem UIUpdateScheduler.
+"""
+
+import asyncio
+from typing import Dict, List, Optional
+
+from nicegui import ui
+
+from core import latency_trace
+
+
+STAGE_LABELS = {
+    "capture": "Capture (blok audio)",
+    "queue_wait": "Kolejka audio",
+    "decode.provisional": "Decode provisional",
+    "decode.improved": "Decode improved",
+    "decode.final": "Decode final",
+    "hallucination_filter": "Filtr halucynacji",
+    "state_update": "LiveState update",
+    "audio_to_text": "Audio → tekst",
+    "render_wait": "Oczekiwanie na render",
+    "render_flush": "Render flush",
+    "llm_first_card": "LLM → pierwsza karta",
+    "llm_regen": "Regeneracja LLM",
+    "llm_validation": "Walidacja segmentu",
+}
+
+
+class LatencyOverlay:
+    """Pływająca tabelka opóźnień (p50/p95/max w ms) z eksportem Chrome trace."""
+
+    COLUMNS = [
+        {"name": "stage", "label": "Etap", "field": "stage", "align": "left"},
+        {"name": "count", "label": "n", "field": "count", "align": "right"},
+        {"name": "p50", "label": "p50 ms", "field": "p50", "align": "right"},
+        {"name": "p95", "label": "p95 ms", "field": "p95", "align": "right"},
+        {"name": "max", "label": "max ms", "field": "max", "align": "right"},
+    ]
+
+    def __init__(self):
+        self.container = None
+        self.table = None
+        self._signature: Optional[tuple] = None
+
+    def create(self) -> ui.card:
+        """Tworzy nakładkę (prawy dolny róg)."""
+        with ui.card().classes(
+            'fixed bottom-20 right-4 z-50 p-2 gap-1 '
+            'bg-white/90 border border-slate-200 shadow-lg text-xs'
+        ) as self.container:
+            with ui.row().classes('w-full items-center justify-between gap-2'):
+                ui.label('Latency trace').classes('text-xs font-semibold text-slate-700')
+                with ui.row().classes('items-center gap-1'):
+                    ui.button(icon='delete_sweep', on_click=self._clear).props('flat dense round size=sm').tooltip('Wyczyść bufor')
+                    ui.button(icon='download', on_click=self._export).props('flat dense round size=sm').tooltip('Eksport Chrome trace')
+            self.table = ui.table(columns=self.COLUMNS, rows=[], row_key='stage').props('dense flat hide-bottom')
+        return self.container
+
+    def update(self) -> None:
+        """Przelicza statystyki z bufora (render pomija niezmienione dane)."""
+        if not self.table:
+            return
+        rows = self._rows(latency_trace.stage_stats())
+        signature = tuple(tuple(r.values()) for r in rows)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        self.table.rows = rows
+        self.table.update()
+
+    @staticmethod
+    def _rows(stats: Dict[str, Dict[str, float]]) -> List[Dict]:
+        return [
+            {
+                "stage": STAGE_LABELS.get(stage, stage),
+                "count": item["count"],
+                "p50": f'{item["p50_ms"]:.1f}',
+                "p95": f'{item["p95_ms"]:.1f}',
+                "max": f'{item["max_ms"]:.1f}',
+            }
+            for stage, item in stats.items()
+        ]
+
+    def _clear(self) -> None:
+        latency_trace.clear()
+        self._signature = None
+        self.update()
+
+    async def _export(self) -> None:
+        try:
+            path = await asyncio.to_thread(latency_trace.export_chrome_trace)
+            ui.notify(f'Zapisano {path.name} (chrome://tracing, ui.perfetto.dev)', type='positive')
+        except Exception as e:
+            ui.notify(f'Błąd eksportu: {e}', type='negative')
@@ -53,6 +53,7 @@ from app_ui.live.ui_labels import (
 if TYPE_CHECKING:
 
     from app_ui.live.live_state import LiveState, SessionStatus, PrompterMode
+    from app_ui.live.ui_scheduler import UIUpdateScheduler
 
 
 
@@ -84,7 +85,8 @@ class PrompterPanel:
         on_new_pool: Optional[Callable[[], None]] = None,
         on_cards_mode_change: Optional[Callable[[str], None]] = None,
         on_card_click: Optional[Callable[[object], None]] = None,
-        show_record_button: bool = True
+        show_record_button: bool = True,
+        scheduler: Optional['UIUpdateScheduler'] = None
     ):
         self.state = state
         self.app_instance = app_instance
@@ -95,6 +97,8 @@ class PrompterPanel:
         self.on_cards_mode_change = on_cards_mode_change
         self.on_card_click = on_card_click
         self.show_record_button = show_record_button
+        # Opcjonalny scheduler klatek - zastępuje polling co 0.3s
+        self._scheduler = scheduler
 
 
         # UI refs
@@ -183,9 +187,12 @@ class PrompterPanel:
 
 
 
-        # UI-safe refresh timer (flushes background updates on UI thread)
+        # UI-safe refresh: scheduler (najbliższa klatka) lub timer pollingowy
 
-        self._refresh_timer = ui.timer(0.3, self._flush_refresh)
+        if self._scheduler:
+            self._scheduler.register("prompter", self._flush_refresh)
+        else:
+            self._refresh_timer = ui.timer(0.3, self._flush_refresh)
 
 
 
@@ -697,7 +704,8 @@ class PrompterPanel:
 
                             else:
 
-                                PlaceholderCard("Szukam więcej...", tilt_index=idx).create()
+                                # Karty w trakcie strumieniowania - kolejne jeszcze się generują
+                                PlaceholderCard("Generuję..." if self._is_loading else "Szukam więcej...", tilt_index=idx).create()
 
 
 
@@ -999,7 +1007,7 @@ class PrompterPanel:
 
         # Sugestie przychodza z AI controller ktory dziala async
 
-        self._needs_refresh = True
+        self.refresh()
 
 
 
@@ -1115,6 +1123,8 @@ class PrompterPanel:
         """Wymusza przerysowanie UI w bezpiecznym kontekście klienta."""
 
         self._needs_refresh = True
+        if self._scheduler:
+            self._scheduler.mark_dirty("prompter")
 
 
 
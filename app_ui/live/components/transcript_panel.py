@@ -16,6 +16,51 @@ from app_ui.live.components.diff_engine import DiffEngine, WordToken, WordStatus
 
 if TYPE_CHECKING:
     from app_ui.live.live_state import LiveState
+    from app_ui.live.state.transcript_rope import TranscriptRope
+    from app_ui.live.ui_scheduler import UIUpdateScheduler
+
+
+# Klient: stosuje operacje przyrostowego renderu (sekcje: empty, validated, final, tail)
+TRANSCRIPT_PATCH_JS = '''
+<script>
+window.transcriptPatch = function(prefix, scrollId, ops) {
+    for (const op of ops) {
+        const el = document.getElementById(prefix + '-' + op[1]);
+        if (op[0] === 'tail') {
+            const tail = document.getElementById(prefix + '-tail');
+            if (!tail) continue;
+            const keep = op[1];
+            const words = tail.getElementsByClassName('transcript-word');
+            if (keep === 0) {
+                tail.innerHTML = op[2];
+                continue;
+            }
+            if (keep < words.length) {
+                let node = words[keep];
+                while (node) { const next = node.nextSibling; node.remove(); node = next; }
+            }
+            tail.insertAdjacentHTML('beforeend', op[2]);
+            continue;
+        }
+        if (!el) continue;
+        if (op[0] === 'append') {
+            el.insertAdjacentHTML('beforeend', op[2]);
+        } else if (op[0] === 'extend') {
+            const seg = el.lastElementChild;
+            const word = seg && seg.lastElementChild;
+            if (word) word.textContent += op[2];
+        } else if (op[0] === 'replace') {
+            el.innerHTML = op[2];
+        } else if (op[0] === 'clear') {
+            el.innerHTML = '';
+        }
+    }
+    const scroll = document.getElementById(scrollId);
+    const container = scroll && scroll.querySelector('.q-scrollarea__container');
+    if (container) container.scrollTop = container.scrollHeight;
+};
+</script>
+'''
 
 
 @dataclass
@@ -42,9 +87,13 @@ class TranscriptPanel:
     SHIMMER_DURATION = 1500
     # Opóźnienie przed usunięciem klasy animacji (ms)
     SETTLE_DELAY = 300
+    # Budżet rozmiaru pojedynczej aktualizacji DOM (bajty)
+    PATCH_BYTE_BUDGET = 4096
 
-    def __init__(self, state: 'LiveState'):
+    def __init__(self, state: 'LiveState', scheduler: Optional['UIUpdateScheduler'] = None):
         self.state = state
+        # Opcjonalny scheduler - scala serie powiadomień w jeden render na klatkę
+        self._scheduler = scheduler
         self.container = None
         self.html_element = None
         self._scroll_id = None
@@ -58,7 +107,27 @@ class TranscriptPanel:
         self._prev_provisional = ""
         self._prev_improved = ""
         self._prev_final = ""
-        self._last_non_empty_html = ""
+
+        # Render przyrostowy: co już jest w DOM (sekcje append-only + ogon)
+        self._dom_prefix = f"transcript-{id(self)}"
+        self._skeleton_ready = False
+        self._diarized_view = False
+        self._placeholder_visible = False
+        # Znacznik (generation, liczba segmentów) warstw LiveState w DOM
+        self._rendered = {"validated": (-1, 0), "final": (-1, 0)}
+        self._tail_words: Optional[List[str]] = None
+        self._animated_sections: set = set()
+        self._segment_seq = 0
+
+        # Metryka: bajty wysłane na aktualizację
+        self.render_stats = {
+            "updates": 0,
+            "full_renders": 0,
+            "bytes_last": 0,
+            "bytes_max": 0,
+            "bytes_total": 0,
+            "over_budget": 0,
+        }
 
         # Stan animacji
         self._is_animating = False
@@ -69,6 +138,7 @@ class TranscriptPanel:
 
         # Wstrzyknij style CSS
         inject_shimmer_styles()
+        ui.add_head_html(TRANSCRIPT_PATCH_JS)
 
         print(f"[TRANSCRIPT] create() called", flush=True)
 
@@ -165,6 +235,9 @@ class TranscriptPanel:
         # Capture client context
         self._client = ui.context.client
 
+        if self._scheduler:
+            self._scheduler.register("transcript", self._flush_render)
+
         # Subscribe to state changes
         self.state.on_transcript_change(self._on_state_change)
         self.state.on_diarization_change(self._on_diarization_change)
@@ -333,10 +406,13 @@ class TranscriptPanel:
         if self._client is None:
             return
 
+        if self._scheduler:
+            self._scheduler.mark_dirty("transcript")
+            return
+
         try:
             with self._client:
                 self._render()
-                self._auto_scroll()
         except Exception as e:
             print(f"[TRANSCRIPT] Diarization render error: {e}", flush=True)
 
@@ -345,20 +421,36 @@ class TranscriptPanel:
         if self._client is None:
             return
 
-        # Jeśli animacja w toku - nie renderuj (animacja sama zarządza renderem)
-        if self._is_animating:
-            if self.state.validated_text and not self.state.final_text and not self.state.provisional_text:
-                pass
-            else:
-                return
+        if self._scheduler:
+            # Render w najbliższej klatce (kilka zmian stanu = jeden patch)
+            self._scheduler.mark_dirty("transcript")
+            return
+
+        if self._animation_blocks_render():
+            return
 
         try:
             with self._client:
                 self._render()
-                self._auto_scroll()
         except Exception as e:
             print(f"[TRANSCRIPT] Render error: {e}", flush=True)
 
+    def _animation_blocks_render(self) -> bool:
+        """Jeśli animacja w toku - nie renderuj (animacja sama zarządza renderem)."""
+        if not self._is_animating:
+            return False
+        return not (
+            self.state.validated_rope
+            and not self.state.final_rope
+            and not self.state.provisional_text
+        )
+
+    def _flush_render(self):
+        """Render wywoływany przez scheduler (event loop, kontekst klienta)."""
+        if self._animation_blocks_render():
+            return
+        self._render()
+
     def trigger_regeneration_animation(self, layer: str = "improved", prev_text: str = ""):
         """
         Triggeruje animację regeneracji dla danej warstwy.
@@ -382,7 +474,6 @@ class TranscriptPanel:
 
                 self._update_regen_indicator(True)
                 self._render_with_animation(layer)
-                self._auto_scroll()
 
                 # Zaplanuj zakończenie animacji (thread-safe timer)
                 # Anuluj poprzedni timer jeśli istnieje
@@ -429,98 +520,233 @@ class TranscriptPanel:
         self._regen_indicator.update()
 
     def _render(self):
-        """Renderuje transkrypcję (bez animacji)."""
+        """Renderuje transkrypcję (bez animacji) - przyrostowo."""
         if not self.html_element:
             return
-
-        html_content = self._build_html(animate=False)
-        self.html_element.content = html_content
-        self.html_element.update()
+        self._patch()
 
     def _render_with_animation(self, layer: str):
         """Renderuje z animacją shimmer na zmienonych słowach."""
         if not self.html_element:
             return
+        self._patch(animate_layer=layer)
 
-        html_content = self._build_html(animate=True, animate_layer=layer)
-        self.html_element.content = html_content
-        self.html_element.update()
+    # === INCREMENTAL RENDERING ===
+    #
+    # DOM: [validated: bloki dopisywane raz] [final: bloki do walidacji] [tail: provisional]
+    # Validated i final są listami segmentów append-only (TranscriptRope) - do DOM
+    # trafiają tylko nowe segmenty, diff liczony jest wyłącznie dla ogona provisional.
 
-    def _build_html(self, animate: bool = False, animate_layer: str = "improved") -> str:
-        """Buduje HTML z tokenami słów."""
-        # Jeśli diaryzacja włączona i ma dane - użyj specjalnego renderingu
-        if (self.state.diarization and
-            self.state.diarization.enabled and
-            self.state.diarization.has_data):
+    def _section_id(self, section: str) -> str:
+        return f"{self._dom_prefix}-{section}"
+
+    def _patch(self, animate_layer: Optional[str] = None) -> None:
+        """Wylicza operacje DOM dla zmian od ostatniego renderu i wysyła je."""
+        state = self.state
+
+        # Diaryzacja - osobny widok (rzadka zmiana) - pełny render
+        if state.diarization and state.diarization.enabled and state.diarization.has_data:
             content = self._render_diarized()
-            if content:
-                self._last_non_empty_html = content
-                return content
+            self._full_render(content, diarized=True)
+            return
 
-        html_parts = []
+        if self._diarized_view or not self._skeleton_ready:
+            self._full_render()
+            return
 
-        # 1. Validated text - zawsze statyczny
-        if self.state.validated_text:
-            tokens = self._tokenize_simple(self.state.validated_text)
-            html_parts.append(self._render_tokens(tokens, "validated", False))
-
-        # 2. Final text
-        if self.state.final_text:
-            should_animate = animate and animate_layer == "final"
-
-            if should_animate:
-                # Dla final - diff z poprzednim provisional (który został sfinalizowany)
-                prev = self._prev_final if self._prev_final else ""
-                tokens = DiffEngine.compute_regeneration_diff(
-                    prev,
-                    self.state.final_text,
-                    "final"
-                )
-            else:
-                tokens = self._tokenize_simple(self.state.final_text)
+        if not state.has_transcript:
+            # Zachowaj ostatnią treść (np. chwilowo pusty provisional)
+            return
 
-            html_parts.append(self._render_tokens(tokens, "final", should_animate))
+        ops: list = []
+        self._append_ops("validated", state.validated_rope, ops)
+
+        final_rope = state.final_rope
+        if animate_layer == "final" and final_rope:
+            prev = self._prev_final if self._prev_final else ""
+            tokens = DiffEngine.compute_regeneration_diff(prev, final_rope.text, "final")
+            ops.append(["replace", "final", self._render_tokens(tokens, "final", True)])
+            self._rendered["final"] = (final_rope.generation, len(final_rope))
+            self._animated_sections.add("final")
+        elif "final" in self._animated_sections:
+            ops.append(["replace", "final", self._render_block(final_rope.text, "final")])
+            self._rendered["final"] = (final_rope.generation, len(final_rope))
+            self._animated_sections.discard("final")
+            self._prev_final = final_rope.text
+        else:
+            self._append_ops("final", final_rope, ops)
+            if not animate_layer:
+                self._prev_final = final_rope.text
+
+        self._tail_ops(state.provisional_text, animate_layer == "improved", ops)
+        if not animate_layer:
+            self._prev_provisional = state.provisional_text
+
+        if self._placeholder_visible:
+            ops.insert(0, ["clear", "empty"])
+            self._placeholder_visible = False
+
+        if ops:
+            self._send_ops(ops)
+
+    def _append_ops(self, section: str, rope: 'TranscriptRope', ops: list) -> None:
+        """Dopisuje segmenty warstwy, które nie są jeszcze w DOM."""
+        mark = (rope.generation, len(rope))
+        generation, count = self._rendered[section]
+        if mark == (generation, count):
+            return
 
-            # Aktualizuj cache po renderze
-            if not animate:
-                self._prev_final = self.state.final_text
+        if generation != rope.generation:
+            # Warstwa wyczyszczona (np. final po walidacji) - sekcja od nowa
+            ops.append(["clear", section])
+            count = 0
 
-        # 3. Provisional text (lub improved)
-        if self.state.provisional_text:
-            should_animate = animate and animate_layer == "improved"
+        delta = rope.text_since(count)
+        if count and delta and not delta[0].isspace():
+            # Doklejenie do ostatniego słowa (np. kropka separatora segmentu)
+            head, _, delta = delta.partition(" ")
+            ops.append(["extend", section, head])
 
-            if should_animate:
-                # Diff z poprzednim
-                prev = self._prev_provisional if self._prev_provisional else ""
-                tokens = DiffEngine.compute_regeneration_diff(
-                    prev,
-                    self.state.provisional_text,
-                    "improved"
-                )
-            else:
-                tokens = self._tokenize_simple(self.state.provisional_text)
+        if delta.strip():
+            ops.append(["append", section, self._render_block(delta, section)])
 
-            html_parts.append(self._render_tokens(tokens, "provisional", should_animate))
+        self._rendered[section] = mark
 
-            # Aktualizuj cache po renderze
-            if not animate:
-                self._prev_provisional = self.state.provisional_text
+    def _tail_ops(self, text: str, animate: bool, ops: list) -> None:
+        """Diff ogona provisional: wspólny prefiks zostaje, reszta podmieniana."""
+        words = DiffEngine.tokenize(text)
 
-        if html_parts:
-            content = ' '.join(html_parts)
-            self._last_non_empty_html = content
-            return content
+        if animate and words:
+            prev = self._prev_provisional if self._prev_provisional else ""
+            tokens = DiffEngine.compute_regeneration_diff(prev, text, "improved")
+            ops.append(["replace", "tail", self._render_tokens(tokens, "provisional", True)])
+            # Po animacji ogon renderowany od zera
+            self._tail_words = None
+            return
+
+        previous = self._tail_words
+        if previous == words:
+            return
 
-        if self._last_non_empty_html:
-            return self._last_non_empty_html
+        keep = 0
+        if previous is not None:
+            limit = min(len(previous), len(words))
+            while keep < limit and previous[keep] == words[keep]:
+                keep += 1
+            # Zdanie ostatniego zachowanego słowa mogło się zmienić - odśwież je
+            while keep > 0 and not self._is_sentence_end(words[keep - 1]):
+                keep -= 1
+
+        tokens = [WordToken(w, WordStatus.UNCHANGED) for w in words[keep:]]
+        ops.append(["tail", keep, self._render_words(tokens, "provisional", self._map_tokens_to_sentences(tokens))])
+        self._tail_words = words
+
+    def _render_block(self, text: str, layer: str) -> str:
+        """Renderuje niezmienny blok (segment) warstwy."""
+        tokens = self._tokenize_simple(text)
+        if not tokens:
+            return ""
+        self._segment_seq += 1
+        words_html = self._render_words(tokens, layer, self._map_tokens_to_sentences(tokens))
+        return f'<span class="transcript-segment" data-seg="{self._segment_seq}">{words_html}</span>'
 
-        return self._render_empty_state()
+    def _full_render(self, content: Optional[str] = None, diarized: bool = False) -> None:
+        """Pełny render (start, diaryzacja, niespójny stan) - wysyła cały HTML."""
+        self._diarized_view = diarized
+        self._animated_sections.clear()
+
+        if content is None:
+            content = self._build_html()
+
+        self.html_element.content = content
+        self.html_element.update()
+        self.render_stats["full_renders"] += 1
+        self._record_bytes(len(content.encode("utf-8")))
+        self._auto_scroll()
+
+    def _build_html(self) -> str:
+        """Buduje szkielet z sekcjami i bieżącą treścią (pełny render)."""
+        state = self.state
+        self._segment_seq = 0
+        self._rendered = {
+            "validated": (state.validated_rope.generation, len(state.validated_rope)),
+            "final": (state.final_rope.generation, len(state.final_rope)),
+        }
+        self._tail_words = DiffEngine.tokenize(state.provisional_text)
+        self._prev_final = state.final_text
+        self._prev_provisional = state.provisional_text
+
+        tail_tokens = [WordToken(w, WordStatus.UNCHANGED) for w in self._tail_words]
+        tail_html = self._render_words(tail_tokens, "provisional", self._map_tokens_to_sentences(tail_tokens))
+
+        self._placeholder_visible = not state.has_transcript
+        empty_html = self._render_empty_state() if self._placeholder_visible else ""
+
+        self._skeleton_ready = True
+        return (
+            f'<span id="{self._section_id("empty")}">{empty_html}</span>'
+            f'<span id="{self._section_id("validated")}">{self._render_block(state.validated_text, "validated")}</span>'
+            f'<span id="{self._section_id("final")}">{self._render_block(state.final_text, "final")}</span>'
+            f'<span id="{self._section_id("tail")}" class="transcript-segment">{tail_html}</span>'
+        )
+
+    def _send_ops(self, ops: list) -> None:
+        """Wysyła operacje DOM jednym wywołaniem JS (+ auto-scroll)."""
+        payload = json.dumps(ops, ensure_ascii=False)
+        self._record_bytes(len(payload.encode("utf-8")))
+        try:
+            ui.run_javascript(
+                f'window.transcriptPatch && window.transcriptPatch('
+                f'"{self._dom_prefix}", "{self._scroll_id}", {payload});'
+            )
+        except Exception as e:
+            print(f"[TRANSCRIPT] Patch error: {e}", flush=True)
+
+    def _record_bytes(self, size: int) -> None:
+        """Metryka rozmiaru aktualizacji względem budżetu."""
+        stats = self.render_stats
+        stats["updates"] += 1
+        stats["bytes_last"] = size
+        stats["bytes_total"] += size
+        stats["bytes_max"] = max(stats["bytes_max"], size)
+        if size > self.PATCH_BYTE_BUDGET:
+            stats["over_budget"] += 1
+            print(f"[TRANSCRIPT] Update {size} B > budget {self.PATCH_BYTE_BUDGET} B", flush=True)
 
     def _tokenize_simple(self, text: str) -> List[WordToken]:
         """Prosta tokenizacja bez diff."""
         words = DiffEngine.tokenize(text)
         return [WordToken(w, WordStatus.UNCHANGED) for w in words]
 
+    def _render_words(
+        self,
+        tokens: List[WordToken],
+        layer: str,
+        sentence_map: List[str],
+        offset: int = 0,
+        markers: bool = False
+    ) -> str:
+        """Renderuje słowa jako spany (każdy ze spacją za sobą)."""
+        words_html = []
+        for i, token in enumerate(tokens):
+            # Klasy dla samego słowa (kolor, styl)
+            classes = ["transcript-word", layer]
+            if markers:
+                # Dodatkowe markery typu zmiany (dla debugowania lub future use)
+                if token.status == WordStatus.ADDED:
+                    classes.append("added-marker")
+                elif token.status == WordStatus.MODIFIED:
+                    classes.append("modified-marker")
+            idx = offset + i
+            sentence = sentence_map[idx] if idx < len(sentence_map) else ""
+            sentence_attr = ""
+            if sentence:
+                sentence_attr = f' data-sentence="{html.escape(sentence, quote=True)}"'
+            safe_text = html.escape(token.text)
+            class_str = " ".join(classes)
+            words_html.append(f'<span class="{class_str}"{sentence_attr}>{safe_text}</span> ')
+        return "".join(words_html)
+
     def _render_tokens(
         self,
         tokens: List[WordToken],
@@ -532,40 +758,23 @@ class TranscriptPanel:
             return ""
 
         html_groups = []
-        current_group: list[tuple[WordToken, int]] = []
+        group_start = 0
         # Stan grupy: True jeśli to sekwencja zmian (ADDED/MODIFIED), False jeśli zwykły tekst
         is_regenerating_group = False
         sentence_map = self._map_tokens_to_sentences(tokens)
 
-        def flush_group():
-            if not current_group:
+        def flush_group(end: int):
+            if end <= group_start:
                 return
-            
-            # Budujemy HTML dla słów w grupie
-            words_html = []
-            for token, idx in current_group:
-                # Klasy dla samego słowa (kolor, styl)
-                classes = ["transcript-word", layer]
-                if is_regenerating_group and animate:
-                    # Dodatkowe markery typu zmiany (dla debugowania lub future use)
-                    if token.status == WordStatus.ADDED:
-                        classes.append("added-marker")
-                    elif token.status == WordStatus.MODIFIED:
-                        classes.append("modified-marker")
-                sentence = sentence_map[idx] if idx < len(sentence_map) else ""
-                sentence_attr = ""
-                if sentence:
-                    sentence_attr = f' data-sentence="{html.escape(sentence, quote=True)}"'
-                safe_text = html.escape(token.text)
-                class_str = " ".join(classes)
-                words_html.append(f'<span class="{class_str}"{sentence_attr}>{safe_text}</span>')
-            
-            content = " ".join(words_html)
-
+            regenerating = is_regenerating_group and animate
+            content = self._render_words(
+                tokens[group_start:end], layer, sentence_map,
+                offset=group_start, markers=regenerating
+            )
             # Wrapujemy w kontener sekwencji jeśli to grupa regenerowana
-            if is_regenerating_group and animate:
+            if regenerating:
                 # To jest ten "ciąg słów" z gradientem
-                html_groups.append(f'<span class="transcript-sequence regenerating">{content}</span>')
+                html_groups.append(f'<span class="transcript-sequence regenerating">{content}</span> ')
             else:
                 # Zwykły tekst bez specjalnego wrappera (chyba że dla layer)
                 html_groups.append(content)
@@ -573,25 +782,22 @@ class TranscriptPanel:
         for idx, token in enumerate(tokens):
             # Sprawdź czy token jest "aktywny" (zmieniony)
             is_token_active = token.status != WordStatus.UNCHANGED
-            
+
             # Jeśli stan się zmienił, zrzuć poprzednią grupę
             if is_token_active != is_regenerating_group:
-                flush_group()
-                current_group = []
+                flush_group(idx)
+                group_start = idx
                 is_regenerating_group = is_token_active
 
-            # Zawsze dodaj bieżący token do aktualnej grupy
-            current_group.append((token, idx))
-
         # Zrzuć ostatnią grupę
-        flush_group()
+        flush_group(len(tokens))
 
         # Wrap w segment container
         container_class = "transcript-segment"
         if animate:
             container_class += " regenerating-container" # Opcjonalne tło dla całego bloku
 
-        return f'<span class="{container_class}">{" ".join(html_groups)}</span>'
+        return f'<span class="{container_class}">{"".join(html_groups)}</span>'
 
     def _map_tokens_to_sentences(self, tokens: List[WordToken]) -> List[str]:
         """Mapuje tokeny do zdań na podstawie interpunkcji."""
@@ -739,8 +945,8 @@ class TranscriptPanel:
         self._prev_provisional = ""
         self._prev_improved = ""
         self._prev_final = ""
-        self._last_non_empty_html = ""
+        self._skeleton_ready = False
         if self.html_element:
-            self.html_element.content = ''
+            self._full_render()
         self._selected_sentence = ""
         self._hide_sentence_popup()
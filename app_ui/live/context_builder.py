@@ -0,0 +1,190 @@
+"""
+Conversation Context Builder - kontekst rozmowy dla promptów Live.
+
+Zamiast wysyłać pełny transkrypt przy każdej regeneracji, prompt dostaje:
+- krótkie podsumowanie starszej części rozmowy (odświeżane w tle co N
+  sfinalizowanych segmentów)
+- dosłowne okno ostatnich wypowiedzi
+
+Każdy typ wywołania ma stały budżet tokenów, więc rozmiar promptu (i czas
+odpowiedzi) nie rośnie z długością wizyty.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from app_ui.live.live_state import LiveState
+
+
+@dataclass(frozen=True)
+class ContextBudget:
+    """Budżet kontekstu jednego typu wywołania (w tokenach)."""
+    summary_tokens: int
+    recent_tokens: int
+
+
+class ConversationContextBuilder:
+    """
+    Buduje kontekst promptu z podsumowania i okna ostatnich wypowiedzi.
+
+    Podsumowanie obejmuje zwalidowane segmenty sprzed okna "suggestions";
+    refresh_summary() dopisuje do niego segmenty, które wypadły z okna.
+    Okno każdego typu wywołania jest dosztukowywane w dół do granicy
+    podsumowania (a bez podsumowania - do początku okna "suggestions"), ale
+    najwyżej o SUMMARY_EVERY_SEGMENTS segmentów - przy nieaktualnym
+    podsumowaniu (np. LLM nie odpowiada) luka jest akceptowana i logowana,
+    a rozmiar promptu zostaje stały.
+    """
+
+    # Przybliżenie tokenizera (tekst polski ~ 4 znaki na token)
+    CHARS_PER_TOKEN = 4
+
+    BUDGETS: Dict[str, ContextBudget] = {
+        "suggestions": ContextBudget(summary_tokens=300, recent_tokens=1200),
+        "decision": ContextBudget(summary_tokens=300, recent_tokens=1200),
+        # Krótkie okno - zwykle dosztukowane do granicy podsumowania
+        "script": ContextBudget(summary_tokens=100, recent_tokens=350),
+    }
+    # Okno, którego początek wyznacza zakres podsumowania
+    SUMMARY_WINDOW = "suggestions"
+
+    SUMMARY_EVERY_SEGMENTS = 8    # Odświeżenie po tylu sfinalizowanych segmentach
+    SUMMARY_MAX_WORDS = 120       # Limit długości podsumowania
+    SUMMARY_MAX_INPUT_CHARS = 12000  # Limit nowego tekstu w jednym odświeżeniu
+
+    def __init__(self, state: 'LiveState', llm_service=None, config: Optional[dict] = None):
+        self.state = state
+        self.llm_service = llm_service
+        self.config = config or {}
+
+        self.summary = ""
+        self._summary_upto = 0          # Indeks segmentu validated (wyłącznie)
+        self._generation = state.validated_rope.generation
+        self._segments_since_summary = 0
+        self._refreshing = False
+        self._gap_logged: set = set()   # (typ wywołania, granica podsumowania)
+
+    def reset(self) -> None:
+        """Czyści podsumowanie (nowa sesja)."""
+        self.summary = ""
+        self._summary_upto = 0
+        self._generation = self.state.validated_rope.generation
+        self._segments_since_summary = 0
+        self._gap_logged.clear()
+
+    def on_segment_finalized(self) -> None:
+        """Zlicza sfinalizowane segmenty (wołane przy każdym final)."""
+        self._segments_since_summary += 1
+
+    def needs_summary(self) -> bool:
+        """Czy warto odświeżyć podsumowanie (jest tekst spoza okna)."""
+        self._sync_generation()
+        if self._refreshing or not self.llm_service:
+            return False
+        # Pierwsze podsumowanie od razu, gdy tekst wypadnie z okna
+        if self.summary and self._segments_since_summary < self.SUMMARY_EVERY_SEGMENTS:
+            return False
+        return self._window_start() > self._summary_upto
+
+    async def refresh_summary(self) -> bool:
+        """
+        Dopisuje do podsumowania segmenty, które wypadły z okna.
+
+        Returns:
+            True jeśli podsumowanie zostało zaktualizowane
+        """
+        self._sync_generation()
+        if self._refreshing or not self.llm_service:
+            return False
+
+        rope = self.state.validated_rope
+        generation = rope.generation
+        start, end = self._summary_upto, self._window_start()
+        if end <= start:
+            return False
+
+        older = rope.text_range(start, end)
+        if len(older) > self.SUMMARY_MAX_INPUT_CHARS:
+            older = older[-self.SUMMARY_MAX_INPUT_CHARS:]
+
+        self._refreshing = True
+        self._segments_since_summary = 0
+        try:
+            summary = await self.llm_service.summarize_dialogue(
+                previous_summary=self.summary,
+                new_dialogue=older,
+                config=self.config,
+                max_words=self.SUMMARY_MAX_WORDS
+            )
+        except Exception as e:
+            print(f"[CONTEXT] Summary error: {e}", flush=True)
+            summary = ""
+        finally:
+            self._refreshing = False
+
+        # Sesja zresetowana w trakcie - wynik nieaktualny
+        if not summary or rope.generation != generation:
+            return False
+
+        self.summary = summary
+        self._summary_upto = end
+        print(f"[CONTEXT] Summary updated (segments 0-{end}, {len(summary)} chars)", flush=True)
+        return True
+
+    def build(self, call_type: str = "suggestions") -> str:
+        """Kontekst dla danego typu wywołania: podsumowanie + ostatnie wypowiedzi."""
+        self._sync_generation()
+        budget = self.BUDGETS.get(call_type, self.BUDGETS["suggestions"])
+
+        recent = self._recent(budget.recent_tokens * self.CHARS_PER_TOKEN, call_type)
+        summary = self._clip(self.summary, budget.summary_tokens * self.CHARS_PER_TOKEN)
+        if not summary:
+            return recent
+
+        return (
+            f"[Podsumowanie wcześniejszej części rozmowy]\n{summary}\n\n"
+            f"[Ostatnie wypowiedzi]\n{recent}"
+        )
+
+    def _recent(self, max_chars: int, call_type: str = "suggestions") -> str:
+        """
+        Dosłowne okno: ostatnie max_chars, dosztukowane w dół do granicy
+        podsumowania (lub okna "suggestions", gdy podsumowania jeszcze nie ma)
+        - najwyżej o SUMMARY_EVERY_SEGMENTS segmentów.
+        """
+        rope = self.state.validated_rope
+        recent = " ".join(
+            part for part in (self.state.final_rope.text, self.state.provisional_text) if part
+        )
+        budget = max_chars - len(recent)
+        start = rope.tail_start(budget) if budget > 0 else len(rope)
+        boundary = self._summary_upto if self.summary else self._window_start()
+        padded = max(min(start, boundary), start - self.SUMMARY_EVERY_SEGMENTS)
+        # Podsumowanie zalega dłużej niż jeden interwał odświeżania (np. błędy LLM)
+        stale = self._window_start() - boundary > self.SUMMARY_EVERY_SEGMENTS
+        if stale and padded > boundary and (call_type, boundary) not in self._gap_logged:
+            self._gap_logged.add((call_type, boundary))
+            print(
+                f"[CONTEXT] Summary stale - {call_type} context skips segments {boundary}-{padded}",
+                flush=True
+            )
+        older = rope.text_range(padded, len(rope))
+        return f"{older} {recent}".strip()
+
+    def _window_start(self) -> int:
+        budget = self.BUDGETS[self.SUMMARY_WINDOW]
+        return self.state.validated_rope.tail_start(budget.recent_tokens * self.CHARS_PER_TOKEN)
+
+    def _sync_generation(self) -> None:
+        """Reset podsumowania po wyczyszczeniu transkrypcji (nowa sesja)."""
+        if self.state.validated_rope.generation != self._generation:
+            self.reset()
+
+    @staticmethod
+    def _clip(text: str, max_chars: int) -> str:
+        """Przycina tekst do limitu na granicy słowa."""
+        if len(text) <= max_chars:
+            return text
+        clipped = text[:max_chars].rsplit(" ", 1)[0]
+        return clipped.rstrip(",;: ") + "..."
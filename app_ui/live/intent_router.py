@@ -46,22 +46,20 @@ class IntentRouter:
         self._pending_mode: Optional[ConversationMode] = None
         self._pending_streak = 0
 
-    async def classify(self, transcript: str, spec_ids: Optional[List[int]] = None, force: bool = False) -> IntentResult:
-        if not transcript:
-            return self._last_result
-        if len(transcript.strip()) < 20 and not force:
+    async def classify(
+        self,
+        transcript: str,
+        spec_ids: Optional[List[int]] = None,
+        force: bool = False,
+        text_length: Optional[int] = None,
+    ) -> IntentResult:
+        """
+        text_length: total transcript length when `transcript` is only a
+        bounded context window (used for the MIN_CHAR_DELTA throttle).
+        """
+        if not self.should_evaluate(transcript, text_length, force):
             return self._last_result
-
-        now = time.time()
-        if not force:
-            if (
-                len(transcript) - self._last_eval_len < self.MIN_CHAR_DELTA
-                and (now - self._last_eval_time) < self.COOLDOWN_SECONDS
-            ):
-                return self._last_result
-
-        self._last_eval_len = len(transcript)
-        self._last_eval_time = now
+        self.mark_evaluated(text_length if text_length is not None else len(transcript))
 
         heuristic = self._heuristic_classify(transcript)
         llm_result = None
@@ -75,25 +73,65 @@ class IntentRouter:
             except Exception:
                 llm_result = None
 
-        chosen = heuristic
-        if llm_result and isinstance(llm_result, dict):
-            mode = llm_result.get("mode")
-            conf = float(llm_result.get("confidence", 0.0) or 0.0)
-            reason = llm_result.get("reason", "") or "llm"
-            try:
-                mode_enum = ConversationMode(mode)
-                if conf >= 0.55:
-                    chosen = IntentResult(mode_enum, conf, reason, source="llm")
-            except Exception:
-                pass
+        return self.accept(self.from_llm(llm_result, heuristic), force=force)
+
+    # --- Building blocks (used by fused mode+cards generation) ---
 
+    @property
+    def last_result(self) -> IntentResult:
+        return self._last_result
+
+    def should_evaluate(
+        self,
+        transcript: str,
+        text_length: Optional[int] = None,
+        force: bool = False,
+    ) -> bool:
+        """Throttle: is a new classification worth it (no state change)."""
+        if not transcript:
+            return False
+        if len(transcript.strip()) < 20 and not force:
+            return False
+        if force:
+            return True
+
+        length = text_length if text_length is not None else len(transcript)
+        return not (
+            length - self._last_eval_len < self.MIN_CHAR_DELTA
+            and (time.time() - self._last_eval_time) < self.COOLDOWN_SECONDS
+        )
+
+    def mark_evaluated(self, text_length: int) -> None:
+        self._last_eval_len = text_length
+        self._last_eval_time = time.time()
+
+    def heuristic(self, transcript: str) -> IntentResult:
+        """Instant keyword-based pre-classification (no network)."""
+        return self._heuristic_classify(transcript)
+
+    def from_llm(self, llm_result: Optional[dict], fallback: IntentResult) -> IntentResult:
+        """LLM result ({"mode", "confidence", "reason"}) or the fallback if weak/invalid."""
+        if not llm_result or not isinstance(llm_result, dict):
+            return fallback
+        mode = llm_result.get("mode")
+        try:
+            conf = float(llm_result.get("confidence", 0.0) or 0.0)
+            mode_enum = ConversationMode(mode)
+        except Exception:
+            return fallback
+        if conf < 0.55:
+            return fallback
+        reason = llm_result.get("reason", "") or "llm"
+        return IntentResult(mode_enum, conf, reason, source="llm")
+
+    def accept(self, candidate: IntentResult, force: bool = False) -> IntentResult:
+        """Applies the candidate (forced or through the switch stabilizer)."""
         if force:
             self._pending_mode = None
             self._pending_streak = 0
-            self._last_result = chosen
-            return chosen
-
-        return self._stabilize(chosen)
+            self._last_result = candidate
+            return candidate
+        return self._stabilize(candidate)
 
     def _stabilize(self, candidate: IntentResult) -> IntentResult:
         # Strong confidence -> accept immediately
@@ -5,11 +5,17 @@ Smart triggers dla regeneracji sugestii i walidacji.
 
 import asyncio
 import time
-from typing import Optional, List, TYPE_CHECKING
+import weakref
+from collections import OrderedDict
+from typing import Dict, Optional, List, TYPE_CHECKING
 from enum import Enum
 
 from app_ui.live.intent_router import IntentRouter
-from app_ui.live.live_state import ConversationMode, CardsMode, Suggestion
+from app_ui.live.context_builder import ConversationContextBuilder
+from app_ui.live.live_state import ConversationMode, CardsMode, Suggestion, SessionStatus
+from core import latency_trace
+from core.punctuation_restorer import get_punctuation_restorer
+from core.services.visit_draft_service import VisitDraftService
 
 if TYPE_CHECKING:
     from app_ui.live.live_state import LiveState
@@ -37,7 +43,7 @@ class AIController:
     # Konfiguracja triggerów
     MIN_WORDS_FOR_REGEN = 40          # Minimalna liczba nowych słów
     DEBOUNCE_DELAY = 2.0              # Sekundy opóźnienia debounce
-    VALIDATION_DELAY = 2.5            # Sekundy przed walidacją segmentu
+    VALIDATION_DELAY = 2.5            # Sekundy przed walidacją segmentu (minimum)
     REGEN_COOLDOWN = 5.0              # Minimalny czas między regeneracjami
 
     # NOWE: Delay po kliknięciu karty (żeby user widział odpowiedzi)
@@ -48,16 +54,43 @@ class AIController:
     QA_MIN_WORDS = 3                  # Minimalna liczba słów w odpowiedzi (zmniejszone z 5)
     MANUAL_OVERRIDE_TTL = 90.0        # Jak długo utrzymać tryb z ręcznej pary Q+A
     FREEZE_DECISION_AUTO_REGEN = True # W trybie poradniczym nie odswiezaj automatycznie
+    ANSWER_CACHE_SIZE = 30            # Ile zestawów odpowiedzi pacjenta trzymać w cache
+
+    # Walidacja: paczki segmentów + adaptacyjny debounce
+    VALIDATION_BATCH_CHARS = 1600     # ~400 tokenów segmentów na jedno wywołanie
+    VALIDATION_MIN_BATCH_CHARS = 240  # Mniejsze paczki czekają na kolejne segmenty...
+    VALIDATION_MAX_WAIT = 8.0         # ...ale najwyżej tyle sekund
+    VALIDATION_CONTEXT_CHARS = 600    # Ogon zwalidowanego tekstu jako kontekst
+    VALIDATION_MAX_DELAY = 20.0       # Górny limit backoffu przy wolnym providerze
+    VALIDATION_LOCAL_CONFIDENCE = 0.7 # Od tej pewności interpunkcja lokalna bez LLM
 
     def __init__(self, state: 'LiveState', llm_service, config):
         self.state = state
         self.llm_service = llm_service
         self.config = config
         self.intent_router = IntentRouter(llm_service=llm_service, config=config)
+        # Kontekst promptów: podsumowanie starszej części + okno ostatnich wypowiedzi
+        self.context_builder = ConversationContextBuilder(state, llm_service=llm_service, config=config)
+        # Lokalna interpunkcja (pierwszy etap walidacji, LLM tylko jako poprawka)
+        self.punctuation = get_punctuation_restorer()
+        # Szkice SOAP/ICD liczone w tle w trakcie wizyty (tej strony Live)
+        self.drafts = VisitDraftService()
 
         # Debounce tasks
         self._regen_task: Optional[asyncio.Task] = None
         self._validation_task: Optional[asyncio.Task] = None
+        self._summary_task: Optional[asyncio.Task] = None
+
+        # Walidacja: bieżący debounce (rośnie gdy provider zwalnia) + liczniki
+        self._validation_delay: float = self.VALIDATION_DELAY
+        self.validation_stats = {"segments": 0, "llm_calls": 0, "local": 0}
+
+        # Spekulatywne odpowiedzi pacjenta dla widocznych pytań (klucz: tekst pytania)
+        self._answer_cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._answer_tasks: Dict[str, asyncio.Task] = {}
+        self._answer_claimed: set = set()
+        # Prefetche anulowane przez reset (nie przez anulowanie wołającego)
+        self._answer_reset: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
 
         # Cooldown tracking
         self._last_regen_time: float = 0
@@ -93,7 +126,15 @@ class AIController:
 
     def set_spec_ids(self, spec_ids: List[int]):
         """Ustawia listę aktywnych specjalizacji (multi-select)."""
+        if spec_ids != self.current_spec_ids:
+            # Odpowiedzi zależą od specjalizacji
+            self._reset_answer_prefetch()
         self.current_spec_ids = spec_ids
+        self.drafts.set_spec_ids(spec_ids)
+
+    def start_drafts(self):
+        """Nowa wizyta - nowy szkic dokumentacji."""
+        self.drafts.start_session(self.llm_service, self.config, self.current_spec_ids)
 
     # === SMART TRIGGERS ===
 
@@ -104,8 +145,10 @@ class AIController:
         """
         should_regen = False
         reason = None
-        
-        current_len = len(self.state.full_transcript)
+
+        self.context_builder.on_segment_finalized()
+
+        current_len = self.state.transcript_length
         # Ignoruj jeśli tekst się nie zmienił lub urósł minimalnie (<5 znaków)
         if current_len - self._last_processed_text_len < 5:
             return
@@ -340,7 +383,18 @@ class AIController:
         """Walidacja z debounce - pętla do wyczerpania pending."""
         try:
             while True:
-                await asyncio.sleep(self.VALIDATION_DELAY)
+                await asyncio.sleep(self._validation_delay)
+
+                # Mała paczka w trakcie nagrywania - poczekaj na kolejne segmenty
+                waited = self._validation_delay
+                while (
+                    self.state.pending_validation
+                    and self.state.status == SessionStatus.RECORDING
+                    and waited < self.VALIDATION_MAX_WAIT
+                    and sum(len(t) for t in self.state.pending_validation) < self.VALIDATION_MIN_BATCH_CHARS
+                ):
+                    await asyncio.sleep(0.5)
+                    waited += 0.5
 
                 # Sprawdź czy są segmenty do walidacji
                 if not self.state.pending_validation:
@@ -363,13 +417,12 @@ class AIController:
 
     async def _do_regeneration(self, reason: TriggerReason):
         """Wykonuje regeneracje sugestii."""
+        started_ns = latency_trace.now()
         if self._on_regen_start:
             self._on_regen_start()
 
         print(f"[AI] Generating suggestions (reason: {reason.value})...", flush=True)
 
-        transcript = self.state.full_transcript
-
         # Manual override/context (np. wybrane odpowiedzi nieobecne w transkrypcji)
         now = time.time()
         manual_override = None
@@ -384,30 +437,62 @@ class AIController:
         else:
             self._manual_context = None
 
-        if manual_context:
+        def context_for(call_type: str) -> str:
+            # Stały budżet kontekstu niezależnie od długości wizyty
+            transcript = self.context_builder.build(call_type)
+            if not manual_context:
+                return transcript
             if transcript:
-                transcript_for_llm = f"{transcript}\n\n[Manual Q+A]\n{manual_context}"
-            else:
-                transcript_for_llm = manual_context
-        else:
-            transcript_for_llm = transcript
+                return f"{transcript}\n\n[Manual Q+A]\n{manual_context}"
+            return manual_context
+
+        cards_mode = getattr(self.state, "cards_mode", CardsMode.AUTO)
+        transcript_for_llm = context_for("suggestions")
+        text_length = self.state.transcript_length
+        fused_cards = None
+        streamed_cards: List[dict] = []
 
         # 1) Intent routing (mode)
+        # Heurystyka działa natychmiast; jeśli tryb wymaga oceny LLM, tryb i karty
+        # przychodzą w jednym wywołaniu (zamiast classify -> generate po kolei)
         if manual_override:
             mode = manual_override
-        else:
-            try:
-                intent = await self.intent_router.classify(transcript_for_llm, spec_ids=self.current_spec_ids)
-                if intent:
-                    self.state.set_conversation_mode(intent.mode, intent.confidence, intent.reason)
-            except Exception as e:
-                print(f"[AI] Intent routing error: {e}", flush=True)
+        elif self.intent_router.should_evaluate(transcript_for_llm, text_length):
+            self.intent_router.mark_evaluated(text_length)
+            heuristic = self.intent_router.heuristic(transcript_for_llm)
+            fused = None
+            intent_applied = False
+            if self.llm_service:
+                try:
+                    # Karty trafiają do promptera pojedynczo - gdy tylko model domknie obiekt
+                    async for event, payload in self.llm_service.stream_live_cards(
+                        transcript_for_llm,
+                        self.config,
+                        exclude_questions=self.state.asked_questions,
+                        spec_ids=self.current_spec_ids,
+                        mode_hint=heuristic.mode.value,
+                        cards_kind=self._forced_cards_kind(cards_mode)
+                    ):
+                        if event == "header":
+                            self._apply_intent(payload, heuristic)
+                            intent_applied = True
+                        elif event == "card":
+                            decision = self._wants_decision_cards(cards_mode)
+                            if decision or payload["type"] == "question":
+                                streamed_cards.append(payload)
+                                self.state.set_suggestions(streamed_cards)
+                                if len(streamed_cards) == 1:
+                                    latency_trace.complete("llm_first_card", started_ns, reason=reason.value)
+                        elif event == "done":
+                            fused = payload
+                except Exception as e:
+                    print(f"[AI] Live cards error: {e}", flush=True)
+            if not intent_applied:
+                self._apply_intent(fused, heuristic)
+            if fused:
+                fused_cards = fused.get("cards") or None
         mode = self.state.conversation_mode
-        cards_mode = getattr(self.state, "cards_mode", CardsMode.AUTO)
-        use_decision_cards = (
-            cards_mode == CardsMode.DECISION
-            or (cards_mode == CardsMode.AUTO and mode == ConversationMode.DECISION)
-        )
+        use_decision_cards = self._wants_decision_cards(cards_mode)
         if not use_decision_cards:
             try:
                 self.state.set_return_to_questions_hint(False)
@@ -419,12 +504,21 @@ class AIController:
             fallback = self._fallback_cards_for_mode(ConversationMode.DECISION if use_decision_cards else mode)
             if fallback:
                 self.state.set_suggestions(fallback)
+            latency_trace.complete("llm_regen", started_ns, reason=reason.value, llm=False)
             if self._on_regen_end:
                 self._on_regen_end()
             return
 
         try:
-            if use_decision_cards:
+            if fused_cards and self._cards_match(fused_cards, use_decision_cards):
+                # Karty z połączonego wywołania pasują do ustalonego trybu
+                if fused_cards != streamed_cards:
+                    self.state.set_suggestions(fused_cards)
+                    if not streamed_cards:
+                        latency_trace.complete("llm_first_card", started_ns, reason=reason.value)
+                print(f"[AI] Generated {len(fused_cards)} cards (mode+cards in one call)", flush=True)
+            elif use_decision_cards:
+                transcript_for_llm = context_for("decision")
                 cards = await self.llm_service.generate_decision_cards(
                     transcript_for_llm,
                     self.config,
@@ -447,20 +541,27 @@ class AIController:
                         print("[AI] Decision cards fallback used", flush=True)
                 if cards:
                     self.state.set_suggestions(cards)
+                    if not streamed_cards:
+                        latency_trace.complete("llm_first_card", started_ns, reason=reason.value)
                     print(f"[AI] Generated {len(cards)} decision cards", flush=True)
                 else:
                     print("[AI] No decision cards returned", flush=True)
             else:
                 exclude = self.state.asked_questions
-                suggestions = await self.llm_service.generate_suggestions(
+                suggestions: List[str] = []
+                async for question in self.llm_service.stream_suggestions(
                     transcript_for_llm,
                     self.config,
                     exclude_questions=exclude,
                     spec_ids=self.current_spec_ids
-                )
+                ):
+                    suggestions.append(question)
+                    if len(suggestions) <= 3:
+                        self.state.set_suggestions(suggestions)
+                    if len(suggestions) == 1 and not streamed_cards:
+                        latency_trace.complete("llm_first_card", started_ns, reason=reason.value)
 
                 if suggestions:
-                    self.state.set_suggestions(suggestions[:3])
                     print(f"[AI] Generated {len(suggestions)} suggestions", flush=True)
                 else:
                     print("[AI] No suggestions returned", flush=True)
@@ -468,9 +569,146 @@ class AIController:
         except Exception as e:
             print(f"[AI] Generation error: {e}", flush=True)
         finally:
+            latency_trace.complete("llm_regen", started_ns, reason=reason.value)
+            self._prefetch_patient_answers()
             if self._on_regen_end:
                 self._on_regen_end()
 
+    # === PATIENT ANSWERS (PREFETCH) ===
+
+    async def get_patient_answers(self, question: str) -> List[str]:
+        """
+        Odpowiedzi pacjenta dla pytania: z cache, z trwającego prefetchu
+        albo (gdy pytania nie było w puli) nowym wywołaniem LLM.
+        """
+        if not question or not self.llm_service:
+            return []
+
+        key = self._answer_key(question)
+        cached = self._answer_cache.get(key)
+        if cached:
+            self._answer_cache.move_to_end(key)
+            print(f"[AI] Patient answers from prefetch cache", flush=True)
+            return list(cached)
+
+        task = self._answer_tasks.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(self._fetch_patient_answers(key, question))
+            self._answer_tasks[key] = task
+        # Kliknięte pytanie - nie anuluj przy wymianie puli
+        self._answer_claimed.add(key)
+        try:
+            return list(await asyncio.shield(task))
+        except asyncio.CancelledError:
+            # Anulowany został sam wołający - przekaż dalej
+            # (Task.cancelling() jest dopiero od Pythona 3.11)
+            cancelling = getattr(asyncio.current_task(), "cancelling", None)
+            if task not in self._answer_reset or (cancelling and cancelling()):
+                raise
+            # Prefetch anulowany przez reset (zmiana specjalizacji, force_stop)
+            # - kliknięte pytanie i tak potrzebuje odpowiedzi
+            print(f"[AI] Patient answers prefetch cancelled - fetching directly", flush=True)
+            try:
+                return list(await self.llm_service.generate_patient_answers(
+                    question,
+                    self.config,
+                    spec_ids=self.current_spec_ids
+                ) or [])
+            except Exception as e:
+                print(f"[AI] Patient answers error: {e}", flush=True)
+                return []
+        finally:
+            self._answer_claimed.discard(key)
+
+    def _prefetch_patient_answers(self):
+        """Spekulatywnie generuje odpowiedzi dla widocznych kart-pytań."""
+        if not self.llm_service:
+            return
+
+        visible = {}
+        for suggestion in self.state.suggestions:
+            if (suggestion.kind or "question") == "question" and not suggestion.used:
+                visible[self._answer_key(suggestion.question)] = suggestion.question
+
+        # Pula wymieniona - porzuć prefetch pytań, które zniknęły
+        for key, task in list(self._answer_tasks.items()):
+            if key not in visible and key not in self._answer_claimed:
+                task.cancel()
+                del self._answer_tasks[key]
+
+        for key, question in visible.items():
+            if key in self._answer_cache or key in self._answer_tasks:
+                continue
+            self._answer_tasks[key] = asyncio.create_task(self._fetch_patient_answers(key, question))
+
+    async def _fetch_patient_answers(self, key: str, question: str) -> List[str]:
+        task = asyncio.current_task()
+        try:
+            answers = await self.llm_service.generate_patient_answers(
+                question,
+                self.config,
+                spec_ids=self.current_spec_ids
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[AI] Patient answers prefetch error: {e}", flush=True)
+            answers = []
+        finally:
+            if self._answer_tasks.get(key) is task:
+                del self._answer_tasks[key]
+
+        if answers:
+            self._answer_cache[key] = list(answers)
+            self._answer_cache.move_to_end(key)
+            while len(self._answer_cache) > self.ANSWER_CACHE_SIZE:
+                self._answer_cache.popitem(last=False)
+        return answers or []
+
+    def _reset_answer_prefetch(self):
+        for task in self._answer_tasks.values():
+            if task.cancel():
+                self._answer_reset.add(task)
+        self._answer_tasks.clear()
+        self._answer_claimed.clear()
+        self._answer_cache.clear()
+
+    @staticmethod
+    def _answer_key(question: str) -> str:
+        return " ".join((question or "").lower().split())
+
+    def _apply_intent(self, llm_result: Optional[dict], heuristic):
+        """Ustala tryb rozmowy z wyniku LLM (lub heurystyki, gdy wynik słaby)."""
+        try:
+            intent = self.intent_router.accept(self.intent_router.from_llm(llm_result, heuristic))
+            self.state.set_conversation_mode(intent.mode, intent.confidence, intent.reason)
+        except Exception as e:
+            print(f"[AI] Intent routing error: {e}", flush=True)
+
+    def _wants_decision_cards(self, cards_mode: CardsMode) -> bool:
+        """Czy bieżący tryb wymaga kart wsparcia decyzji (zamiast pytań)."""
+        return (
+            cards_mode == CardsMode.DECISION
+            or (cards_mode == CardsMode.AUTO and self.state.conversation_mode == ConversationMode.DECISION)
+        )
+
+    @staticmethod
+    def _forced_cards_kind(cards_mode: CardsMode) -> Optional[str]:
+        """Rodzaj kart wymuszony przez użytkownika (None = wg trybu rozmowy)."""
+        if cards_mode == CardsMode.DECISION:
+            return "decision"
+        if cards_mode == CardsMode.QUESTIONS:
+            return "questions"
+        return None
+
+    @staticmethod
+    def _cards_match(cards: List[dict], decision: bool) -> bool:
+        """Czy karty z połączonego wywołania pasują do rodzaju kart."""
+        kinds = {card.get("type") for card in cards}
+        if decision:
+            return bool(kinds & {"check", "script"})
+        return kinds == {"question"}
+
     def _fallback_cards_for_mode(self, mode: ConversationMode):
         if mode == ConversationMode.DECISION:
             return [
@@ -481,27 +719,48 @@ class AIController:
         return []
 
     async def _do_validation(self):
-        """Wykonuje walidację segmentu przez AI."""
-        if not self.llm_service:
-            return
+        """
+        Wykonuje walidację paczki segmentów.
 
-        # Pobierz segmenty do walidacji
-        segments = self.state.clear_pending_validation()
+        Interpunkcja liczona lokalnie; LLM (jeśli włączony) poprawia tylko
+        paczki, w których lokalne reguły nie są pewne.
+        """
+        # Pobierz paczkę segmentów (limit rozmiaru - reszta w kolejnej paczce)
+        segments = self.state.take_pending_validation(self.VALIDATION_BATCH_CHARS)
         if not segments:
             return
 
         combined = " ".join(segments)
-        print(f"[AI] Validating: '{combined[:50]}...'", flush=True)
+        self.validation_stats["segments"] += len(segments)
+        started_ns = latency_trace.now()
 
         try:
-            result = await self.llm_service.validate_segment(
-                segment=combined,
-                context=self.state.validated_text,
-                suggested_questions=self.state.asked_questions,
-                config=self.config
-            )
+            context = self.state.validated_rope.tail(self.VALIDATION_CONTEXT_CHARS)
+            local = self.punctuation.restore(combined, context=context)
+            result = {"corrected_text": local.text, "needs_newline": local.needs_newline}
 
-            corrected = result.get("corrected_text", combined)
+            if not self._should_refine_with_llm(local.confidence):
+                self.validation_stats["local"] += 1
+            else:
+                print(f"[AI] Validating ({len(segments)} seg, local={local.confidence:.2f}): '{combined[:50]}...'", flush=True)
+                self.validation_stats["llm_calls"] += 1
+                started = time.monotonic()
+                try:
+                    result = await self.llm_service.validate_segment(
+                        segment=local.text,
+                        context=context,
+                        suggested_questions=self.state.asked_questions,
+                        config=self.config
+                    )
+                except Exception:
+                    self._adapt_validation_delay(None)
+                    raise
+                self._adapt_validation_delay(time.monotonic() - started)
+                if result.get("corrected_text") and result["corrected_text"] != local.text:
+                    # Poprawki LLM uczą lokalny model przecinków
+                    self.punctuation.observe(result["corrected_text"])
+
+            corrected = result.get("corrected_text") or local.text
             needs_newline = result.get("needs_newline", False)
 
             # === SAFETY CHECK (GUARDRAILS) ===
@@ -518,12 +777,20 @@ class AIController:
             
             if is_suspicious:
                 print(f"[AI] REJECTED HALLUCINATION: '{combined}' -> '{corrected}'", flush=True)
-                # Użyj oryginału, ale spróbuj zachować newline jeśli AI wykryło
-                corrected = combined
+                # Użyj wersji lokalnej, ale spróbuj zachować newline jeśli AI wykryło
+                corrected = local.text
             
-            self.state.validate_segment(corrected, needs_newline)
+            self.state.validate_segment(corrected, needs_newline, segment_count=len(segments))
+            latency_trace.complete("llm_validation", started_ns, segments=len(segments))
             print(f"[AI] Validated: '{corrected[:50]}...'", flush=True)
 
+            # Odśwież podsumowanie w tle, gdy segmenty wypadają z okna kontekstu
+            if self.context_builder.needs_summary():
+                self._summary_task = asyncio.create_task(self.context_builder.refresh_summary())
+
+            # Szkic dokumentacji (co kilka segmentów, w tle)
+            self.drafts.on_text_validated(self.state.validated_text, len(segments))
+
             # === Q+A MATCHING ===
             # Sprawdź czy to odpowiedź na oczekujące pytanie
             if self._is_answer_to_pending_question(corrected):
@@ -534,7 +801,31 @@ class AIController:
         except Exception as e:
             print(f"[AI] Validation error: {e}", flush=True)
             # W razie błędu - przepuść bez walidacji
-            self.state.validate_segment(combined)
+            self.state.validate_segment(combined, segment_count=len(segments))
+
+    def _adapt_validation_delay(self, latency: Optional[float]):
+        """
+        Debounce walidacji wg czasu odpowiedzi providera.
+
+        Wolny provider (lub błąd) wydłuża przerwę - więcej segmentów trafia
+        do jednej paczki; szybkie odpowiedzi stopniowo ją skracają.
+        """
+        if latency is None:
+            target = self._validation_delay * 2
+        else:
+            target = max(self.VALIDATION_DELAY, latency * 1.5)
+            if target < self._validation_delay:
+                # Powrót łagodny (średnia z poprzednią wartością)
+                target = (target + self._validation_delay) / 2
+        self._validation_delay = min(target, self.VALIDATION_MAX_DELAY)
+
+    def _should_refine_with_llm(self, local_confidence: float) -> bool:
+        """Czy wysłać paczkę do LLM (opcja live_validation_llm_refine)."""
+        if not self.llm_service:
+            return False
+        if not self.config.get("live_validation_llm_refine", True):
+            return False
+        return local_confidence < self.VALIDATION_LOCAL_CONFIDENCE
 
     def _is_answer_to_pending_question(self, text: str) -> bool:
         """
@@ -598,6 +889,12 @@ class AIController:
                 self._validation_task.cancel()
             except:
                 pass
+        if self._summary_task:
+            try:
+                self._summary_task.cancel()
+            except:
+                pass
+        self._reset_answer_prefetch()
 
 
 
@@ -20,6 +20,7 @@ import uuid
 # Import nowych komponentów state
 from app_ui.live.state.active_question import ActiveQuestionContext, QuestionState
 from app_ui.live.state.qa_collector import QACollector, QAPair
+from app_ui.live.state.transcript_rope import TranscriptRope, TranscriptSegment
 
 if TYPE_CHECKING:
     from core.diarization import DiarizationResult, DiarizationSegment, SpeakerRole
@@ -55,13 +56,7 @@ class PrompterMode(Enum):
     SUMMARY = "summary"          # Podsumowanie po zakończeniu
 
 
-@dataclass
-class TranscriptSegment:
-    """Pojedynczy segment transkrypcji."""
-    text: str
-    start_sample: int = 0
-    end_sample: int = 0
-    is_validated: bool = False
+# TranscriptSegment przeniesiony do app_ui/live/state/transcript_rope.py
 
 
 @dataclass
@@ -147,11 +142,12 @@ class LiveState:
 
         # Transkrypcja - 3 warstwy
         self.provisional_text: str = ""    # Real-time (szary, italic)
-        self.final_text: str = ""          # Po ciszy, czeka na walidację
-        self.validated_text: str = ""      # Zwalidowane przez AI (finalne)
+        self.final_rope = TranscriptRope()      # Po ciszy, czeka na walidację
+        self.validated_rope = TranscriptRope()  # Zwalidowane przez AI (finalne)
 
-        # Pełna transkrypcja (dla AI)
-        self._full_transcript: str = ""
+        # Pełna transkrypcja (dla AI) - sklejana leniwie przy odczycie
+        self._full_transcript_cache: str = ""
+        self._full_transcript_key: Optional[tuple] = None
         self._words_since_last_regen: int = 0
 
         # Sugestie - TYLKO pula kart, oddzielona od aktywnego pytania
@@ -278,7 +274,6 @@ class LiveState:
         if text == self.provisional_text:
             return
         self.provisional_text = text
-        self._rebuild_full_transcript()
         self._notify_transcript_change()
 
     def set_improved(self, text: str):
@@ -289,35 +284,71 @@ class LiveState:
         # Improved po prostu zastępuje cały provisional
         # (streaming service wysyła tekst tylko dla niesfinalizowanego segmentu)
         self.provisional_text = text
-        self._rebuild_full_transcript()
         self._notify_transcript_change()
 
-    def set_final(self, text: str):
+    def set_final(self, text: str, start_sample: int = 0, end_sample: int = 0):
         """Przenosi tekst do final (po ciszy)."""
         text = text.strip()
         if not text:
             return
-        self.final_text = self._smart_join(self.final_text, text)
+        self.final_rope.append(text, start_sample, end_sample)
         self.provisional_text = ""
         self.pending_validation.append(text)
 
         # Zlicz słowa dla smart triggers
         self._words_since_last_regen += len(text.split())
 
-        self._rebuild_full_transcript()
         self._notify_transcript_change()
 
-    def validate_segment(self, corrected_text: str, needs_newline: bool = False):
-        """Przenosi zwalidowany tekst do validated."""
-        if needs_newline and self.validated_text:
-            self.validated_text = self.validated_text.rstrip() + "\n"
+    def validate_segment(
+        self,
+        corrected_text: str,
+        needs_newline: bool = False,
+        segment_count: Optional[int] = None
+    ):
+        """
+        Przenosi zwalidowany tekst do validated.
 
-        self.validated_text = self._smart_join(self.validated_text, corrected_text)
-        self.final_text = ""
+        segment_count: ile pierwszych segmentów final objęła walidacja
+        (None = wszystkie).
+        """
+        final_segments = self.final_rope.segments
+        if segment_count is not None and segment_count < len(final_segments):
+            covered = final_segments[:segment_count]
+        else:
+            covered = final_segments
+        start_sample = covered[0].start_sample if covered else 0
+        end_sample = covered[-1].end_sample if covered else 0
+
+        self.validated_rope.append(
+            corrected_text,
+            start_sample,
+            end_sample,
+            is_validated=True,
+            newline=needs_newline
+        )
+        if covered is final_segments:
+            self.final_rope.clear()
+        else:
+            self.final_rope.drop_head(len(covered))
 
-        self._rebuild_full_transcript()
         self._notify_transcript_change()
 
+    def take_pending_validation(self, max_chars: int) -> List[str]:
+        """
+        Pobiera z kolejki walidacji segmenty mieszczące się w max_chars
+        (zawsze co najmniej jeden); reszta czeka na kolejną paczkę.
+        """
+        taken: List[str] = []
+        total = 0
+        for text in self.pending_validation:
+            if taken and total + len(text) > max_chars:
+                break
+            taken.append(text)
+            total += len(text) + 1
+        self.pending_validation = self.pending_validation[len(taken):]
+        return taken
+
     def clear_pending_validation(self) -> List[str]:
         """Pobiera i czyści kolejkę walidacji."""
         segments = self.pending_validation.copy()
@@ -453,9 +484,8 @@ class LiveState:
     def reset(self):
         """Resetuje stan do początkowego."""
         self.provisional_text = ""
-        self.final_text = ""
-        self.validated_text = ""
-        self._full_transcript = ""
+        self.final_rope.clear()
+        self.validated_rope.clear()
         self._words_since_last_regen = 0
         self.suggestions = []
         self.asked_questions = []
@@ -504,8 +534,12 @@ class LiveState:
         if self._recording_start_time:
             duration = time.time() - self._recording_start_time
 
-        # Liczba słów
-        word_count = len(self._full_transcript.split()) if self._full_transcript else 0
+        # Liczba słów (liczniki segmentów - bez dzielenia całego tekstu)
+        word_count = (
+            self.validated_rope.word_count
+            + self.final_rope.word_count
+            + len(self.provisional_text.split())
+        )
 
         # Liczba mówców
         speaker_count = 0
@@ -679,10 +713,77 @@ class LiveState:
 
     # === HELPERS ===
 
+    @property
+    def validated_text(self) -> str:
+        """Zwalidowany tekst (sklejany leniwie z segmentów)."""
+        return self.validated_rope.text
+
+    @validated_text.setter
+    def validated_text(self, value: str):
+        self.validated_rope.clear()
+        self.validated_rope.append(value or "", is_validated=True)
+
+    @property
+    def final_text(self) -> str:
+        """Tekst final czekający na walidację."""
+        return self.final_rope.text
+
+    @final_text.setter
+    def final_text(self, value: str):
+        self.final_rope.clear()
+        self.final_rope.append(value or "")
+
+    @property
+    def has_transcript(self) -> bool:
+        """Czy jest jakikolwiek tekst (bez sklejania warstw)."""
+        return bool(self.validated_rope or self.final_rope or self.provisional_text)
+
     @property
     def full_transcript(self) -> str:
-        """Pełna transkrypcja ze wszystkich warstw."""
-        return self._full_transcript
+        """Pełna transkrypcja ze wszystkich warstw (cache do następnej zmiany)."""
+        key = (
+            self.validated_rope.generation, len(self.validated_rope),
+            self.final_rope.generation, len(self.final_rope),
+            self.provisional_text
+        )
+        if key != self._full_transcript_key:
+            parts = [
+                part for part in (
+                    self.validated_rope.text,
+                    self.final_rope.text,
+                    self.provisional_text
+                ) if part
+            ]
+            self._full_transcript_cache = " ".join(parts).strip()
+            self._full_transcript_key = key
+        return self._full_transcript_cache
+
+    @property
+    def transcript_length(self) -> int:
+        """Długość pełnej transkrypcji (O(1), bez sklejania)."""
+        lengths = [
+            n for n in (
+                self.validated_rope.char_length,
+                self.final_rope.char_length,
+                len(self.provisional_text)
+            ) if n
+        ]
+        return sum(lengths) + max(0, len(lengths) - 1)
+
+    def transcript_tail(self, max_chars: int) -> str:
+        """
+        Końcówka pełnej transkrypcji (ostatnie całe segmenty, ok. max_chars).
+
+        Koszt zależy od rozmiaru okna, nie od długości wizyty.
+        """
+        recent = " ".join(
+            part for part in (self.final_rope.text, self.provisional_text) if part
+        )
+        budget = max_chars - len(recent)
+        if budget <= 0 or not self.validated_rope:
+            return recent
+        older = self.validated_rope.tail(budget)
+        return f"{older} {recent}".strip()
 
     @property
     def words_since_last_regen(self) -> int:
@@ -693,37 +794,6 @@ class LiveState:
         """Sprawdza czy w ostatnim final jest znak zapytania."""
         return "?" in self.final_text
 
-    def _rebuild_full_transcript(self):
-        """Odbudowuje pełną transkrypcję."""
-        parts = []
-        if self.validated_text:
-            parts.append(self.validated_text)
-        if self.final_text:
-            parts.append(self.final_text)
-        if self.provisional_text:
-            parts.append(self.provisional_text)
-        self._full_transcript = " ".join(parts).strip()
-
-    def _smart_join(self, existing: str, new: str) -> str:
-        """Inteligentne łączenie tekstu."""
-        existing = existing.strip()
-        new = new.strip()
-
-        if not existing:
-            return new
-        if not new:
-            return existing
-
-        # Po interpunkcji - spacja
-        if existing[-1] in '.!?':
-            return existing + ' ' + new
-
-        # Wielka litera = nowe zdanie
-        if new[0].isupper():
-            return existing + '. ' + new
-
-        return existing + ' ' + new
-
     def _notify_transcript_change(self):
         if self._on_transcript_change:
             try:
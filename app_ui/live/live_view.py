@@ -10,6 +10,7 @@ from typing import Optional, List
 from app_ui.components.header import create_header
 from app_ui.live.live_state import LiveState, SessionStatus, Suggestion, CardsMode
 from app_ui.live.live_ai_controller import AIController
+from app_ui.live.ui_scheduler import UIUpdateScheduler
 from app_ui.live.components.transcript_panel import TranscriptPanel
 from app_ui.live.components.prompter_panel import PrompterPanel
 from app_ui.live.components.pipeline_panel import PipelinePanel
@@ -17,6 +18,9 @@ from app_ui.live.components.qa_collection_panel import QACollectionPanel
 from app_ui.live.components.active_question_panel import ActiveQuestionPanel
 from app_ui.live.components.desk_styles import inject_desk_styles
 from app_ui.live.components.feedback import inject_feedback_script
+from app_ui.live.components.latency_overlay import LatencyOverlay
+from core import latency_trace
+from core.services.visit_draft_service import hand_off_visit_drafts
 from app_ui.live.ui_labels import (
     STATUS_READY,
     STATUS_RECORDING,
@@ -35,11 +39,12 @@ except ImportError:
 
 # Diarization service (opcjonalny)
 try:
-    from core.diarization import get_diarization_service, DiarizationService
+    from core.diarization import get_diarization_service, DiarizationService, LiveDiarizationSession
     DIARIZATION_AVAILABLE = True
 except ImportError:
     get_diarization_service = None
     DiarizationService = None
+    LiveDiarizationSession = None
     DIARIZATION_AVAILABLE = False
 
 # Specialization Manager (opcjonalny)
@@ -174,18 +179,23 @@ class LiveInterviewView:
         self._transcript_size = 'peek'
         self._prompter_size = 'full'
 
-        # Diarization service
-        self.diarization_service: Optional[DiarizationService] = None
-        if DIARIZATION_AVAILABLE:
-            self.diarization_service = get_diarization_service()
-            print(f"[LIVE] Diarization available: {self.diarization_service.backend.name if self.diarization_service.backend else 'None'}", flush=True)
+        # Diarization service - tworzony przy pierwszym nagraniu (diarization_service)
+        self._diarization_service: Optional[DiarizationService] = None
+        # Diaryzacja na żywo (segmenty finalne oznaczane w trakcie nagrywania)
+        self._live_diarization: Optional['LiveDiarizationSession'] = None
 
         # Model status refs
         self._model_status_container = None
         self.pipeline_panel: Optional[PipelinePanel] = None
+        self.latency_overlay: Optional[LatencyOverlay] = None
         self._pipeline_loading: bool = False
         self._client = None
+        self._drafts_handed_off = False  # Szkice przekazane ekranowi głównemu
         self._timers = []
+
+        # Wspólny scheduler renderów (jeden flush na klatkę dla wszystkich paneli)
+        self.ui_scheduler = UIUpdateScheduler()
+        self._desk_signature = None
         # Script dialog state (decision mode)
         self._script_dialog = None
         self._script_dialog_key = None
@@ -196,9 +206,21 @@ class LiveInterviewView:
         self._script_dialog_payload = None
         self._script_cache = {}
 
+    @property
+    def diarization_service(self) -> Optional['DiarizationService']:
+        """Serwis diaryzacji - inicjalizowany leniwie (nie spowalnia otwarcia widoku)."""
+        if self._diarization_service is None and DIARIZATION_AVAILABLE:
+            self._diarization_service = get_diarization_service()
+            backend = self._diarization_service.backend
+            print(f"[LIVE] Diarization available: {backend.name if backend else 'None'}", flush=True)
+        return self._diarization_service
+
     def create_ui(self):
         """Buduje interfejs użytkownika."""
 
+        # Scheduler musi znać klienta zanim panele zaczną się rejestrować
+        self.ui_scheduler.attach(ui.context.client)
+
         # Timer do aktualizacji statusu w headerze
         self._timers.append(ui.timer(1.0, self.app._update_status_ui))
         # Timer do aktualizacji statusu modeli
@@ -240,7 +262,7 @@ class LiveInterviewView:
                     with ui.row().classes('items-center gap-1'):
                         self._transcript_size_btn = ui.button(icon='open_in_full', on_click=self._toggle_transcript_size).props('flat dense').classes('overlay-btn')
                         ui.button(icon='close', on_click=lambda: self._set_transcript_visible(False)).props('flat dense').classes('overlay-btn')
-                self.transcript_panel = TranscriptPanel(self.state)
+                self.transcript_panel = TranscriptPanel(self.state, scheduler=self.ui_scheduler)
                 self.transcript_panel.create()
                 if self.transcript_panel.container:
                     self.transcript_panel.container.classes(add='live-panel live-transcript-panel flex-1 min-h-0')
@@ -262,7 +284,8 @@ class LiveInterviewView:
                     on_new_pool=self._request_new_pool,
                     on_cards_mode_change=self._set_cards_mode,
                     on_card_click=self._on_card_click,
-                    show_record_button=False
+                    show_record_button=False,
+                    scheduler=self.ui_scheduler
                 )
                 self.prompter_panel.create()
                 if self.prompter_panel.container:
@@ -331,8 +354,16 @@ class LiveInterviewView:
             self._sync_size_button(self._transcript_size_btn, self._transcript_size)
             self._sync_size_button(self._prompter_size_btn, self._prompter_size)
 
-        # Dock status refresh
-        self._timers.append(ui.timer(0.6, self._update_desk_ui))
+        # Dock status refresh: na żądanie (mark_dirty) + rzadki heartbeat dla zmian
+        # bez powiadomień (np. usunięcie pary Q+A); render pomija niezmieniony stan
+        self.ui_scheduler.register("desk", self._update_desk_ui, heartbeat=1.0)
+        self._update_desk_ui()
+
+        # Nakładka deweloperska p50/p95 (tylko przy --trace-latency)
+        if latency_trace.ENABLED:
+            self.latency_overlay = LatencyOverlay()
+            self.latency_overlay.create()
+            self.ui_scheduler.register("latency", self.latency_overlay.update, heartbeat=1.0)
 
         # AI Controller callbacks
         self.ai_controller.on_regen_start(self._on_ai_start)
@@ -525,6 +556,12 @@ class LiveInterviewView:
             return
 
         recording = self.state.status == SessionStatus.RECORDING
+        current, target = self.state.qa_progress
+        signature = (recording, current, target)
+        if signature == self._desk_signature:
+            return
+        self._desk_signature = signature
+
         if recording:
             self._record_btn.text = 'STOP'
             self._record_btn.props('icon=stop')
@@ -538,7 +575,6 @@ class LiveInterviewView:
             self._status_badge.text = STATUS_READY
             self._status_badge.classes(remove='live-status-live')
 
-        current, target = self.state.qa_progress
         self._progress_badge.text = f'{current}/{target}'
 
     async def _on_disconnect(self):
@@ -550,11 +586,18 @@ class LiveInterviewView:
             except Exception:
                 pass
         self._timers = []
+        self.ui_scheduler.close()
 
         if self.transcriber:
             self.transcriber.stop()
         if self.ai_controller:
             self.ai_controller.force_stop()
+            # Szkice nieprzekazane dalej (zamknięta karta) nikomu się nie przydadzą
+            if not self._drafts_handed_off:
+                self.ai_controller.drafts.cancel()
+        if self._live_diarization:
+            self._live_diarization.close()
+            self._live_diarization = None
         if self.active_question_panel:
             try:
                 self.active_question_panel.destroy()
@@ -761,13 +804,23 @@ class LiveInterviewView:
 
         # Reset stanu
         self.state.reset()
+        self.ai_controller.start_drafts()
         if self.transcript_panel:
             self.transcript_panel.clear()
         self.state.set_status(SessionStatus.RECORDING)
+        self.ui_scheduler.mark_dirty("desk")
         
         # Ustaw event loop dla AI controller (do thread-safe scheduling)
         self.ai_controller.set_event_loop(asyncio.get_running_loop())
 
+        # Nowa sesja diaryzacji na żywo
+        if self._live_diarization:
+            self._live_diarization.close()
+        self._live_diarization = None
+        # (tylko gdy skonfigurowany backend to spektralny - inaczej po nagraniu)
+        if self.diarization_service:
+            self._live_diarization = self.diarization_service.start_live_session(sample_rate=16000)
+
         # Start transcriber (używa wewnętrznych modeli cascade: tiny → medium → large)
         self.transcriber.start(
             callback_provisional=self._on_provisional,
@@ -786,6 +839,7 @@ class LiveInterviewView:
 
         # 1. Natychmiast zmień status (UI responsywne)
         self.state.set_status(SessionStatus.IDLE)
+        self.ui_scheduler.mark_dirty("desk")
         
         # 2. Zatrzymaj regenerację (ale NIE walidację)
         self.ai_controller.stop()
@@ -857,6 +911,7 @@ class LiveInterviewView:
                 self.transcriber.stop()
             self.ai_controller.stop()
             self.state.set_status(SessionStatus.PAUSED)
+            self.ui_scheduler.mark_dirty("desk")
 
         # Zbierz pełny transkrypt
         final_transcript = self.state.full_transcript
@@ -868,6 +923,9 @@ class LiveInterviewView:
             else:
                 final_transcript = qa_section
 
+        # Ostatni przebieg szkicu SOAP/ICD (tylko tekst po poprzednim przebiegu)
+        self.ai_controller.drafts.schedule_pass(self.state.full_transcript)
+
         if self._client:
             with self._client:
                 if not final_transcript:
@@ -886,6 +944,23 @@ class LiveInterviewView:
             try:
                 self.state.set_diarization_processing(True)
 
+                # Segmenty oznaczone w trakcie nagrywania - zostaje tylko finalizacja
+                live_session, self._live_diarization = self._live_diarization, None
+                if live_session:
+                    # Ostatnie segmenty mogą jeszcze czekać w wątku diaryzacji
+                    await live_session.wait_pending()
+                if live_session and live_session.segments:
+                    total_duration = self.transcriber.full_audio_samples / 16000
+                    result = await self.diarization_service.finalize_live_session(
+                        live_session,
+                        total_duration=total_duration,
+                        word_timestamps=self.transcriber.word_store
+                    )
+                    self._apply_diarization_result(result)
+                    return
+                if live_session:
+                    live_session.close()
+
                 audio = self.transcriber.get_full_audio()
                 if len(audio) >= 16000:  # Min 1 sekunda
                     print(f"[LIVE] Running diarization on {len(audio)} samples...", flush=True)
@@ -894,18 +969,11 @@ class LiveInterviewView:
                     result = await self.diarization_service.diarize_with_transcript(
                         audio=audio,
                         transcript=final_transcript,
-                        sample_rate=16000
+                        sample_rate=16000,
+                        word_timestamps=self.transcriber.word_store
                     )
 
-                    self.state.set_diarization_result(result)
-                    print(f"[LIVE] Diarization done: {result.num_speakers} speakers, {len(result.segments)} segments", flush=True)
-
-                    # Zapisz transkrypt z mówcami do storage (opcjonalnie, jako backup)
-                    if result.segments:
-                        diarized_transcript = self.state.diarization.get_formatted_transcript()
-                        if self._client:
-                            with self._client:
-                                app.storage.user['live_transcript_diarized'] = diarized_transcript
+                    self._apply_diarization_result(result)
                 else:
                     print(f"[LIVE] Audio too short for diarization: {len(audio)} samples", flush=True)
 
@@ -916,10 +984,23 @@ class LiveInterviewView:
             finally:
                 self.state.set_diarization_processing(False)
 
+    def _apply_diarization_result(self, result) -> None:
+        """Zapisuje wynik diaryzacji w stanie i storage."""
+        self.state.set_diarization_result(result)
+        print(f"[LIVE] Diarization done: {result.num_speakers} speakers, {len(result.segments)} segments", flush=True)
+
+        # Zapisz transkrypt z mówcami do storage (opcjonalnie, jako backup)
+        if result.segments:
+            diarized_transcript = self.state.diarization.get_formatted_transcript()
+            if self._client:
+                with self._client:
+                    app.storage.user['live_transcript_diarized'] = diarized_transcript
+
     def _navigate_next(self):
         """Przechodzi do ekranu generowania opisu."""
         # Przygotuj finalny transkrypt (z mówcami jeśli są)
-        transcript = self.state.full_transcript
+        plain = self.state.full_transcript
+        transcript = plain
 
         if self.state.diarization and self.state.diarization.has_data and self.state.diarization.enabled:
             transcript = self.state.diarization.get_formatted_transcript()
@@ -932,11 +1013,18 @@ class LiveInterviewView:
                 transcript = transcript + "\n\n" + qa_section
             else:
                 transcript = qa_section
+            plain = plain + "\n\n" + qa_section if plain.strip() else qa_section
             print(f"[LIVE] Added {len(qa_pairs)} Q+A pairs to transcript", flush=True)
 
+        # Szkice SOAP/ICD liczono na tekście zwalidowanym, nie na wersji z mówcami
+        self.ai_controller.drafts.set_display_transcript(transcript, plain)
+
         if self._client:
             with self._client:
                 app.storage.user['live_transcript'] = transcript
+                # Szkice tej wizyty - odbierze je ekran główny (i dialog zapisu)
+                app.storage.user['live_drafts'] = hand_off_visit_drafts(self.ai_controller.drafts)
+                self._drafts_handed_off = True
                 print(f"[LIVE] Navigating next with {len(transcript)} chars", flush=True)
                 ui.navigate.to('/')
 
@@ -984,7 +1072,8 @@ class LiveInterviewView:
             return
 
         print(f"[LIVE] Provisional: {text[:50]}...", flush=True)
-        self.state.set_provisional(text)
+        with latency_trace.span("state_update", layer="provisional", start=start_sample):
+            self.state.set_provisional(text)
 
     def _on_improved(self, text: str, start_sample: int, end_sample: int):
         """Callback: tekst improved (kontekstowy)."""
@@ -1001,7 +1090,8 @@ class LiveInterviewView:
         prev_text = self.state.provisional_text
 
         # Zmień stan
-        self.state.set_improved(text)
+        with latency_trace.span("state_update", layer="improved", start=start_sample):
+            self.state.set_improved(text)
 
         # Trigger animację shimmer PO zmianie stanu (jeśli tekst się zmienił)
         if self.transcript_panel and prev_text and prev_text != text:
@@ -1020,7 +1110,8 @@ class LiveInterviewView:
         prev_provisional = self.state.provisional_text
 
         # Zmień stan
-        self.state.set_final(text)
+        with latency_trace.span("state_update", layer="final", start=start_sample):
+            self.state.set_final(text, start_sample, end_sample)
 
         # Trigger animację shimmer dla final
         # Dla final porównujemy z provisional (który właśnie został sfinalizowany)
@@ -1030,6 +1121,11 @@ class LiveInterviewView:
         # Trigger walidację AI (zawsze - również po STOP)
         self.ai_controller.on_final_text()
 
+        # Diaryzacja na żywo - analiza w wątku sesji, nie blokuje transkrypcji
+        if self._live_diarization and self.transcriber:
+            audio = self.transcriber.get_audio_slice(start_sample, end_sample)
+            self._live_diarization.add_segment(audio, text, start_sample, end_sample)
+
     # === CARD INTERACTION ===
 
     def _on_card_click(self, suggestion):
@@ -1233,9 +1329,7 @@ class LiveInterviewView:
                     self._script_expand_btn.props('loading=false')
             return
 
-        transcript = self.state.full_transcript or ""
-        if len(transcript) > 1600:
-            transcript = transcript[-1600:]
+        transcript = self.ai_controller.context_builder.build("script")
 
         try:
             spec_ids = self.ai_controller.current_spec_ids if self.ai_controller else None
@@ -1293,13 +1387,8 @@ class LiveInterviewView:
 
         answers: List[str] = []
         try:
-            if self.app.llm_service:
-                spec_ids = self.ai_controller.current_spec_ids if self.ai_controller else None
-                answers = await self.app.llm_service.generate_patient_answers(
-                    question,
-                    self.app.config,
-                    spec_ids=spec_ids
-                )
+            # Zwykle gotowe z prefetchu kontrolera (generowane przy pojawieniu się karty)
+            answers = await self.ai_controller.get_patient_answers(question)
         except Exception as e:
             print(f"[LIVE] Patient answers error: {e}", flush=True)
 
@@ -1356,6 +1445,7 @@ class LiveInterviewView:
 
     def _on_qa_pair_created(self, pair):
         """Callback: utworzono parę Q+A (manual lub auto)."""
+        self.ui_scheduler.mark_dirty("desk")
         try:
             if self.ai_controller:
                 self.ai_controller.on_qa_pair_created(pair.question, pair.answer)
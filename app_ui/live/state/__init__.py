@@ -7,10 +7,13 @@ from app_ui.live.state.active_question import (
     QuestionState,
 )
 from app_ui.live.state.qa_collector import QACollector, QAPair
+from app_ui.live.state.transcript_rope import TranscriptRope, TranscriptSegment
 
 __all__ = [
     'ActiveQuestionContext',
     'QuestionState',
     'QACollector',
     'QAPair',
+    'TranscriptRope',
+    'TranscriptSegment',
 ]
@@ -0,0 +1,184 @@
+"""
+Transcript Rope - transkrypcja jako lista segmentów append-only.
+
+Zamiast sklejać coraz dłuższy string przy każdej aktualizacji, warstwa
+transkrypcji trzyma listę segmentów z narastającymi długościami i liczbą
+słów. Dopisanie jest O(1) (zamortyzowane), okna ogona liczone są
+bisekcją, a pełny tekst sklejany dopiero przy odczycie (i cache'owany).
+"""
+
+import bisect
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+@dataclass
+class TranscriptSegment:
+    """Pojedynczy segment transkrypcji."""
+    text: str
+    start_sample: int = 0
+    end_sample: int = 0
+    is_validated: bool = False
+    separator: str = ""  # Łącznik z poprzednim segmentem ("", " ", ". ", "\n")
+
+
+class TranscriptRope:
+    """
+    Warstwa transkrypcji (np. validated / final).
+
+    - separator segmentu wylicza się jak w dotychczasowym łączeniu tekstu:
+      spacja po interpunkcji, ". " przed wielką literą, "\\n" na życzenie
+    - generation zmienia się przy clear() - po nim wcześniejsze indeksy
+      segmentów są nieważne
+    """
+
+    def __init__(self):
+        self._segments: List[TranscriptSegment] = []
+        self._pieces: List[str] = []       # separator + tekst
+        self._char_ends: List[int] = []    # narastająca długość tekstu
+        self._word_ends: List[int] = []    # narastająca liczba słów
+        self._text_cache: Optional[str] = None
+        self.generation = 0
+
+    def __len__(self) -> int:
+        """Liczba segmentów."""
+        return len(self._segments)
+
+    def __bool__(self) -> bool:
+        return bool(self._segments)
+
+    @property
+    def char_length(self) -> int:
+        return self._char_ends[-1] if self._char_ends else 0
+
+    @property
+    def word_count(self) -> int:
+        return self._word_ends[-1] if self._word_ends else 0
+
+    @property
+    def segments(self) -> List[TranscriptSegment]:
+        return list(self._segments)
+
+    @property
+    def last_segment(self) -> Optional[TranscriptSegment]:
+        return self._segments[-1] if self._segments else None
+
+    @property
+    def span(self) -> Tuple[int, int]:
+        """Zakres próbek (od początku pierwszego do końca ostatniego segmentu)."""
+        if not self._segments:
+            return 0, 0
+        return self._segments[0].start_sample, self._segments[-1].end_sample
+
+    @property
+    def text(self) -> str:
+        """Pełny tekst warstwy (sklejany leniwie)."""
+        if self._text_cache is None:
+            self._text_cache = "".join(self._pieces)
+        return self._text_cache
+
+    def append(
+        self,
+        text: str,
+        start_sample: int = 0,
+        end_sample: int = 0,
+        is_validated: bool = False,
+        newline: bool = False
+    ) -> Optional[TranscriptSegment]:
+        """Dopisuje segment (pusty tekst jest ignorowany)."""
+        text = text.strip()
+        if not text:
+            return None
+
+        separator = self._separator(text, newline)
+        segment = TranscriptSegment(
+            text=text,
+            start_sample=start_sample,
+            end_sample=end_sample,
+            is_validated=is_validated,
+            separator=separator
+        )
+        piece = separator + text
+
+        self._segments.append(segment)
+        self._pieces.append(piece)
+        self._char_ends.append(self.char_length + len(piece))
+        self._word_ends.append(self.word_count + len(text.split()))
+        self._text_cache = None
+        return segment
+
+    def clear(self) -> None:
+        self._segments = []
+        self._pieces = []
+        self._char_ends = []
+        self._word_ends = []
+        self._text_cache = None
+        self.generation += 1
+
+    def drop_head(self, count: int) -> None:
+        """
+        Usuwa count pierwszych segmentów (np. final po walidacji części).
+
+        Przebudowuje warstwę (O(n)) - przeznaczone dla krótkich warstw.
+        """
+        if count <= 0:
+            return
+        remaining = self._segments[count:]
+        self.clear()
+        for segment in remaining:
+            self.append(
+                segment.text,
+                segment.start_sample,
+                segment.end_sample,
+                is_validated=segment.is_validated,
+                newline=segment.separator == "\n"
+            )
+
+    def text_since(self, index: int) -> str:
+        """Tekst dopisany od segmentu o danym indeksie (z separatorem)."""
+        return "".join(self._pieces[index:])
+
+    def text_range(self, start: int, end: int) -> str:
+        """Tekst segmentów [start, end) (bez separatora pierwszego)."""
+        if start >= end:
+            return ""
+        return self._segments[start].text + "".join(self._pieces[start + 1:end])
+
+    def tail_start(self, max_chars: int) -> int:
+        """Indeks pierwszego segmentu okna tail(max_chars)."""
+        total = self.char_length
+        if total <= max_chars:
+            return 0
+        index = bisect.bisect_left(self._char_ends, total - max_chars)
+        return min(index + 1, len(self._segments) - 1)
+
+    def tail(self, max_chars: int) -> str:
+        """Ostatnie pełne segmenty mieszczące się (w przybliżeniu) w max_chars."""
+        if self.char_length <= max_chars:
+            return self.text
+        return self._from_segment(self.tail_start(max_chars))
+
+    def tail_words(self, max_words: int) -> str:
+        """Ostatnie pełne segmenty zawierające (w przybliżeniu) max_words słów."""
+        total = self.word_count
+        if total <= max_words:
+            return self.text
+        index = bisect.bisect_left(self._word_ends, total - max_words)
+        return self._from_segment(min(index + 1, len(self._segments) - 1))
+
+    def _from_segment(self, index: int) -> str:
+        """Tekst od segmentu index (bez jego separatora)."""
+        return self._segments[index].text + "".join(self._pieces[index + 1:])
+
+    def _separator(self, text: str, newline: bool) -> str:
+        if not self._pieces:
+            return ""
+        if newline:
+            return "\n"
+        # Po interpunkcji - spacja; wielka litera = nowe zdanie
+        last_char = self._pieces[-1][-1]
+        if last_char in '.!?':
+            return " "
+        if text[0].isupper():
+            return ". "
+        return " "
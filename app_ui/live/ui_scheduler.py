@@ -0,0 +1,186 @@
+"""
+UI Update Scheduler - koalescencja aktualizacji UI.
+
+Callbacki LiveState przychodzą z wątków transkrypcji/AI, często seriami
+(np. improved + final w tej samej chwili). Zamiast renderować przy każdym
+z nich, komponent oznacza się jako "brudny", a scheduler wykonuje render
+najwyżej raz na interwał (domyślnie ~1 klatka), zawsze w event loop
+i w kontekście klienta NiceGUI.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Callable, Dict, Optional, List
+
+from core import latency_trace
+
+
+class UIUpdateScheduler:
+    """
+    Scheduler aktualizacji UI dla jednego klienta.
+
+    Użycie:
+        scheduler.attach(ui.context.client)            # w event loop
+        scheduler.register("transcript", panel._flush)  # raz
+        scheduler.mark_dirty("transcript")              # z dowolnego wątku
+    """
+
+    # ~30 FPS - częściej i tak nie ma sensu wysyłać zmian przez websocket
+    DEFAULT_INTERVAL = 1 / 30
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self._callbacks: Dict[str, Callable[[], None]] = {}
+        self._order: List[str] = []
+        self._heartbeats: Dict[str, float] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._scheduled = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._heartbeat_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._last_flush = 0.0
+        self._closed = False
+        self._first_mark_ns = 0  # latency_trace: pierwsze oznaczenie od ostatniego flush
+
+        # Statystyki
+        self.marks = 0
+        self.flushes = 0
+        self.renders = 0
+
+    def attach(self, client, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Wiąże scheduler z klientem i event loop (wołać z event loop)."""
+        self._client = client
+        self._loop = loop or asyncio.get_event_loop()
+        self._closed = False
+        for key in list(self._heartbeats):
+            self._start_heartbeat(key)
+
+    def register(
+        self,
+        key: str,
+        callback: Callable[[], None],
+        heartbeat: Optional[float] = None
+    ) -> None:
+        """
+        Rejestruje komponent.
+
+        Args:
+            key: Nazwa komponentu
+            callback: Render wykonywany przy flush (w kontekście klienta)
+            heartbeat: Opcjonalnie - oznacz jako brudny co N sekund
+                (dla stanu bez powiadomień; render powinien być idempotentny)
+        """
+        if key not in self._callbacks:
+            self._order.append(key)
+        self._callbacks[key] = callback
+        if heartbeat:
+            self._heartbeats[key] = heartbeat
+            if self._loop is not None:
+                self._start_heartbeat(key)
+
+    def mark_dirty(self, *keys: str) -> None:
+        """Oznacza komponenty do odświeżenia (bezpieczne wątkowo)."""
+        with self._lock:
+            self._dirty.update(keys)
+            self.marks += 1
+            if self._scheduled or self._closed or self._loop is None:
+                return
+            self._scheduled = True
+            if latency_trace.ENABLED:
+                self._first_mark_ns = latency_trace.now()
+
+        if self._in_loop_thread():
+            self._schedule_flush()
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._schedule_flush)
+            except RuntimeError:
+                # Loop zamknięty
+                with self._lock:
+                    self._scheduled = False
+
+    def flush_now(self) -> None:
+        """Natychmiastowy flush (z event loop)."""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._flush()
+
+    def close(self) -> None:
+        """Zatrzymuje scheduler (np. przy rozłączeniu klienta)."""
+        with self._lock:
+            self._closed = True
+            self._dirty.clear()
+            self._scheduled = False
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for handle in self._heartbeat_handles.values():
+            handle.cancel()
+        self._heartbeat_handles.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Zwraca statystyki (ile oznaczeń zostało scalonych w jeden flush)."""
+        return {
+            "marks": self.marks,
+            "flushes": self.flushes,
+            "renders": self.renders,
+        }
+
+    def _in_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _schedule_flush(self) -> None:
+        """Planuje flush z zachowaniem min. odstępu (wywoływane w event loop)."""
+        delay = max(0.0, self._last_flush + self.interval - time.monotonic())
+        self._flush_handle = self._loop.call_later(delay, self._flush)
+
+    def _flush(self) -> None:
+        with self._lock:
+            keys = self._dirty
+            self._dirty = set()
+            self._scheduled = False
+            first_mark_ns, self._first_mark_ns = self._first_mark_ns, 0
+            if self._closed:
+                return
+        self._flush_handle = None
+        self._last_flush = time.monotonic()
+        if not keys:
+            return
+
+        # Czas od oznaczenia (np. update LiveState z wątku transkrypcji) do renderu
+        latency_trace.complete("render_wait", first_mark_ns)
+        self.flushes += 1
+        client = self._client
+        with latency_trace.span("render_flush", keys=sorted(keys)):
+            for key in self._order:
+                if key not in keys:
+                    continue
+                try:
+                    if client is not None:
+                        with client:
+                            self._callbacks[key]()
+                    else:
+                        self._callbacks[key]()
+                    self.renders += 1
+                except Exception as e:
+                    print(f"[UI-SCHED] Render '{key}' error: {e}", flush=True)
+
+    def _start_heartbeat(self, key: str) -> None:
+        old = self._heartbeat_handles.pop(key, None)
+        if old:
+            old.cancel()
+
+        def _beat():
+            if self._closed:
+                return
+            self.mark_dirty(key)
+            self._heartbeat_handles[key] = self._loop.call_later(self._heartbeats[key], _beat)
+
+        self._heartbeat_handles[key] = self._loop.call_later(self._heartbeats[key], _beat)
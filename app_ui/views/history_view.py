@@ -4,7 +4,10 @@ Widok historii wizyt.
 Wyświetla listę wizyt z filtrowaniem, paginacją i akcjami.
 """
 
+import asyncio
+import tempfile
 from datetime import datetime, date
+from pathlib import Path
 from typing import Optional, Callable
 from nicegui import ui
 
@@ -19,7 +22,6 @@ class HistoryView:
 
     def __init__(self, on_edit_visit: Optional[Callable[[Visit], None]] = None):
         self.visit_service = get_visit_service()
-        self.pdf_generator = get_pdf_generator()
         self.on_edit_visit = on_edit_visit
 
         # Stan filtrów
@@ -34,9 +36,14 @@ class HistoryView:
         self.grid = None
         self.pagination_label = None
         self.stats_label = None
+        self._client = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._export_button = None
 
     def create(self) -> None:
         """Tworzy widok historii."""
+        # Capture client context for async UI updates
+        self._client = ui.context.client
         with ui.column().classes('w-full gap-4 p-4'):
             self._create_header()
             self._create_filters()
@@ -53,6 +60,11 @@ class HistoryView:
 
             with ui.row().classes('items-center gap-4'):
                 self.stats_label = ui.label('').classes('text-gray-500')
+                self._export_button = ui.button(
+                    'Eksport PDF',
+                    icon='picture_as_pdf',
+                    on_click=self._on_export_batch
+                ).props('flat').tooltip('Wszystkie wizyty spełniające filtry - archiwum ZIP')
                 ui.button(
                     'Odśwież',
                     icon='refresh',
@@ -139,7 +151,7 @@ class HistoryView:
         # Obsługa eventów z tabeli
         self.grid.on('view_visit', lambda e: self._on_view_visit(e.args))
         self.grid.on('edit_visit', lambda e: self._on_edit_visit(e.args))
-        self.grid.on('export_visit_pdf', lambda e: self._on_export_pdf(e.args))
+        self.grid.on('export_visit_pdf', lambda e: asyncio.create_task(self._on_export_pdf(e.args)))
         self.grid.on('delete_visit', lambda e: self._on_delete_visit(e.args))
 
     def _create_pagination(self) -> None:
@@ -169,17 +181,33 @@ class HistoryView:
                 ).props('flat dense')
 
     def refresh_data(self) -> None:
-        """Odświeża dane w tabeli."""
+        """Odświeża dane w tabeli (zapytania w tle, bez blokowania UI)."""
+        # Nowsze odświeżenie zastępuje poprzednie (np. szybkie wpisywanie w wyszukiwarce)
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        self._refresh_task = asyncio.create_task(self._refresh_data_async())
+
+    async def _refresh_data_async(self) -> None:
+        """Pobiera dane z bazy w wątku roboczym i aktualizuje tabelę."""
         status = VisitStatus(self.status_filter) if self.status_filter else None
 
-        visits, total, total_pages = self.visit_service.get_visits(
-            status=status,
-            date_from=self.date_from,
-            date_to=self.date_to,
-            search=self.search_text if self.search_text else None,
-            page=self.current_page,
-            per_page=self.per_page
-        )
+        try:
+            visits, total, total_pages = await self.visit_service.get_visits_async(
+                status=status,
+                date_from=self.date_from,
+                date_to=self.date_to,
+                search=self.search_text if self.search_text else None,
+                page=self.current_page,
+                per_page=self.per_page
+            )
+            stats = await self.visit_service.get_statistics_async() if self.stats_label else None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self._client:
+                with self._client:
+                    ui.notify(f'Błąd odczytu historii: {e}', type='negative')
+            return
 
         # Przygotuj dane do tabeli
         row_data = []
@@ -204,8 +232,7 @@ class HistoryView:
             self.pagination_label.text = f'Wyświetlanie {start}-{end} z {total}'
 
         # Aktualizuj statystyki
-        if self.stats_label:
-            stats = self.visit_service.get_statistics()
+        if self.stats_label and stats:
             self.stats_label.text = f"Razem: {stats['total']} | Zakończone: {stats['completed']} | Szkice: {stats['drafts']}"
 
         # Zapisz total_pages do nawigacji
@@ -262,42 +289,110 @@ class HistoryView:
         self.current_page = max(1, min(page, max_page))
         self.refresh_data()
 
-    def _on_view_visit(self, visit_id: str) -> None:
+    async def _on_view_visit(self, visit_id: str) -> None:
         """Otwiera szczegóły wizyty."""
-        visit = self.visit_service.get_visit(visit_id)
+        visit = await self.visit_service.get_visit_async(visit_id)
+        if visit and self._client:
+            with self._client:
+                self._open_visit_detail(visit)
+
+    def _open_visit_detail(self, visit: Visit) -> None:
+        """Tworzy i otwiera dialog szczegółów wizyty."""
         if visit:
             from .visit_detail_view import VisitDetailDialog
             dialog = VisitDetailDialog(
                 visit=visit,
-                on_export_pdf=lambda v: self._on_export_pdf(v.id),
-                on_delete=lambda v: self._on_delete_visit(v.id),
+                on_export_pdf=lambda v: asyncio.create_task(self._on_export_pdf(v.id)),
+                on_delete=lambda v: asyncio.create_task(self._on_delete_visit(v.id)),
                 on_edit=self.on_edit_visit
             )
             dialog.open()
 
-    def _on_edit_visit(self, visit_id: str) -> None:
+    async def _on_edit_visit(self, visit_id: str) -> None:
         """Otwiera edycję wizyty."""
-        visit = self.visit_service.get_visit(visit_id)
-        if visit and self.on_edit_visit:
-            self.on_edit_visit(visit)
-
-    def _on_export_pdf(self, visit_id: str) -> None:
-        """Eksportuje wizytę do PDF."""
-        visit = self.visit_service.get_visit(visit_id)
-        if visit:
-            try:
-                path = self.pdf_generator.generate_visit_report(visit, open_after=True)
-                ui.notify(f'PDF wygenerowany: {path}', type='positive')
-            except Exception as e:
-                ui.notify(f'Błąd generowania PDF: {e}', type='negative')
-
-    def _on_delete_visit(self, visit_id: str) -> None:
-        """Usuwa wizytę."""
-        if self.visit_service.delete_visit(visit_id):
-            ui.notify('Wizyta usunięta', type='positive')
-            self.refresh_data()
-        else:
-            ui.notify('Nie udało się usunąć wizyty', type='negative')
+        visit = await self.visit_service.get_visit_async(visit_id)
+        if visit and self.on_edit_visit and self._client:
+            with self._client:
+                self.on_edit_visit(visit)
+
+    @property
+    def pdf_generator(self):
+        """Generator PDF (singleton rozgrzany przy starcie aplikacji)."""
+        return get_pdf_generator()
+
+    async def _on_export_pdf(self, visit_id: str) -> None:
+        """Eksportuje wizytę do PDF (w wątku roboczym)."""
+        visit = await self.visit_service.get_visit_async(visit_id)
+        if not visit:
+            return
+        try:
+            path = await asyncio.to_thread(
+                lambda: self.pdf_generator.generate_visit_report(visit, open_after=True)
+            )
+            message, kind = f'PDF wygenerowany: {path}', 'positive'
+        except Exception as e:
+            message, kind = f'Błąd generowania PDF: {e}', 'negative'
+        if self._client:
+            with self._client:
+                ui.notify(message, type=kind)
+
+    async def _on_export_batch(self) -> None:
+        """Eksportuje wizyty z bieżących filtrów do archiwum ZIP (pula procesów)."""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_path = str(Path(tempfile.gettempdir()) / f"wizyty_{timestamp}.zip")
+        if self._export_button:
+            self._export_button.props('loading')
+        error = ""
+        try:
+            result = await asyncio.to_thread(
+                lambda: self.pdf_generator.export_visits(
+                    output_path,
+                    status=VisitStatus(self.status_filter) if self.status_filter else None,
+                    date_from=self.date_from,
+                    date_to=self.date_to,
+                    search=self.search_text or None,
+                )
+            )
+        except Exception as e:
+            print(f"[HISTORY] Batch export error: {e}", flush=True)
+            result = None
+            error = str(e)
+        finally:
+            if self._client and self._export_button:
+                with self._client:
+                    self._export_button.props(remove='loading')
+
+        if not self._client:
+            return
+        with self._client:
+            if result is None:
+                ui.notify(f'Błąd eksportu PDF: {error}', type='negative')
+            elif not result.visits:
+                ui.notify('Brak wizyt do eksportu', type='warning')
+            else:
+                exported = result.visits - len(result.failed)
+                ui.notify(
+                    f'Wyeksportowano {exported} wizyt ({result.pages} stron, '
+                    f'{result.pages_per_second:.1f} str/s): {result.output_path}',
+                    type='positive' if not result.failed else 'warning'
+                )
+
+    async def _on_delete_visit(self, visit_id: str) -> None:
+        """Usuwa wizytę (przez kolejkę zapisów)."""
+        try:
+            deleted = await self.visit_service.delete_visit_async(visit_id)
+        except Exception as e:
+            print(f"[HISTORY] Delete error: {e}", flush=True)
+            deleted = False
+
+        if not self._client:
+            return
+        with self._client:
+            if deleted:
+                ui.notify('Wizyta usunięta', type='positive')
+                self.refresh_data()
+            else:
+                ui.notify('Nie udało się usunąć wizyty', type='negative')
 
 
 def create_history_view(on_edit_visit: Optional[Callable[[Visit], None]] = None) -> HistoryView:
@@ -20,6 +20,7 @@ class AppConfig:
     live_enable_large: bool = True
     live_improved_interval: float = 5.0
     live_silence_threshold: float = 2.0
+    live_validation_llm_refine: bool = True  # LLM poprawia niepewną lokalną interpunkcję
     # Dane gabinetu / lekarza
     clinic_name: str = "Gabinet Medyczny"
     clinic_address: str = ""
@@ -6,7 +6,9 @@ Obsługuje rozpoznawanie mówców w nagraniach audio.
 
 from .base import DiarizationSegment, DiarizationResult, SpeakerRole
 from .service import DiarizationService, get_diarization_service
-from .merger import TranscriptMerger
+from .merger import TranscriptMerger, WordTimestamp
+from .word_store import WordTimestampStore
+from .live_session import LiveDiarizationSession, LiveSegment
 
 __all__ = [
     'DiarizationSegment',
@@ -15,4 +17,8 @@ __all__ = [
     'DiarizationService',
     'get_diarization_service',
     'TranscriptMerger',
+    'WordTimestamp',
+    'WordTimestampStore',
+    'LiveDiarizationSession',
+    'LiveSegment',
 ]
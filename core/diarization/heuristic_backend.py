@@ -39,14 +39,24 @@ class HeuristicDiarizationBackend(DiarizationBackend):
         """
         Wykonuje heurystyczną diaryzację.
 
+        Obliczenia (numpy) idą w wątku roboczym - nie blokują event loop.
+        """
+        return await asyncio.to_thread(self._diarize_sync, audio, sample_rate)
+
+    def _diarize_sync(
+        self,
+        audio: np.ndarray,
+        sample_rate: int = 16000
+    ) -> DiarizationResult:
+        """
+        Synchroniczna część diaryzacji.
+
         1. Wykrywa segmenty mowy (VAD prosty)
         2. Grupuje segmenty oddzielone długimi przerwami
         3. Przypisuje naprzemiennie speaker_id
         """
-        # Normalizuj audio
-        audio = audio.flatten().astype(np.float32)
-        if np.max(np.abs(audio)) > 0:
-            audio = audio / np.max(np.abs(audio))
+        # Bez kopii jeśli audio jest już ciągłym float32
+        audio = np.ascontiguousarray(audio, dtype=np.float32).reshape(-1)
 
         total_duration = len(audio) / sample_rate
 
@@ -83,7 +93,7 @@ class HeuristicDiarizationBackend(DiarizationBackend):
         # 4. Wstępne przypisanie ról
         # Założenie: pierwszy mówca = lekarz (zaczyna wizytę)
         speaker_mapping = {}
-        speaker_ids = list(set(s.speaker_id for s in segments))
+        speaker_ids = sorted(set(s.speaker_id for s in segments))
 
         if len(speaker_ids) >= 1:
             speaker_mapping[speaker_ids[0]] = SpeakerRole.DOCTOR
@@ -100,6 +110,27 @@ class HeuristicDiarizationBackend(DiarizationBackend):
 
         return result
 
+    def _frame_rms(
+        self,
+        audio: np.ndarray,
+        frame_length: int,
+        hop_length: int
+    ) -> np.ndarray:
+        """
+        RMS ramek liczone na widoku (bez kopiowania ramek).
+
+        Returns:
+            Tablica RMS dla ramek startujących co hop_length próbek
+        """
+        if len(audio) <= frame_length:
+            return np.zeros(0, dtype=np.float32)
+
+        frames = np.lib.stride_tricks.sliding_window_view(audio, frame_length)
+        # Ostatnia ramka kończy się przed końcem audio (jak range(0, len - frame_length, hop))
+        frames = frames[:len(audio) - frame_length:hop_length]
+        energy = np.einsum('ij,ij->i', frames, frames, dtype=np.float64)
+        return np.sqrt(energy / frame_length)
+
     def _detect_speech_segments(
         self,
         audio: np.ndarray,
@@ -115,35 +146,30 @@ class HeuristicDiarizationBackend(DiarizationBackend):
         frame_length = int(0.03 * sample_rate)
         hop_length = int(0.01 * sample_rate)
 
-        segments = []
-        in_speech = False
-        speech_start = 0
-
-        for i in range(0, len(audio) - frame_length, hop_length):
-            frame = audio[i:i + frame_length]
-            rms = np.sqrt(np.mean(frame ** 2))
-
-            time = i / sample_rate
-
-            if rms > self.silence_threshold:
-                if not in_speech:
-                    in_speech = True
-                    speech_start = time
-            else:
-                if in_speech:
-                    in_speech = False
-                    duration = time - speech_start
-                    if duration >= self.min_segment_duration:
-                        segments.append((speech_start, time))
-
-        # Zamknij ostatni segment
-        if in_speech:
-            end_time = len(audio) / sample_rate
-            duration = end_time - speech_start
-            if duration >= self.min_segment_duration:
-                segments.append((speech_start, end_time))
-
-        return segments
+        rms = self._frame_rms(audio, frame_length, hop_length)
+        if len(rms) == 0:
+            return []
+
+        # Próg względem szczytu (zamiast normalizacji całego audio)
+        peak = max(float(audio.max()), -float(audio.min()))
+        if peak <= 0:
+            return []
+        active = rms > self.silence_threshold * peak
+
+        # Run-length: początki i końce ciągów aktywnych ramek
+        padded = np.concatenate(([False], active, [False])).astype(np.int8)
+        edges = np.diff(padded)
+        start_frames = np.flatnonzero(edges == 1)
+        end_frames = np.flatnonzero(edges == -1)
+
+        starts = start_frames * hop_length / sample_rate
+        ends = end_frames * hop_length / sample_rate
+        # Segment trwający do ostatniej ramki zamykamy na końcu audio
+        if len(end_frames) and end_frames[-1] == len(active):
+            ends[-1] = len(audio) / sample_rate
+
+        keep = (ends - starts) >= self.min_segment_duration
+        return list(zip(starts[keep].tolist(), ends[keep].tolist()))
 
     def _group_into_utterances(
         self,
@@ -0,0 +1,252 @@
+"""
+Diaryzacja na żywo.
+
+Sesja dostaje kolejne sfinalizowane segmenty z StreamingTranscriber
+(audio + tekst), od razu liczy cechy głosu i przypisuje mówcę, utrzymując
+model mówców (online k-means) przez całą wizytę. Po zakończeniu wizyty
+zostaje tylko ponowne przypisanie okien gotowymi centroidami - bez
+ponownej analizy całego nagrania.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Tuple, Optional, Callable
+
+import numpy as np
+
+from .base import DiarizationResult, DiarizationSegment, SpeakerRole
+from .spectral_backend import (
+    SpectralDiarizationBackend,
+    SpectralFeatureExtractor,
+    OnlineSpeakerClustering,
+)
+
+
+@dataclass
+class LiveSegment:
+    """Sfinalizowany segment transkrypcji z przypisanym mówcą."""
+    start_time: float
+    end_time: float
+    text: str
+    speaker: int = 0
+    confidence: float = 0.5
+    # Okna analizy: (start, end, cechy) - czasy bezwzględne w sekundach
+    windows: List[Tuple[float, float, Optional[np.ndarray]]] = field(default_factory=list)
+
+    @property
+    def speaker_id(self) -> str:
+        return f"SPEAKER_{self.speaker:02d}"
+
+
+class LiveDiarizationSession:
+    """
+    Przyrostowa diaryzacja jednej sesji nagrywania.
+
+    - add_segment() jest bezpieczne wątkowo i nie blokuje (wołane z wątku
+      transkrypcji) - analiza wykonuje się w jednym wątku roboczym, po kolei
+    - on_segment_labeled(segment) jest wołane po przypisaniu mówcy
+    - wait_pending() czeka na segmenty jeszcze analizowane w wątku roboczym
+    - finalize() czeka na zaległe segmenty i zwraca DiarizationResult
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = 16000,
+        n_speakers: int = 2,
+        on_segment_labeled: Optional[Callable[[LiveSegment], None]] = None
+    ):
+        self.sample_rate = sample_rate
+        self.on_segment_labeled = on_segment_labeled
+
+        self._backend = SpectralDiarizationBackend(n_speakers=n_speakers)
+        self._extractor = SpectralFeatureExtractor(sample_rate)
+        self._clustering = OnlineSpeakerClustering(n_speakers=n_speakers)
+
+        self._segments: List[LiveSegment] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LiveDiarization")
+        self._closed = False
+
+    @property
+    def segments(self) -> List[LiveSegment]:
+        """Kopia listy dotychczas oznaczonych segmentów."""
+        with self._lock:
+            return list(self._segments)
+
+    def add_segment(
+        self,
+        audio: np.ndarray,
+        text: str,
+        start_sample: int,
+        end_sample: int
+    ) -> None:
+        """
+        Dodaje sfinalizowany segment do analizy.
+
+        Args:
+            audio: Audio segmentu (od start_sample)
+            text: Tekst finalny segmentu
+            start_sample: Początek segmentu w pełnym nagraniu
+            end_sample: Koniec segmentu w pełnym nagraniu
+        """
+        if self._closed or audio is None or len(audio) == 0:
+            return
+        try:
+            self._executor.submit(self._process_segment, audio, text, start_sample, end_sample)
+        except RuntimeError:
+            # Executor zamknięty w międzyczasie
+            pass
+
+    def _process_segment(
+        self,
+        audio: np.ndarray,
+        text: str,
+        start_sample: int,
+        end_sample: int
+    ) -> None:
+        try:
+            audio = np.ascontiguousarray(audio, dtype=np.float32).reshape(-1)
+            offset = start_sample / self.sample_rate
+            end_time = max(end_sample, start_sample + len(audio)) / self.sample_rate
+
+            windows = []
+            for start, end in self._backend.speech_windows(audio, self.sample_rate):
+                chunk = audio[int(start * self.sample_rate):int(end * self.sample_rate)]
+                windows.append((offset + start, offset + end, self._extractor.extract(chunk)))
+
+            segment = LiveSegment(start_time=offset, end_time=end_time, text=text, windows=windows)
+
+            # Online: ucz model i od razu oznacz segment
+            labels = [
+                self._clustering.assign(feat) if feat is not None else None
+                for _, _, feat in windows
+            ]
+            with self._lock:
+                previous = self._segments[-1] if self._segments else None
+            self._label_segment(segment, labels, previous)
+
+            with self._lock:
+                self._segments.append(segment)
+
+            if self.on_segment_labeled:
+                try:
+                    self.on_segment_labeled(segment)
+                except Exception as cb_err:
+                    print(f"[DIARIZATION] Live callback error: {cb_err}", flush=True)
+
+        except Exception as e:
+            print(f"[DIARIZATION] Live segment error: {e}", flush=True)
+
+    def _label_segment(
+        self,
+        segment: LiveSegment,
+        labels: List[Optional[Tuple[int, float]]],
+        previous: Optional[LiveSegment]
+    ) -> None:
+        """Mówca segmentu = mówca z największym czasem mowy w oknach."""
+        votes: dict = {}
+        confidences: dict = {}
+        for (start, end, _), label in zip(segment.windows, labels):
+            if label is None:
+                continue
+            speaker, confidence = label
+            votes[speaker] = votes.get(speaker, 0.0) + (end - start)
+            confidences.setdefault(speaker, []).append(confidence)
+
+        if not votes:
+            # Brak mowy w oknach - dziedziczy mówcę poprzedniego segmentu
+            if previous:
+                segment.speaker, segment.confidence = previous.speaker, 0.5
+            return
+
+        segment.speaker = max(votes, key=votes.get)
+        segment.confidence = float(np.mean(confidences[segment.speaker]))
+
+    def _finalize_sync(self, total_duration: float, by_windows: bool = False) -> DiarizationResult:
+        """
+        Przelicza etykiety ustabilizowanym modelem i buduje wynik.
+
+        by_windows=True zwraca segmenty na poziomie okien (bez tekstu) -
+        do połączenia z timestampami słów, gdy segment finalny obejmuje
+        wypowiedzi obu mówców.
+        """
+        self._clustering.refine()
+
+        with self._lock:
+            live_segments = list(self._segments)
+
+        previous = None
+        window_turns: List[Tuple[Tuple[float, float], Tuple[int, float]]] = []
+        for segment in live_segments:
+            labels = [
+                self._clustering.predict(feat) if feat is not None else None
+                for _, _, feat in segment.windows
+            ]
+            self._label_segment(segment, labels, previous)
+            previous = segment
+            for (start, end, _), label in zip(segment.windows, labels):
+                window_turns.append(((start, end), label or (segment.speaker, segment.confidence)))
+
+        if live_segments:
+            total_duration = max(total_duration, live_segments[-1].end_time)
+
+        if by_windows and window_turns:
+            windows = [w for w, _ in window_turns]
+            labels = [label for _, label in window_turns]
+            return SpectralDiarizationBackend.build_result(
+                self._backend._merge_windows(windows, labels),
+                total_duration
+            )
+
+        # Połącz kolejne segmenty tego samego mówcy
+        segments: List[DiarizationSegment] = []
+        for live in live_segments:
+            last = segments[-1] if segments else None
+            if last and last.speaker_id == live.speaker_id:
+                last.end_time = live.end_time
+                last.text = f"{last.text} {live.text}".strip()
+                last.confidence = min(last.confidence, live.confidence)
+            else:
+                segments.append(DiarizationSegment(
+                    start_time=live.start_time,
+                    end_time=live.end_time,
+                    speaker_id=live.speaker_id,
+                    role=SpeakerRole.UNKNOWN,
+                    text=live.text,
+                    confidence=live.confidence
+                ))
+
+        return SpectralDiarizationBackend.build_result(segments, total_duration)
+
+    async def wait_pending(self) -> None:
+        """Czeka, aż wątek roboczy przetworzy segmenty dodane do tej pory."""
+        if self._closed:
+            return
+        loop = asyncio.get_event_loop()
+        try:
+            # Executor ma jeden wątek - puste zadanie wykona się po zaległych
+            await loop.run_in_executor(self._executor, lambda: None)
+        except RuntimeError:
+            # Executor zamknięty w międzyczasie
+            pass
+
+    async def finalize(self, total_duration: float = 0.0, by_windows: bool = False) -> DiarizationResult:
+        """
+        Kończy sesję: czeka na zaległe segmenty i zwraca wynik diaryzacji.
+
+        Domyślnie segmenty mają już przypisany tekst (z transkrypcji finalnej).
+        """
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(
+                self._executor, self._finalize_sync, total_duration, by_windows
+            )
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Zamyka wątek roboczy (bez czekania na zaległe segmenty)."""
+        self._closed = True
+        self._executor.shutdown(wait=False)
@@ -4,11 +4,14 @@ Merger transkrypcji z diaryzacją.
 Łączy wyniki transkrypcji (z timestampami słów) z diaryzacją (segmenty mówców).
 """
 
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Union, TYPE_CHECKING
 from dataclasses import dataclass
 
 from .base import DiarizationSegment, DiarizationResult, SpeakerRole
 
+if TYPE_CHECKING:
+    from .word_store import WordTimestampStore
+
 
 @dataclass
 class WordTimestamp:
@@ -35,35 +38,46 @@ class TranscriptMerger:
 
     def merge(
         self,
-        words: List[WordTimestamp],
+        words: Union[List[WordTimestamp], "WordTimestampStore"],
         diarization: DiarizationResult
     ) -> List[DiarizationSegment]:
         """
         Łączy słowa z timestampami z segmentami diaryzacji.
 
+        Słowa i segmenty są przeglądane jednym przebiegiem (po posortowaniu
+        po czasie), więc koszt jest liniowy względem liczby słów i segmentów.
+
         Args:
-            words: Lista słów z timestampami
+            words: Lista słów z timestampami lub WordTimestampStore
             diarization: Wynik diaryzacji
 
         Returns:
             Lista segmentów z przypisanym tekstem
         """
-        if not words or not diarization.segments:
+        if hasattr(words, "arrays"):
+            texts, starts, ends = words.arrays()
+        else:
+            texts = [w.word for w in words]
+            starts = [w.start_time for w in words]
+            ends = [w.end_time for w in words]
+
+        if not texts or not diarization.segments:
             return diarization.segments
 
-        # Dla każdego słowa znajdź najlepszy segment
+        segments = diarization.segments
+        assignments = self._assign_words(starts, ends, segments)
+
         word_assignments: Dict[int, List[str]] = {
-            i: [] for i in range(len(diarization.segments))
+            i: [] for i in range(len(segments))
         }
-
-        for word in words:
-            best_segment_idx = self._find_best_segment(word, diarization.segments)
-            if best_segment_idx is not None:
-                word_assignments[best_segment_idx].append(word.word)
+        for word_idx in sorted(range(len(texts)), key=lambda i: starts[i]):
+            segment_idx = assignments[word_idx]
+            if segment_idx is not None:
+                word_assignments[segment_idx].append(texts[word_idx])
 
         # Przypisz tekst do segmentów
         result_segments = []
-        for i, segment in enumerate(diarization.segments):
+        for i, segment in enumerate(segments):
             new_segment = DiarizationSegment(
                 start_time=segment.start_time,
                 end_time=segment.end_time,
@@ -76,36 +90,66 @@ class TranscriptMerger:
 
         return result_segments
 
-    def _find_best_segment(
+    def _assign_words(
         self,
-        word: WordTimestamp,
+        starts,
+        ends,
         segments: List[DiarizationSegment]
-    ) -> Optional[int]:
-        """Znajduje indeks najlepiej pasującego segmentu dla słowa."""
-        word_mid = (word.start_time + word.end_time) / 2
-
-        best_idx = None
-        best_overlap = 0
-
-        for i, segment in enumerate(segments):
-            # Sprawdź czy środek słowa jest w segmencie
-            if segment.start_time <= word_mid <= segment.end_time:
-                return i
-
-            # Sprawdź overlap
-            overlap_start = max(word.start_time, segment.start_time)
-            overlap_end = min(word.end_time, segment.end_time)
-
-            if overlap_start < overlap_end:
-                overlap = overlap_end - overlap_start
-                word_duration = word.end_time - word.start_time
-                overlap_ratio = overlap / word_duration if word_duration > 0 else 0
-
-                if overlap_ratio > best_overlap and overlap_ratio >= self.overlap_threshold:
-                    best_overlap = overlap_ratio
-                    best_idx = i
+    ) -> List[Optional[int]]:
+        """
+        Dla każdego słowa zwraca indeks segmentu (przebieg dwoma wskaźnikami).
 
-        return best_idx
+        Reguły jak dotąd: segment zawierający środek słowa, w drugiej
+        kolejności największe pokrycie >= overlap_threshold. Słowo w przerwie
+        między segmentami trafia do najbliższego segmentu.
+        """
+        seg_order = sorted(range(len(segments)), key=lambda i: segments[i].start_time)
+        seg_starts = [segments[i].start_time for i in seg_order]
+        seg_ends = [segments[i].end_time for i in seg_order]
+        n_segments = len(seg_order)
+
+        word_order = sorted(range(len(starts)), key=lambda i: starts[i])
+        assignments: List[Optional[int]] = [None] * len(starts)
+
+        head = 0  # Pierwszy segment, który nie skończył się przed bieżącym słowem
+        for word_idx in word_order:
+            w_start = float(starts[word_idx])
+            w_end = float(ends[word_idx])
+            w_mid = (w_start + w_end) / 2
+            w_duration = w_end - w_start
+
+            while head < n_segments and seg_ends[head] < w_start:
+                head += 1
+
+            best = None
+            best_overlap = 0.0
+            j = head
+            while j < n_segments and seg_starts[j] <= w_end:
+                if seg_starts[j] <= w_mid <= seg_ends[j]:
+                    best = j
+                    break
+                overlap = min(w_end, seg_ends[j]) - max(w_start, seg_starts[j])
+                if overlap > 0 and w_duration > 0:
+                    ratio = overlap / w_duration
+                    if ratio > best_overlap and ratio >= self.overlap_threshold:
+                        best_overlap = ratio
+                        best = j
+                j += 1
+
+            if best is None:
+                # Przerwa między segmentami - najbliższy sąsiad
+                before = head - 1 if head > 0 else None
+                after = head if head < n_segments else None
+                if before is not None and after is not None:
+                    gap_before = w_start - seg_ends[before]
+                    gap_after = seg_starts[after] - w_end
+                    best = before if gap_before <= gap_after else after
+                else:
+                    best = before if before is not None else after
+
+            assignments[word_idx] = seg_order[best] if best is not None else None
+
+        return assignments
 
     def merge_simple(
         self,
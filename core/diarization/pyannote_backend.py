@@ -6,11 +6,11 @@ Wymaga tokenu HuggingFace i instalacji pyannote.audio.
 """
 
 import asyncio
-import tempfile
+import inspect
 import os
+import threading
 import numpy as np
-from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict, List, Tuple
 import warnings
 
 from .base import DiarizationBackend, DiarizationResult, DiarizationSegment, SpeakerRole
@@ -25,13 +25,42 @@ except ImportError:
     Pipeline = None
     torch = None
 
-# Sprawdź dostępność soundfile dla zapisu WAV
-try:
-    import soundfile as sf
-    SOUNDFILE_AVAILABLE = True
-except ImportError:
-    SOUNDFILE_AVAILABLE = False
-    sf = None
+
+PIPELINE_MODEL = "pyannote/speaker-diarization-3.1"
+
+# Pipeline ładowany raz na proces (klucz: token, urządzenie) - współdzielony
+# między sesjami i instancjami backendu
+_pipeline_cache: Dict[Tuple[str, str], "Pipeline"] = {}
+_pipeline_lock = threading.Lock()
+
+
+def get_shared_pipeline(hf_token: str, device: str) -> "Pipeline":
+    """Zwraca współdzielony pipeline pyannote (ładuje przy pierwszym użyciu)."""
+    key = (hf_token, device)
+    with _pipeline_lock:
+        pipeline = _pipeline_cache.get(key)
+        if pipeline is not None:
+            return pipeline
+
+        print(f"[DIARIZATION] Loading pyannote pipeline on {device}...", flush=True)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            pipeline = Pipeline.from_pretrained(
+                PIPELINE_MODEL,
+                use_auth_token=hf_token
+            )
+
+        if device != "cpu":
+            pipeline.to(torch.device(device))
+
+        _pipeline_cache[key] = pipeline
+        print("[DIARIZATION] Pipeline loaded!", flush=True)
+        return pipeline
+
+
+# Tura mówcy: (start, koniec, etykieta)
+Turn = Tuple[float, float, str]
 
 
 class PyAnnoteDiarizationBackend(DiarizationBackend):
@@ -42,16 +71,24 @@ class PyAnnoteDiarizationBackend(DiarizationBackend):
     - pip install pyannote.audio
     - Token HuggingFace z akceptowaną licencją modelu
     - GPU rekomendowane (ale działa na CPU)
+
+    Audio trafia do pipeline bezpośrednio jako tensor (bez plików WAV).
+    Długie nagrania są dzielone na fragmenty z zakładką, a etykiety
+    mówców łączone na podstawie zakładki.
     """
 
     def __init__(
         self,
         hf_token: Optional[str] = None,
         device: str = "auto",
-        num_speakers: Optional[int] = 2  # Wymuszenie liczby mówców (None = auto)
+        num_speakers: Optional[int] = 2,  # Wymuszenie liczby mówców (None = auto)
+        chunk_seconds: float = 600.0,  # Dłuższe nagrania przetwarzane fragmentami
+        overlap_seconds: float = 30.0
     ):
         self.hf_token = hf_token or os.environ.get("HUGGINGFACE_TOKEN", "")
         self.num_speakers = num_speakers
+        self.chunk_seconds = chunk_seconds
+        self.overlap_seconds = overlap_seconds
         self._pipeline: Optional[Pipeline] = None
         self._device = self._detect_device(device)
 
@@ -71,7 +108,7 @@ class PyAnnoteDiarizationBackend(DiarizationBackend):
             return "cpu"
 
     def _load_pipeline(self) -> None:
-        """Lazy loading pipeline."""
+        """Lazy loading pipeline (współdzielony między instancjami)."""
         if self._pipeline is not None:
             return
 
@@ -83,19 +120,7 @@ class PyAnnoteDiarizationBackend(DiarizationBackend):
                 "Brak tokenu HuggingFace. Ustaw HUGGINGFACE_TOKEN lub podaj hf_token."
             )
 
-        print(f"[DIARIZATION] Loading pyannote pipeline on {self._device}...", flush=True)
-
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            self._pipeline = Pipeline.from_pretrained(
-                "pyannote/speaker-diarization-3.1",
-                use_auth_token=self.hf_token
-            )
-
-        if self._device != "cpu":
-            self._pipeline.to(torch.device(self._device))
-
-        print("[DIARIZATION] Pipeline loaded!", flush=True)
+        self._pipeline = get_shared_pipeline(self.hf_token, self._device)
 
     async def diarize(
         self,
@@ -115,93 +140,234 @@ class PyAnnoteDiarizationBackend(DiarizationBackend):
         if not self.is_available():
             raise RuntimeError("Pyannote backend niedostępny")
 
-        # Lazy load
-        self._load_pipeline()
-
-        # Zapisz audio do tymczasowego pliku (pyannote wymaga ścieżki)
-        audio = audio.flatten().astype(np.float32)
+        audio = np.ascontiguousarray(audio, dtype=np.float32).reshape(-1)
         total_duration = len(audio) / sample_rate
 
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp:
-            tmp_path = tmp.name
-
-        try:
-            # Zapisz WAV
-            if SOUNDFILE_AVAILABLE:
-                sf.write(tmp_path, audio, sample_rate)
-            else:
-                # Fallback - prosty zapis WAV
-                self._write_wav_simple(tmp_path, audio, sample_rate)
-
-            # Uruchom diaryzację (w executor bo jest sync)
-            loop = asyncio.get_event_loop()
-            diarization = await loop.run_in_executor(
-                None,
-                lambda: self._run_pipeline(tmp_path)
+        # Ładowanie modelu i inferencja w executor (blokujące)
+        loop = asyncio.get_event_loop()
+        turns = await loop.run_in_executor(
+            None,
+            lambda: self._diarize_sync(audio, sample_rate)
+        )
+
+        # Parsuj wyniki
+        segments = []
+        speaker_ids = set()
+
+        for start, end, speaker in turns:
+            speaker_ids.add(speaker)
+            segment = DiarizationSegment(
+                start_time=start,
+                end_time=end,
+                speaker_id=speaker,
+                role=SpeakerRole.UNKNOWN,
+                confidence=0.9
             )
+            segments.append(segment)
 
-            # Parsuj wyniki
-            segments = []
-            speaker_ids = set()
-
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
-                speaker_ids.add(speaker)
-                segment = DiarizationSegment(
-                    start_time=turn.start,
-                    end_time=turn.end,
-                    speaker_id=speaker,
-                    role=SpeakerRole.UNKNOWN,
-                    confidence=0.9
-                )
-                segments.append(segment)
-
-            # Domyślne mapowanie ról
-            speaker_list = sorted(list(speaker_ids))
-            speaker_mapping = {}
-
-            if len(speaker_list) >= 1:
-                speaker_mapping[speaker_list[0]] = SpeakerRole.DOCTOR
-            if len(speaker_list) >= 2:
-                speaker_mapping[speaker_list[1]] = SpeakerRole.PATIENT
-
-            result = DiarizationResult(
-                segments=segments,
-                num_speakers=len(speaker_ids),
-                speaker_mapping=speaker_mapping,
-                total_duration=total_duration
-            )
-            result.apply_role_mapping(speaker_mapping)
+        # Domyślne mapowanie ról
+        speaker_list = sorted(list(speaker_ids))
+        speaker_mapping = {}
 
-            return result
+        if len(speaker_list) >= 1:
+            speaker_mapping[speaker_list[0]] = SpeakerRole.DOCTOR
+        if len(speaker_list) >= 2:
+            speaker_mapping[speaker_list[1]] = SpeakerRole.PATIENT
 
-        finally:
-            # Usuń plik tymczasowy
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
+        result = DiarizationResult(
+            segments=segments,
+            num_speakers=len(speaker_ids),
+            speaker_mapping=speaker_mapping,
+            total_duration=total_duration
+        )
+        result.apply_role_mapping(speaker_mapping)
 
-    def _run_pipeline(self, audio_path: str):
-        """Uruchamia pipeline (synchronicznie)."""
+        return result
+
+    def _diarize_sync(self, audio: np.ndarray, sample_rate: int) -> List[Turn]:
+        """Diaryzacja całości lub fragmentami (synchronicznie)."""
+        self._load_pipeline()
+
+        chunk = int(self.chunk_seconds * sample_rate)
+        if chunk <= 0 or len(audio) <= chunk:
+            turns, _ = self._run_pipeline(audio, sample_rate, 0.0)
+            return turns
+        return self._run_chunked(audio, sample_rate)
+
+    def _run_pipeline(
+        self,
+        audio: np.ndarray,
+        sample_rate: int,
+        offset: float,
+        chunked: bool = False
+    ) -> Tuple[List[Turn], Dict[str, np.ndarray]]:
+        """
+        Uruchamia pipeline na tensorze w pamięci (synchronicznie).
+
+        Dla fragmentów zwraca też embeddingi mówców (etykieta lokalna ->
+        wektor) do łączenia etykiet między fragmentami; pusty słownik, gdy
+        wersja pyannote ich nie udostępnia.
+        """
         params = {}
         if self.num_speakers is not None:
-            params["num_speakers"] = self.num_speakers
+            if chunked:
+                # Fragment może zawierać tylko jednego mówcę
+                params["min_speakers"] = 1
+                params["max_speakers"] = self.num_speakers
+            else:
+                params["num_speakers"] = self.num_speakers
+
+        # (1, samples) - tensor współdzieli pamięć z tablicą numpy
+        waveform = torch.from_numpy(audio).unsqueeze(0)
+        file = {"waveform": waveform, "sample_rate": sample_rate}
+        embeddings: Dict[str, np.ndarray] = {}
+        if chunked and self._supports_embeddings():
+            diarization, vectors = self._pipeline(file, return_embeddings=True, **params)
+            for label, vector in zip(diarization.labels(), np.asarray(vectors)):
+                if np.all(np.isfinite(vector)):
+                    embeddings[label] = vector
+        else:
+            diarization = self._pipeline(file, **params)
 
-        return self._pipeline(audio_path, **params)
+        turns = [
+            (turn.start + offset, turn.end + offset, speaker)
+            for turn, _, speaker in diarization.itertracks(yield_label=True)
+        ]
+        return turns, embeddings
 
-    def _write_wav_simple(self, path: str, audio: np.ndarray, sample_rate: int) -> None:
-        """Prosty zapis WAV bez zewnętrznych bibliotek."""
-        import struct
-        import wave
+    def _supports_embeddings(self) -> bool:
+        """Czy pipeline zwraca embeddingi mówców (pyannote >= 3.1)."""
+        apply = getattr(self._pipeline, "apply", None)
+        try:
+            return apply is not None and "return_embeddings" in inspect.signature(apply).parameters
+        except (TypeError, ValueError):
+            return False
 
-        # Konwertuj float32 do int16
-        audio_int16 = (audio * 32767).astype(np.int16)
+    def _run_chunked(self, audio: np.ndarray, sample_rate: int) -> List[Turn]:
+        """
+        Diaryzacja fragmentami z zakładką.
+
+        Etykiety kolejnego fragmentu są dopasowywane do dotychczasowych
+        na podstawie wspólnego czasu mowy w zakładce; fragmenty są sklejane
+        w połowie zakładki. Mówca, który nie odzywał się w zakładce, przy
+        zadanej liczbie mówców dostaje najbliższą (embedding) istniejącą
+        etykietę zamiast nowej.
+        """
+        chunk = int(self.chunk_seconds * sample_rate)
+        overlap = min(int(self.overlap_seconds * sample_rate), chunk // 2)
+        step = chunk - overlap
+
+        result: List[Turn] = []
+        known: List[str] = []
+        centroids: Dict[str, Tuple[np.ndarray, int]] = {}  # etykieta -> (suma, liczba)
+        offset = 0
+
+        while offset < len(audio):
+            offset_s = offset / sample_rate
+            piece = audio[offset:offset + chunk]
+            print(f"[DIARIZATION] Chunk {offset_s:.0f}-{offset_s + len(piece) / sample_rate:.0f}s", flush=True)
+            turns, embeddings = self._run_pipeline(piece, sample_rate, offset_s, chunked=True)
+
+            if not result:
+                mapping = {}
+                cut = 0.0
+            else:
+                overlap_end = offset_s + overlap / sample_rate
+                mapping = self._match_speakers(result, turns, offset_s, overlap_end)
+                cut = (offset_s + overlap_end) / 2.0
+                result = self._clip_turns(result, end=cut)
+
+            for local in sorted({spk for _, _, spk in turns}):
+                if local in mapping:
+                    continue
+                if self.num_speakers is None or len(known) < self.num_speakers:
+                    mapping[local] = f"SPEAKER_{len(known):02d}"
+                    known.append(mapping[local])
+                else:
+                    mapping[local] = self._closest_speaker(
+                        embeddings.get(local), known, centroids, taken=set(mapping.values())
+                    )
+
+            for local, vector in embeddings.items():
+                label = mapping.get(local)
+                if label is not None:
+                    total, count = centroids.get(label, (0.0, 0))
+                    centroids[label] = (total + vector, count + 1)
+
+            result.extend(
+                (start, end, mapping[spk])
+                for start, end, spk in self._clip_turns(turns, start=cut)
+            )
 
-        with wave.open(path, 'wb') as wav:
-            wav.setnchannels(1)
-            wav.setsampwidth(2)  # 16-bit
-            wav.setframerate(sample_rate)
-            wav.writeframes(audio_int16.tobytes())
+            if offset + chunk >= len(audio):
+                break
+            offset += step
+
+        return result
+
+    @staticmethod
+    def _closest_speaker(
+        embedding: Optional[np.ndarray],
+        known: List[str],
+        centroids: Dict[str, Tuple[np.ndarray, int]],
+        taken: set
+    ) -> str:
+        """Istniejąca etykieta najbliższa embeddingowi (wolne etykiety najpierw)."""
+        candidates = [label for label in known if label not in taken] or list(known)
+        if embedding is None:
+            return candidates[0]
+
+        def similarity(label: str) -> float:
+            if label not in centroids:
+                return -1.0
+            total, count = centroids[label]
+            center = total / count
+            norm = np.linalg.norm(center) * np.linalg.norm(embedding)
+            return float(np.dot(center, embedding) / norm) if norm > 0 else -1.0
+
+        return max(candidates, key=similarity)
+
+    @staticmethod
+    def _clip_turns(
+        turns: List[Turn],
+        start: float = 0.0,
+        end: float = float("inf")
+    ) -> List[Turn]:
+        """Przycina tury do przedziału [start, end)."""
+        clipped = []
+        for s, e, spk in turns:
+            s, e = max(s, start), min(e, end)
+            if e > s:
+                clipped.append((s, e, spk))
+        return clipped
+
+    @classmethod
+    def _match_speakers(
+        cls,
+        previous: List[Turn],
+        current: List[Turn],
+        overlap_start: float,
+        overlap_end: float
+    ) -> Dict[str, str]:
+        """Mapuje etykiety lokalne fragmentu na globalne (max. wspólny czas mowy)."""
+        prev_in = cls._clip_turns(previous, overlap_start, overlap_end)
+        curr_in = cls._clip_turns(current, overlap_start, overlap_end)
+
+        shared: Dict[Tuple[str, str], float] = {}
+        for ps, pe, p_spk in prev_in:
+            for cs, ce, c_spk in curr_in:
+                common = min(pe, ce) - max(ps, cs)
+                if common > 0:
+                    shared[(c_spk, p_spk)] = shared.get((c_spk, p_spk), 0.0) + common
+
+        mapping: Dict[str, str] = {}
+        used = set()
+        for (c_spk, p_spk), _ in sorted(shared.items(), key=lambda kv: kv[1], reverse=True):
+            if c_spk in mapping or p_spk in used:
+                continue
+            mapping[c_spk] = p_spk
+            used.add(p_spk)
+        return mapping
 
     def is_available(self) -> bool:
         """Sprawdza czy backend jest dostępny."""
@@ -5,22 +5,32 @@ Fasada łącząca różne backendy diaryzacji i merger transkrypcji.
 """
 
 import asyncio
+import importlib.util
 import numpy as np
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Callable, Union
 from pathlib import Path
 
 from .base import DiarizationBackend, DiarizationResult, DiarizationSegment, SpeakerRole
 from .heuristic_backend import HeuristicDiarizationBackend
+from .spectral_backend import SpectralDiarizationBackend
+from .live_session import LiveDiarizationSession, LiveSegment
 from .merger import TranscriptMerger, WordTimestamp
+from .word_store import WordTimestampStore
 
-# Opcjonalny import pyannote
+# Opcjonalny pyannote - import (torch) dopiero gdy backend jest faktycznie tworzony
 try:
-    from .pyannote_backend import PyAnnoteDiarizationBackend, PYANNOTE_AVAILABLE
-except ImportError:
-    PyAnnoteDiarizationBackend = None
+    PYANNOTE_AVAILABLE = all(
+        importlib.util.find_spec(name) is not None for name in ("pyannote.audio", "torch")
+    )
+except (ImportError, ValueError):
     PYANNOTE_AVAILABLE = False
 
 
+def _create_pyannote_backend(hf_token: str, device: str) -> DiarizationBackend:
+    from .pyannote_backend import PyAnnoteDiarizationBackend
+    return PyAnnoteDiarizationBackend(hf_token=hf_token, device=device)
+
+
 class DiarizationService:
     """
     Główny serwis diaryzacji.
@@ -30,7 +40,7 @@ class DiarizationService:
 
     def __init__(
         self,
-        backend: str = "auto",  # auto, heuristic, pyannote
+        backend: str = "auto",  # auto, spectral, heuristic, pyannote
         hf_token: Optional[str] = None,
         device: str = "auto"
     ):
@@ -47,26 +57,23 @@ class DiarizationService:
         """Inicjalizuje backend diaryzacji."""
         if self.backend_name == "pyannote":
             if PYANNOTE_AVAILABLE and self.hf_token:
-                self._backend = PyAnnoteDiarizationBackend(
-                    hf_token=self.hf_token,
-                    device=self.device
-                )
+                self._backend = _create_pyannote_backend(self.hf_token, self.device)
             else:
-                print("[DIARIZATION] Pyannote niedostępny, fallback to heuristic", flush=True)
-                self._backend = HeuristicDiarizationBackend()
+                print("[DIARIZATION] Pyannote niedostępny, fallback to spectral", flush=True)
+                self._backend = SpectralDiarizationBackend()
+
+        elif self.backend_name == "spectral":
+            self._backend = SpectralDiarizationBackend()
 
         elif self.backend_name == "heuristic":
             self._backend = HeuristicDiarizationBackend()
 
         else:  # auto
-            # Preferuj pyannote jeśli dostępny
+            # Preferuj pyannote jeśli dostępny, potem spektralny (CPU)
             if PYANNOTE_AVAILABLE and self.hf_token:
-                self._backend = PyAnnoteDiarizationBackend(
-                    hf_token=self.hf_token,
-                    device=self.device
-                )
+                self._backend = _create_pyannote_backend(self.hf_token, self.device)
             else:
-                self._backend = HeuristicDiarizationBackend()
+                self._backend = SpectralDiarizationBackend()
 
         print(f"[DIARIZATION] Using backend: {self._backend.name}", flush=True)
 
@@ -95,7 +102,7 @@ class DiarizationService:
         audio: np.ndarray,
         transcript: str,
         sample_rate: int = 16000,
-        word_timestamps: Optional[List[WordTimestamp]] = None
+        word_timestamps: Optional[Union[List[WordTimestamp], WordTimestampStore]] = None
     ) -> DiarizationResult:
         """
         Wykonuje diaryzację i łączy z transkrypcją.
@@ -104,7 +111,7 @@ class DiarizationService:
             audio: Audio jako numpy array
             transcript: Pełna transkrypcja tekstu
             sample_rate: Częstotliwość próbkowania
-            word_timestamps: Opcjonalne timestampy słów
+            word_timestamps: Opcjonalne timestampy słów (lista lub WordTimestampStore)
 
         Returns:
             DiarizationResult z segmentami zawierającymi tekst
@@ -113,12 +120,18 @@ class DiarizationService:
         result = await self.diarize(audio, sample_rate)
 
         # 2. Połącz z transkrypcją
-        if word_timestamps:
+        if word_timestamps is not None and len(word_timestamps) > 0:
             result.segments = self._merger.merge(word_timestamps, result)
         else:
             result.segments = self._merger.merge_simple(transcript, result)
 
         # 3. Spróbuj lepiej przypisać role na podstawie treści
+        self._apply_content_roles(result)
+
+        return result
+
+    def _apply_content_roles(self, result: DiarizationResult) -> None:
+        """Uzupełnia mapowanie ról na podstawie treści wypowiedzi."""
         if len(result.segments) > 0:
             content_mapping = self._merger.assign_roles_by_content(result.segments)
             # Połącz z istniejącym mapowaniem (content ma niższy priorytet)
@@ -128,6 +141,50 @@ class DiarizationService:
 
             result.apply_role_mapping(result.speaker_mapping)
 
+    @property
+    def supports_live_session(self) -> bool:
+        """Czy skonfigurowany backend ma wariant na żywo (tylko spektralny)."""
+        return isinstance(self._backend, SpectralDiarizationBackend)
+
+    def start_live_session(
+        self,
+        sample_rate: int = 16000,
+        on_segment_labeled: Optional[Callable[[LiveSegment], None]] = None
+    ) -> Optional[LiveDiarizationSession]:
+        """
+        Rozpoczyna diaryzację na żywo (segmenty dodawane w trakcie nagrywania).
+
+        Sesja używa modelu spektralnego (CPU), więc powstaje tylko gdy to on
+        jest skonfigurowanym backendem. Dla pyannote (nie działa przyrostowo)
+        i heurystyki zwraca None - diaryzacja odbywa się po nagraniu.
+        """
+        if not self.supports_live_session:
+            return None
+        return LiveDiarizationSession(
+            sample_rate=sample_rate,
+            on_segment_labeled=on_segment_labeled
+        )
+
+    async def finalize_live_session(
+        self,
+        session: LiveDiarizationSession,
+        total_duration: float = 0.0,
+        word_timestamps: Optional[Union[List[WordTimestamp], WordTimestampStore]] = None
+    ) -> DiarizationResult:
+        """
+        Kończy diaryzację na żywo.
+
+        Segmenty mają już tekst z transkrypcji finalnej, więc zostaje tylko
+        ponowne przypisanie okien i role na podstawie treści. Z timestampami
+        słów tekst jest przypisywany słowo po słowie do okien mówców.
+        """
+        has_words = word_timestamps is not None and len(word_timestamps) > 0
+        result = await session.finalize(total_duration, by_windows=has_words)
+        if has_words:
+            result.segments = [
+                s for s in self._merger.merge(word_timestamps, result) if s.text
+            ]
+        self._apply_content_roles(result)
         return result
 
     def assign_roles_manually(
@@ -189,6 +246,12 @@ class DiarizationService:
                 "name": "Heurystyczny (prosty)",
                 "available": True,
                 "description": "Prosty backend oparty na przerwach w mowie. Nie wymaga GPU."
+            },
+            {
+                "id": "spectral",
+                "name": "Spektralny (CPU)",
+                "available": True,
+                "description": "Rozpoznaje mówców po barwie i wysokości głosu (MFCC + F0). Nie wymaga GPU ani tokenu."
             }
         ]
 
@@ -216,7 +279,7 @@ def get_diarization_service(
     Zwraca singleton DiarizationService.
 
     Args:
-        backend: Typ backendu (auto, heuristic, pyannote)
+        backend: Typ backendu (auto, spectral, heuristic, pyannote)
         hf_token: Token HuggingFace dla pyannote
         device: Urządzenie (auto, cpu, cuda)
     """
@@ -0,0 +1,478 @@
+"""
+Spektralny backend diaryzacji.
+
+Lekka alternatywa dla pyannote działająca wyłącznie na CPU (NumPy):
+- dla każdego fragmentu wypowiedzi liczy cechy głosu (średnie MFCC, statystyki F0)
+- grupuje fragmenty w 2 mówców online k-means
+- nie wymaga tokenu HuggingFace ani dodatkowych modeli
+"""
+
+import asyncio
+import numpy as np
+from typing import List, Tuple, Optional
+
+from .base import DiarizationBackend, DiarizationResult, DiarizationSegment, SpeakerRole
+from .heuristic_backend import HeuristicDiarizationBackend
+
+
+# Parametry analizy spektralnej
+FRAME_SECONDS = 0.025
+HOP_SECONDS = 0.010
+N_FFT = 512
+N_MELS = 26
+N_MFCC = 13
+PITCH_MIN_HZ = 60.0
+PITCH_MAX_HZ = 400.0
+VOICING_THRESHOLD = 0.3  # Min. znormalizowana autokorelacja dla ramki dźwięcznej
+
+# Waga cech wysokości głosu względem MFCC (F0 najlepiej rozróżnia mówców)
+PITCH_WEIGHT = 2.0
+
+# Min. różnica median log F0 (~13%), by uznać fragment za nowego mówcę
+MIN_PITCH_GAP = 0.12
+
+FEATURE_DIM = 2 * (N_MFCC - 1) + 2
+
+
+def _mel_filterbank(sample_rate: int, n_fft: int = N_FFT, n_mels: int = N_MELS) -> np.ndarray:
+    """Trójkątny bank filtrów melowych (n_mels x n_fft//2+1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(sample_rate / 2.0), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+
+    fbank = np.zeros((n_mels, n_fft // 2 + 1), dtype=np.float32)
+    for m in range(1, n_mels + 1):
+        left, center, right = bins[m - 1], bins[m], bins[m + 1]
+        if center > left:
+            fbank[m - 1, left:center] = (np.arange(left, center) - left) / (center - left)
+        if right > center:
+            fbank[m - 1, center:right] = (right - np.arange(center, right)) / (right - center)
+    return fbank
+
+
+def _dct_matrix(n_mfcc: int = N_MFCC, n_mels: int = N_MELS) -> np.ndarray:
+    """Macierz DCT-II (ortonormalna) do liczenia MFCC."""
+    n = np.arange(n_mels)
+    k = np.arange(n_mfcc)[:, None]
+    dct = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    dct[0] /= np.sqrt(2.0)
+    return dct.astype(np.float32)
+
+
+class SpectralFeatureExtractor:
+    """Liczy wektor cech mówcy dla fragmentu audio."""
+
+    def __init__(self, sample_rate: int = 16000):
+        self.sample_rate = sample_rate
+        self.frame_length = int(FRAME_SECONDS * sample_rate)
+        self.hop_length = int(HOP_SECONDS * sample_rate)
+        self._window = np.hamming(self.frame_length).astype(np.float32)
+        self._fbank = _mel_filterbank(sample_rate)
+        self._dct = _dct_matrix()
+        self._min_lag = int(sample_rate / PITCH_MAX_HZ)
+        self._max_lag = min(int(sample_rate / PITCH_MIN_HZ), N_FFT - 1)
+
+    def extract(self, audio: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Zwraca wektor cech: [średnie MFCC(1..12), odch. MFCC(1..12), mediana log F0, odch. log F0].
+
+        None jeśli fragment jest za krótki.
+        """
+        audio = np.ascontiguousarray(audio, dtype=np.float32).reshape(-1)
+        if len(audio) < self.frame_length * 4:
+            return None
+
+        frames = np.lib.stride_tricks.sliding_window_view(audio, self.frame_length)[::self.hop_length]
+        windowed = frames * self._window
+        spectrum = np.fft.rfft(windowed, n=N_FFT)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+
+        # MFCC (bez c0 - energia zależy od odległości od mikrofonu, nie od mówcy)
+        mel = np.log(power @ self._fbank.T + 1e-10)
+        mfcc = mel @ self._dct.T
+        mfcc = mfcc[:, 1:]
+
+        # F0 z autokorelacji (odwrotna FFT widma mocy)
+        acf = np.fft.irfft(power, n=N_FFT)
+        energy = acf[:, 0]
+        valid = energy > 1e-8
+        lag_range = acf[:, self._min_lag:self._max_lag + 1]
+        best = np.argmax(lag_range, axis=1)
+        peak = lag_range[np.arange(len(best)), best]
+        voiced = valid & (peak > VOICING_THRESHOLD * np.where(valid, energy, 1.0))
+
+        if np.count_nonzero(voiced) >= 3:
+            lags = (best[voiced] + self._min_lag).astype(np.float32)
+            log_f0 = np.log(self.sample_rate / lags)
+            pitch_stats = [float(np.median(log_f0)), float(np.std(log_f0))]
+        else:
+            pitch_stats = [np.nan, np.nan]
+
+        return np.concatenate([
+            mfcc.mean(axis=0),
+            mfcc.std(axis=0),
+            np.asarray(pitch_stats, dtype=np.float32),
+        ]).astype(np.float32)
+
+
+class OnlineSpeakerClustering:
+    """
+    Online k-means dla 2 mówców.
+
+    - pierwsze fragmenty (warmup) trafiają do bufora; drugi centroid powstaje
+      z najbardziej odległego fragmentu, gdy odległość przekracza próg
+    - potem centroidy są aktualizowane średnią kroczącą po każdym przypisaniu,
+      więc model można karmić fragment po fragmencie (także w trakcie sesji)
+    - co refine_every fragmentów centroidy są poprawiane kilkoma iteracjami
+      Lloyda na ograniczonej historii (max_history)
+    - brakujące cechy (F0 fragmentu bezdźwięcznego, NaN) nie wchodzą do
+      statystyk ani centroidów; odległość liczona jest po cechach dostępnych
+    """
+
+    def __init__(
+        self,
+        n_speakers: int = 2,
+        new_speaker_distance: float = 1.0,
+        refine_every: int = 10,
+        max_history: int = 400
+    ):
+        self.n_speakers = n_speakers
+        self.new_speaker_distance = new_speaker_distance
+        self.refine_every = refine_every
+        self.max_history = max_history
+        self.centroids: List[np.ndarray] = []
+        self.counts: List[int] = []
+        self._centroid_counts: List[np.ndarray] = []  # Liczba wartości per cecha
+        self._history: List[np.ndarray] = []  # Surowe cechy (z NaN)
+
+        # Running statistics do standaryzacji cech (Welford, licznik per cecha)
+        self._n = 0
+        self._counts = np.zeros(FEATURE_DIM, dtype=np.int64)
+        self._mean = np.zeros(FEATURE_DIM, dtype=np.float64)
+        self._m2 = np.zeros(FEATURE_DIM, dtype=np.float64)
+        self._weights = np.ones(FEATURE_DIM, dtype=np.float64)
+        self._weights[-2:] = PITCH_WEIGHT
+
+    @property
+    def num_samples(self) -> int:
+        return self._n
+
+    def _fill_missing(self, features: np.ndarray) -> np.ndarray:
+        """
+        Zastępuje brakujące cechy (np. F0 bezdźwięcznego fragmentu) średnią.
+
+        Cechy bez żadnej poprawnej wartości w statystykach zostają NaN
+        (pomijane w odległości) - zero zamiast F0 tworzyłoby fałszywego mówcę.
+        """
+        features = np.asarray(features, dtype=np.float64)
+        missing = np.isnan(features)
+        if missing.any():
+            features = np.where(missing & (self._counts > 0), self._mean, features)
+        return features
+
+    def _update_stats(self, features: np.ndarray) -> None:
+        mask = ~np.isnan(features)
+        self._n += 1
+        self._counts += mask
+        delta = np.where(mask, features - self._mean, 0.0)
+        self._mean += delta / np.maximum(self._counts, 1)
+        self._m2 += delta * np.where(mask, features - self._mean, 0.0)
+
+    def _project(self, features: np.ndarray) -> np.ndarray:
+        """Standaryzacja + wagi (działa na wektorze lub macierzy)."""
+        std = np.sqrt(self._m2 / np.maximum(self._counts - 1, 1))
+        scale = np.where((self._counts >= 2) & (std > 1e-6), std, 1.0)
+        return (features - self._mean) / scale * self._weights
+
+    @staticmethod
+    def _rms(diff: np.ndarray, axis: int) -> np.ndarray:
+        """RMS po cechach dostępnych w obu wektorach (NaN pomijane)."""
+        squared = diff ** 2
+        valid = ~np.isnan(squared)
+        total = np.where(valid, squared, 0.0).sum(axis=axis)
+        return np.sqrt(total / np.maximum(valid.sum(axis=axis), 1))
+
+    def _distances(self, features: np.ndarray) -> np.ndarray:
+        point = self._project(self._fill_missing(features))
+        centers = self._project(np.asarray(self.centroids))
+        return self._rms(centers - point, axis=1)
+
+    def _add_centroid(self, features: np.ndarray) -> None:
+        self.centroids.append(features.copy())
+        self.counts.append(1)
+        self._centroid_counts.append((~np.isnan(features)).astype(np.int64))
+
+    def _update_centroid(self, k: int, features: np.ndarray) -> None:
+        """Średnia krocząca per cecha - brakujące cechy nie przesuwają centroidu."""
+        self.counts[k] += 1
+        mask = ~np.isnan(features)
+        counts = self._centroid_counts[k]
+        counts += mask
+        center = self.centroids[k]
+        # Pierwsza poprawna wartość cechy (np. F0) zastępuje NaN w centroidzie
+        seed = mask & np.isnan(center)
+        center[seed] = features[seed]
+        update = mask & ~seed
+        center[update] += (features[update] - center[update]) / counts[update]
+
+    @staticmethod
+    def _confidence(dists: np.ndarray) -> float:
+        if len(dists) < 2:
+            return 0.5
+        ordered = np.sort(dists)
+        margin = (ordered[1] - ordered[0]) / (ordered[1] + 1e-6)
+        return float(np.clip(0.5 + margin, 0.5, 0.95))
+
+    def _try_spawn_speaker(self) -> None:
+        """Tworzy nowy centroid z fragmentu najdalszego od istniejących."""
+        if len(self.centroids) >= self.n_speakers or len(self._history) < 2:
+            return
+        history = np.asarray(self._history)
+        points = self._project(self._fill_missing(history))
+        centers = self._project(np.asarray(self.centroids))
+        dists = self._rms(points[:, None, :] - centers[None, :, :], axis=2).min(axis=1)
+        # Standaryzacja rozciąga różnice także u jednego mówcy - nowy mówca
+        # musi się też wyraźnie różnić wysokością głosu (w skali bezwzględnej),
+        # więc kandydatem może być tylko fragment dźwięczny, a centroidy
+        # muszą już mieć F0
+        centroid_pitch = np.asarray(self.centroids)[:, -2]
+        if np.isnan(centroid_pitch).any():
+            return
+        dists = np.where(np.isnan(history[:, -2]), -np.inf, dists)
+        far = int(np.argmax(dists))
+        pitch_gap = np.min(np.abs(centroid_pitch - history[far, -2]))
+        if dists[far] > self.new_speaker_distance and pitch_gap > MIN_PITCH_GAP:
+            self._add_centroid(history[far])
+            self.refine()
+
+    def refine(self, iterations: int = 5) -> None:
+        """Kilka iteracji Lloyda na historii (indeksy mówców zostają stabilne)."""
+        if len(self.centroids) < 2 or not self._history:
+            return
+        history = np.asarray(self._history)
+        points = self._project(self._fill_missing(history))
+        for _ in range(iterations):
+            centers = self._project(np.asarray(self.centroids))
+            dists = self._rms(points[:, None, :] - centers[None, :, :], axis=2)
+            labels = np.argmin(dists, axis=1)
+            changed = False
+            for k in range(len(self.centroids)):
+                members = history[labels == k]
+                if len(members) == 0:
+                    continue
+                # Średnia po poprawnych wartościach; cecha bez żadnej zostaje jak była
+                member_counts = (~np.isnan(members)).sum(axis=0)
+                sums = np.where(np.isnan(members), 0.0, members).sum(axis=0)
+                new_center = np.where(
+                    member_counts > 0,
+                    sums / np.maximum(member_counts, 1),
+                    self.centroids[k]
+                )
+                if not np.allclose(new_center, self.centroids[k], equal_nan=True):
+                    changed = True
+                self.centroids[k] = new_center
+                self.counts[k] = len(members)
+                self._centroid_counts[k] = member_counts.astype(np.int64)
+            if not changed:
+                break
+
+    def assign(self, features: np.ndarray, update: bool = True) -> Tuple[int, float]:
+        """
+        Przypisuje fragment do mówcy (i uczy model).
+
+        Returns:
+            (indeks mówcy, pewność 0..1)
+        """
+        features = np.asarray(features, dtype=np.float64)
+        self._update_stats(features)
+        self._history.append(features)
+        if len(self._history) > self.max_history:
+            self._history.pop(0)
+
+        if not self.centroids:
+            self._add_centroid(features)
+            return 0, 0.5
+
+        if len(self.centroids) < self.n_speakers:
+            self._try_spawn_speaker()
+        elif self.refine_every and self._n % self.refine_every == 0:
+            self.refine()
+
+        dists = self._distances(features)
+        best = int(np.argmin(dists))
+
+        if update:
+            self._update_centroid(best, features)
+
+        return best, self._confidence(dists)
+
+    def predict(self, features: np.ndarray) -> Tuple[int, float]:
+        """Przypisanie bez aktualizacji modelu."""
+        if not self.centroids:
+            return 0, 0.5
+        dists = self._distances(features)
+        return int(np.argmin(dists)), self._confidence(dists)
+
+
+class SpectralDiarizationBackend(DiarizationBackend):
+    """
+    Backend diaryzacji oparty na cechach spektralnych głosu.
+
+    - VAD i podział na wypowiedzi jak w backendzie heurystycznym
+    - długie wypowiedzi dzielone na okna (max_window_seconds)
+    - cechy MFCC + F0 na okno, klasteryzacja online k-means (2 mówców)
+    - ten sam mówca może mówić kilka razy z rzędu (w odróżnieniu od naprzemienności)
+    """
+
+    def __init__(
+        self,
+        pause_threshold: float = 0.3,  # Krótsza pauza niż w heurystyce - okno nie może objąć zmiany mówcy
+        silence_threshold: float = 0.02,
+        min_segment_duration: float = 0.3,
+        max_window_seconds: float = 3.0,
+        n_speakers: int = 2
+    ):
+        self.max_window_seconds = max_window_seconds
+        self.n_speakers = n_speakers
+        self._vad = HeuristicDiarizationBackend(
+            pause_threshold=pause_threshold,
+            silence_threshold=silence_threshold,
+            min_segment_duration=min_segment_duration
+        )
+
+    async def diarize(
+        self,
+        audio: np.ndarray,
+        sample_rate: int = 16000
+    ) -> DiarizationResult:
+        """Wykonuje diaryzację spektralną (w wątku roboczym)."""
+        return await asyncio.to_thread(self._diarize_sync, audio, sample_rate)
+
+    def split_windows(
+        self,
+        utterances: List[Tuple[float, float]]
+    ) -> List[Tuple[float, float]]:
+        """Dzieli długie wypowiedzi na okna do analizy cech."""
+        windows = []
+        for start, end in utterances:
+            duration = end - start
+            if duration <= self.max_window_seconds:
+                windows.append((start, end))
+                continue
+            n = int(np.ceil(duration / self.max_window_seconds))
+            step = duration / n
+            for i in range(n):
+                windows.append((start + i * step, start + (i + 1) * step))
+        return windows
+
+    def speech_windows(
+        self,
+        audio: np.ndarray,
+        sample_rate: int = 16000
+    ) -> List[Tuple[float, float]]:
+        """VAD + podział na okna analizy (sekundy względem początku audio)."""
+        speech_segments = self._vad._detect_speech_segments(audio, sample_rate)
+        if not speech_segments:
+            return []
+        utterances = self._vad._group_into_utterances(speech_segments)
+        return self.split_windows(utterances)
+
+    def _diarize_sync(
+        self,
+        audio: np.ndarray,
+        sample_rate: int = 16000
+    ) -> DiarizationResult:
+        audio = np.ascontiguousarray(audio, dtype=np.float32).reshape(-1)
+        total_duration = len(audio) / sample_rate
+
+        windows = self.speech_windows(audio, sample_rate)
+        if not windows:
+            return DiarizationResult(total_duration=total_duration)
+
+        extractor = SpectralFeatureExtractor(sample_rate)
+        clustering = OnlineSpeakerClustering(n_speakers=self.n_speakers)
+
+        features: List[Optional[np.ndarray]] = [
+            extractor.extract(audio[int(s * sample_rate):int(e * sample_rate)])
+            for s, e in windows
+        ]
+
+        # Przebieg online (buduje centroidy), potem ponowne przypisanie
+        # stabilnymi centroidami - wczesne okna nie zależą od kolejności
+        for feat in features:
+            if feat is not None:
+                clustering.assign(feat)
+        clustering.refine()
+
+        labels: List[Tuple[int, float]] = []
+        for feat in features:
+            if feat is None:
+                # Za krótkie okno - dziedziczy mówcę poprzedniego
+                labels.append(labels[-1] if labels else (0, 0.5))
+            else:
+                labels.append(clustering.predict(feat))
+
+        segments = self._merge_windows(windows, labels)
+        return self.build_result(segments, total_duration)
+
+    def _merge_windows(
+        self,
+        windows: List[Tuple[float, float]],
+        labels: List[Tuple[int, float]]
+    ) -> List[DiarizationSegment]:
+        """Łączy sąsiednie okna tego samego mówcy w segmenty."""
+        segments: List[DiarizationSegment] = []
+        for (start, end), (speaker, confidence) in zip(windows, labels):
+            speaker_id = f"SPEAKER_{speaker:02d}"
+            last = segments[-1] if segments else None
+            if last and last.speaker_id == speaker_id and start - last.end_time <= self._vad.pause_threshold:
+                last.end_time = end
+                last.confidence = min(last.confidence, confidence)
+            else:
+                segments.append(DiarizationSegment(
+                    start_time=start,
+                    end_time=end,
+                    speaker_id=speaker_id,
+                    role=SpeakerRole.UNKNOWN,
+                    confidence=confidence
+                ))
+        return segments
+
+    @staticmethod
+    def build_result(
+        segments: List[DiarizationSegment],
+        total_duration: float
+    ) -> DiarizationResult:
+        """Buduje wynik z domyślnym mapowaniem ról (pierwszy mówca = lekarz)."""
+        speaker_mapping = {}
+        order: List[str] = []
+        for s in segments:
+            if s.speaker_id not in order:
+                order.append(s.speaker_id)
+
+        if len(order) >= 1:
+            speaker_mapping[order[0]] = SpeakerRole.DOCTOR
+        if len(order) >= 2:
+            speaker_mapping[order[1]] = SpeakerRole.PATIENT
+
+        result = DiarizationResult(
+            segments=segments,
+            num_speakers=len(order),
+            speaker_mapping=speaker_mapping,
+            total_duration=total_duration
+        )
+        result.apply_role_mapping(speaker_mapping)
+        return result
+
+    def is_available(self) -> bool:
+        """Backend spektralny wymaga tylko NumPy."""
+        return True
+
+    @property
+    def name(self) -> str:
+        return "Spektralny (CPU)"
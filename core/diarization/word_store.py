@@ -0,0 +1,102 @@
+"""
+Magazyn timestampów słów.
+
+Zwarta struktura (tablice NumPy z offsetami w próbkach) zbierana przez
+warstwę finalną transkrypcji i używana przez merger do przypisania słów
+do mówców - bez tworzenia obiektu na każde słowo.
+"""
+
+import threading
+from typing import Iterable, List, Tuple
+
+import numpy as np
+
+from .merger import WordTimestamp
+
+
+class WordTimestampStore:
+    """
+    Słowa z czasami w próbkach (względem początku nagrania).
+
+    - append_words() jest bezpieczne wątkowo (wołane z wątku transkrypcji)
+    - tablice rosną geometrycznie, więc dopisywanie jest O(1) zamortyzowane
+    """
+
+    def __init__(self, sample_rate: int = 16000, capacity: int = 1024):
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        self._starts = np.zeros(capacity, dtype=np.int64)
+        self._ends = np.zeros(capacity, dtype=np.int64)
+        self._words: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._words = []
+
+    def _reserve(self, needed: int) -> None:
+        capacity = len(self._starts)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        self._starts = np.resize(self._starts, capacity)
+        self._ends = np.resize(self._ends, capacity)
+
+    def append_words(
+        self,
+        words: Iterable[Tuple[str, float, float]],
+        offset_samples: int = 0
+    ) -> int:
+        """
+        Dopisuje słowa jednego segmentu.
+
+        Args:
+            words: (słowo, start, koniec) - czasy w sekundach względem segmentu
+            offset_samples: Początek segmentu w nagraniu (próbki)
+
+        Returns:
+            Liczba dopisanych słów
+        """
+        batch = [(w.strip(), s, e) for w, s, e in words if w and w.strip()]
+        if not batch:
+            return 0
+
+        starts = offset_samples + np.round(
+            np.fromiter((s for _, s, _ in batch), dtype=np.float64, count=len(batch)) * self.sample_rate
+        ).astype(np.int64)
+        ends = offset_samples + np.round(
+            np.fromiter((e for _, _, e in batch), dtype=np.float64, count=len(batch)) * self.sample_rate
+        ).astype(np.int64)
+
+        with self._lock:
+            n = len(self._words)
+            self._reserve(n + len(batch))
+            self._starts[n:n + len(batch)] = starts
+            self._ends[n:n + len(batch)] = np.maximum(ends, starts)
+            self._words.extend(w for w, _, _ in batch)
+        return len(batch)
+
+    def arrays(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Migawka: (słowa, starty [s], końce [s])."""
+        with self._lock:
+            n = len(self._words)
+            words = list(self._words)
+            starts = self._starts[:n] / self.sample_rate
+            ends = self._ends[:n] / self.sample_rate
+        return words, starts, ends
+
+    def sample_range(self, index: int) -> Tuple[int, int]:
+        """Zakres próbek słowa o danym indeksie."""
+        with self._lock:
+            return int(self._starts[index]), int(self._ends[index])
+
+    def to_word_timestamps(self) -> List[WordTimestamp]:
+        """Konwersja do listy WordTimestamp (kompatybilność)."""
+        words, starts, ends = self.arrays()
+        return [
+            WordTimestamp(word=w, start_time=float(s), end_time=float(e))
+            for w, s, e in zip(words, starts, ends)
+        ]
@@ -0,0 +1,187 @@
+"""
+Śledzenie opóźnień pipeline'u Live (--trace-latency albo WYWIAD_TRACE_LATENCY=1).
+
+Etapy od audio do karty: capture -> queue_wait -> decode (provisional /
+improved / final) -> hallucination_filter -> state_update -> render_flush
+-> llm_regen. Zdarzenia trafiają do bufora cyklicznego (ostatnie
+MAX_EVENTS), skąd można je wyeksportować jako Chrome trace JSON
+(chrome://tracing, ui.perfetto.dev) albo policzyć p50/p95 per etap
+(nakładka deweloperska w widoku Live).
+
+Wyłączone śledzenie prawie nic nie kosztuje: span() zwraca współdzielony
+pusty kontekst, a complete()/instant() wracają po sprawdzeniu flagi.
+Gorące ścieżki (callback audio) sprawdzają ENABLED same.
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.log_utils import LOG_DIR, log
+
+
+ENABLED = "--trace-latency" in sys.argv or os.environ.get("WYWIAD_TRACE_LATENCY") == "1"
+MAX_EVENTS = 20000
+TRACE_FILE = LOG_DIR / "latency_trace.json"
+
+# Kolejność etapów w zestawieniu (pozostałe - alfabetycznie na końcu)
+STAGE_ORDER = (
+    "capture",
+    "queue_wait",
+    "decode.provisional",
+    "decode.improved",
+    "decode.final",
+    "hallucination_filter",
+    "state_update",
+    "audio_to_text",
+    "render_wait",
+    "render_flush",
+    "llm_first_card",
+    "llm_regen",
+    "llm_validation",
+)
+
+now = time.perf_counter_ns
+
+_T0 = now()
+_NULL_SPAN = nullcontext()
+_lock = threading.Lock()
+_events: deque = deque(maxlen=MAX_EVENTS)
+_thread_names: Dict[int, str] = {}
+
+
+def set_enabled(enabled: bool) -> None:
+    """Włącza/wyłącza śledzenie w trakcie działania (bufor zostaje)."""
+    global ENABLED
+    ENABLED = bool(enabled)
+
+
+def clear() -> None:
+    """Czyści bufor zdarzeń."""
+    with _lock:
+        _events.clear()
+
+
+# === ZAPIS ZDARZEŃ ===
+
+def _record(stage: str, phase: str, start_ns: int, dur_ns: int, args: Dict[str, Any]) -> None:
+    tid = threading.get_ident()
+    if tid not in _thread_names:
+        _thread_names[tid] = threading.current_thread().name
+    with _lock:
+        _events.append((stage, phase, start_ns, dur_ns, tid, args or None))
+
+
+def complete(stage: str, start_ns: int, end_ns: Optional[int] = None, **args) -> None:
+    """Zapisuje etap od start_ns (z now()) do end_ns (domyślnie teraz)."""
+    if not ENABLED or not start_ns:
+        return
+    end_ns = end_ns or now()
+    _record(stage, "X", start_ns, max(0, end_ns - start_ns), args)
+
+
+def instant(stage: str, **args) -> None:
+    """Punkt w czasie (np. odrzucona halucynacja)."""
+    if not ENABLED:
+        return
+    _record(stage, "i", now(), 0, args)
+
+
+class _Span:
+    __slots__ = ("stage", "args", "start_ns")
+
+    def __init__(self, stage: str, args: Dict[str, Any]):
+        self.stage = stage
+        self.args = args
+        self.start_ns = 0
+
+    def __enter__(self):
+        self.start_ns = now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        complete(self.stage, self.start_ns, **self.args)
+        return False
+
+
+def span(stage: str, **args):
+    """Kontekst mierzący etap (with span("decode.final", samples=n): ...)."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(stage, args)
+
+
+# === ODCZYT ===
+
+def _snapshot() -> List[tuple]:
+    with _lock:
+        return list(_events)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    # Nearest-rank - bez interpolacji, wystarczy do p50/p95
+    rank = math.ceil(q * len(sorted_values))
+    return sorted_values[min(len(sorted_values), max(1, rank)) - 1]
+
+
+def stage_stats() -> Dict[str, Dict[str, float]]:
+    """p50/p95/max (ms) i liczba próbek per etap, w kolejności pipeline'u."""
+    durations: Dict[str, List[float]] = {}
+    for stage, phase, _start, dur_ns, _tid, _args in _snapshot():
+        if phase == "X":
+            durations.setdefault(stage, []).append(dur_ns / 1e6)
+
+    order = {name: i for i, name in enumerate(STAGE_ORDER)}
+    stats: Dict[str, Dict[str, float]] = {}
+    for stage in sorted(durations, key=lambda s: (order.get(s, len(order)), s)):
+        values = sorted(durations[stage])
+        stats[stage] = {
+            "count": len(values),
+            "p50_ms": round(_percentile(values, 0.50), 2),
+            "p95_ms": round(_percentile(values, 0.95), 2),
+            "max_ms": round(values[-1], 2),
+        }
+    return stats
+
+
+def export_chrome_trace(path: Optional[Path] = None) -> Path:
+    """Zapisuje bufor w formacie Chrome trace (traceEvents, czasy w µs)."""
+    path = Path(path) if path else TRACE_FILE
+    pid = os.getpid()
+    events: List[Dict[str, Any]] = [
+        {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+        for tid, name in list(_thread_names.items())
+    ]
+    for stage, phase, start_ns, dur_ns, tid, args in _snapshot():
+        event = {
+            "name": stage,
+            "cat": stage.split(".", 1)[0],
+            "ph": phase,
+            "ts": (start_ns - _T0) / 1000,
+            "pid": pid,
+            "tid": tid,
+        }
+        if phase == "X":
+            event["dur"] = dur_ns / 1000
+        else:
+            event["s"] = "t"
+        if args:
+            event["args"] = args
+        events.append(event)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    log(f"[TRACE] Latency trace saved: {path} ({len(events)} events)")
+    return path
@@ -3,14 +3,18 @@ import sys
 import json
 import time
 import asyncio
+import importlib.util
 import io
+import threading
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Dict, Any, Tuple, List
+from typing import Optional, Dict, Any, Tuple, List, AsyncIterator, Iterator, Callable
 
 # Core imports
 from core.knowledge_manager import KnowledgeManager
 from core.log_utils import log
+from core.streaming_json import StreamingJSONParser
 
 # Specialization Manager (opcjonalny import)
 try:
@@ -19,36 +23,80 @@ try:
 except ImportError:
     SPEC_MANAGER_AVAILABLE = False
 
-# Importy opcjonalne (zaleznosci)
-try:
-    from google import genai
-    from google.genai import types
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
+# Importy opcjonalne (zaleznosci) - SDK sa ciezkie (~1-2 s importu), wiec przy
+# starcie sprawdzamy tylko, czy sa zainstalowane; import przy pierwszym wywolaniu
+def _module_available(name: str) -> bool:
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
 
-try:
-    from anthropic import Anthropic
-except ImportError:
-    Anthropic = None
 
-ANTHROPIC_AVAILABLE = Anthropic is not None
+GENAI_AVAILABLE = _module_available("google.genai")
+ANTHROPIC_AVAILABLE = _module_available("anthropic")
 
 # Obsluga Proxy dla Claude (lokalny moduł w repo)
 ROOT_DIR = Path(__file__).parent.parent
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
-try:
-    from proxy import start_proxy_server, get_proxy_base_url
-    PROXY_AVAILABLE = True
-except ImportError:
-    PROXY_AVAILABLE = False
+PROXY_AVAILABLE = _module_available("proxy")
 
 CLAUDE_AVAILABLE = PROXY_AVAILABLE and ANTHROPIC_AVAILABLE
 
 
+@dataclass
+class VisitDocumentation:
+    """
+    Dokumentacja wizyty w toku: niezależne zadania opisu i SOAP.
+    Każde zadanie zwraca (wynik JSON, użyty model).
+    """
+    description: asyncio.Task
+    soap: Optional[asyncio.Task] = None
+
+    @property
+    def tasks(self) -> Dict[str, asyncio.Task]:
+        tasks = {"description": self.description}
+        if self.soap is not None:
+            tasks["soap"] = self.soap
+        return tasks
+
+    async def gather(self) -> Dict[str, Tuple[Dict[str, Any], str]]:
+        """Czeka na oba wyniki; błędne zadania są pomijane (i logowane)."""
+        tasks = self.tasks
+        try:
+            results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+        return {
+            kind: result for kind, result in zip(tasks, results)
+            if not isinstance(result, BaseException)
+        }
+
+    def cancel(self) -> None:
+        for task in self.tasks.values():
+            if not task.done():
+                task.cancel()
+
+
+def _log_documentation_error(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        log(f"[LLM] Visit documentation error: {task.exception()}")
+
+
+# Semafory dostawców są wspólne dla wszystkich instancji LLMService (dialog
+# zapisu i ekran główny tworzą własne) - limit dotyczy całego procesu
+_provider_slots: Dict[str, asyncio.Semaphore] = {}
+
+
 class LLMService:
+    # Limit równoległych wywołań dokumentacji na dostawcę
+    PROVIDER_CONCURRENCY = {"claude": 2, "gemini": 4}
+    # Gotowe rozmowy claude.ai w proxy - równoległe zapytania (podpowiedzi,
+    # walidacja, odpowiedzi) nie dzielą jednego wątku czatu
+    PROXY_CONVERSATION_POOL = 3
+
     def __init__(self):
         self.proxy_started = False
         self.proxy_port = None
@@ -71,36 +119,33 @@ class LLMService:
 
     def _call_claude(self, auth_token: str, prompt: str) -> str:
         """Wywoluje Claude API przez proxy."""
+        return "".join(self._stream_claude(auth_token, prompt)).strip()
+
+    def _stream_claude(self, auth_token: str, prompt: str) -> Iterator[str]:
+        """Wywoluje Claude API przez proxy - zwraca kolejne fragmenty tekstu (SSE)."""
         if not PROXY_AVAILABLE:
             raise RuntimeError("ModuĹ‚ proxy nie jest dostÄ™pny")
-        if Anthropic is None:
+        if not ANTHROPIC_AVAILABLE:
             raise RuntimeError("Brak biblioteki anthropic (pip install anthropic)")
             
         if not auth_token:
             raise ValueError("Brak tokena Claude!")
 
-        # Przechwytywanie stdout zeby proxy nie smiecilo
-        if not self.proxy_started:
-            old_stdout = sys.stdout
-            sys.stdout = io.StringIO()
-            try:
-                success, port = start_proxy_server(auth_token, port=8765)
-                proxy_log = sys.stdout.getvalue()
-            finally:
-                sys.stdout = old_stdout
-
-            if success:
-                self.proxy_started = True
-                self.proxy_port = port
-                os.environ["ANTHROPIC_BASE_URL"] = get_proxy_base_url(port)
-                time.sleep(2)
-            else:
-                detail = (proxy_log or "").strip()
-                if detail:
-                    raise Exception(f"Nie udalo sie uruchomic proxy: {detail}")
-                raise Exception("Nie udalo sie uruchomic proxy")
+        wait_started = time.perf_counter()
+        port = ensure_claude_proxy(auth_token)
+        if _proxy_metrics["first_call_wait_s"] is None:
+            _proxy_metrics["first_call_wait_s"] = time.perf_counter() - wait_started
+            log(
+                f"[LLM] First Claude call waited {_proxy_metrics['first_call_wait_s']:.2f}s for proxy "
+                f"(prestarted={_proxy_metrics['prestarted']})"
+            )
+        self.proxy_started = True
+        self.proxy_port = port
+
+        from anthropic import Anthropic
+        from proxy import get_proxy_base_url
 
-        client = Anthropic(api_key=auth_token)
+        client = Anthropic(api_key=auth_token, base_url=get_proxy_base_url(port))
         stream = client.messages.create(
             model="claude-sonnet-4-20250514",
             max_tokens=1024,
@@ -108,19 +153,19 @@ class LLMService:
             stream=True
         )
 
-        full_text = ""
         for event in stream:
             if event.type == "content_block_delta":
                 if hasattr(event, 'delta') and hasattr(event.delta, 'text'):
-                    full_text += event.delta.text or ""
-
-        return full_text.strip()
+                    if event.delta.text:
+                        yield event.delta.text
 
     def _call_gemini(self, api_key: str, prompt: str) -> str:
         """Wywoluje Gemini API."""
         if not GENAI_AVAILABLE:
             raise RuntimeError("Biblioteka Google GenAI nie jest zainstalowana")
             
+        from google import genai
+
         client = genai.Client(api_key=api_key)
         primary_model = "gemini-2.5-flash"
         fallback_model = "gemini-2.0-flash"
@@ -138,6 +183,118 @@ class LLMService:
             )
             return response.text.strip()
 
+    def _stream_gemini(self, api_key: str, prompt: str) -> Iterator[str]:
+        """Wywoluje Gemini API w trybie strumieniowym - zwraca kolejne fragmenty tekstu."""
+        if not GENAI_AVAILABLE:
+            raise RuntimeError("Biblioteka Google GenAI nie jest zainstalowana")
+
+        from google import genai
+
+        client = genai.Client(api_key=api_key)
+        primary_model = "gemini-2.5-flash"
+        fallback_model = "gemini-2.0-flash"
+        emitted = False
+        try:
+            for chunk in client.models.generate_content_stream(model=primary_model, contents=prompt):
+                if chunk.text:
+                    emitted = True
+                    yield chunk.text
+        except Exception as e:
+            if emitted:
+                raise
+            log(f"[LLM] Gemini {primary_model} stream error ({e}); fallback to {fallback_model}")
+            for chunk in client.models.generate_content_stream(model=fallback_model, contents=prompt):
+                if chunk.text:
+                    yield chunk.text
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Retry tylko dla bledow serwera (5xx) lub Rate Limit (429)."""
+        error_msg = str(error)
+        return "500" in error_msg or "503" in error_msg or "429" in error_msg or "Overloaded" in error_msg
+
+    def _resolve_stream_provider(self, config: Dict) -> Optional[Tuple[Callable[[str, str], Iterator[str]], str]]:
+        """Provider strumieniowy wg configu (jak w wywolaniach blokujacych): Gemini, potem Claude."""
+        gemini_key = config.get("api_key", "")
+        if gemini_key and GENAI_AVAILABLE:
+            return self._stream_gemini, gemini_key
+        session_key = config.get("session_key", "")
+        claude_token = self._load_claude_token()
+        if (session_key or claude_token) and CLAUDE_AVAILABLE:
+            auth_key = session_key if session_key and session_key.startswith("sk-") else claude_token
+            return self._stream_claude, auth_key
+        return None
+
+    async def _stream_text(self, prompt: str, config: Dict, max_retries: int = 3) -> AsyncIterator[str]:
+        """
+        Strumien tekstu odpowiedzi (async iterator fragmentow).
+
+        Blokujacy klient SDK dziala w watku executora; fragmenty trafiaja do
+        petli zdarzen przez kolejke. Retry (exponential backoff) tylko zanim
+        przyszedl pierwszy fragment. Brak providera = pusty strumien.
+        """
+        provider = self._resolve_stream_provider(config)
+        if provider is None:
+            return
+        stream_func, key = provider
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+        def worker():
+            delay = 1.0
+            for attempt in range(max_retries):
+                emitted = False
+                try:
+                    for chunk in stream_func(key, prompt):
+                        if stop.is_set():
+                            break
+                        emitted = True
+                        put(chunk)
+                    put(done)
+                    return
+                except Exception as e:
+                    if emitted or not self._is_retryable(e) or attempt == max_retries - 1:
+                        put(e)
+                        return
+                    print(f"[LLM] Error: {e}. Retrying in {delay}s... ({attempt+1}/{max_retries})", flush=True)
+                    time.sleep(delay)
+                    delay *= 2
+
+        loop.run_in_executor(None, worker)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Konsument przerwal (np. anulowana regeneracja) - zatrzymaj watek
+            stop.set()
+
+    async def stream_json(self, prompt: str, config: Dict) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Przyrostowy JSON odpowiedzi.
+
+        Zwraca zdarzenia:
+            ("item", (klucz tablicy, element)) - gdy element tablicy sie zamknie
+            ("done", dokument) - na koncu (None gdy brak odpowiedzi/JSON-a)
+        """
+        parser = StreamingJSONParser()
+        async for chunk in self._stream_text(prompt, config):
+            for item in parser.feed(chunk):
+                yield "item", item
+            if parser.finished:
+                break
+        yield "done", parser.result()
+
     def _call_with_retry(self, func, *args, max_retries=3, initial_delay=1.0):
         """WywoĹ‚uje funkcjÄ™ z mechanizmem retry (exponential backoff)."""
         delay = initial_delay
@@ -159,37 +316,120 @@ class LLMService:
         
         raise last_exception
 
-    async def generate_description(
-        self,
-        transcript: str,
-        icd10_codes: Dict, # Deprecated, kept for compat but unused
-        config: Dict,
-        spec_id: int = None,  # Backward compat - pojedyncza specjalizacja
-        spec_ids: list = None  # Multi-select - lista specjalizacji
-    ) -> Tuple[Dict[str, Any], str]:
+    # === DOKUMENTACJA WIZYTY (opis ICD + SOAP) ===
+
+    def _provider_slot(self, model_type: str) -> asyncio.Semaphore:
+        """Semafor ograniczający równoległe wywołania jednego dostawcy."""
+        slot = _provider_slots.get(model_type)
+        if slot is None:
+            slot = asyncio.Semaphore(self.PROVIDER_CONCURRENCY.get(model_type, 1))
+            _provider_slots[model_type] = slot
+        return slot
+
+    def _select_generation_model(self, config: Dict) -> Optional[Dict[str, Any]]:
         """
-        Główna metoda generująca opis.
-        Używa dynamicznych promptów ze SpecializationManager jeśli dostępny.
-        Obsługuje multi-select specjalizacji (spec_ids ma priorytet nad spec_id).
+        Wybór dostawcy dla generowania dokumentacji (preferencja użytkownika,
+        potem tryb Auto). None gdy brak kluczy.
         """
+        gemini_key = config.get("api_key", "")
+        session_key = config.get("session_key", "")
+        claude_token = self._load_claude_token()
+        preferred_model = config.get("generation_model", "Auto")
 
-        # Ustal listę specjalizacji
+        has_session_key = bool(session_key and session_key.startswith("sk-") and CLAUDE_AVAILABLE)
+        has_gemini_key = bool(gemini_key and GENAI_AVAILABLE)
+        has_oauth_token = bool(claude_token and CLAUDE_AVAILABLE)
+
+        model_type = None
+        model_name = "Nieznany"
+
+        # A. Wymuszone przez użytkownika
+        if preferred_model == "Gemini" and has_gemini_key:
+            model_type = "gemini"
+            model_name = "Gemini 2.5 Flash"
+        elif preferred_model == "Claude" and (has_session_key or has_oauth_token):
+            model_type = "claude"
+            model_name = "Claude (Session Key)" if has_session_key else "Claude (OAuth)"
+
+        # B. Tryb AUTO
+        if not model_type:
+            if has_session_key and PROXY_AVAILABLE:
+                model_type = "claude"
+                model_name = "Claude (Session Key)"
+            elif has_gemini_key:
+                model_type = "gemini"
+                model_name = "Gemini 2.5 Flash"
+            elif has_oauth_token:
+                model_type = "claude"
+                model_name = "Claude (OAuth)"
+
+        if not model_type:
+            return None
+
+        return {
+            "type": model_type,
+            "name": model_name,
+            "gemini_key": gemini_key,
+            "claude_key": session_key if session_key and session_key.startswith("sk-") else claude_token,
+            # Fallback Claude -> Gemini tylko w trybie Auto
+            "fallback": preferred_model == "Auto" and has_gemini_key,
+        }
+
+    async def _run_generation(self, prompt: str, plan: Dict[str, Any], label: str) -> Tuple[str, str]:
+        """Wywołanie modelu z planu (w executorze, pod limitem dostawcy)."""
+        loop = asyncio.get_event_loop()
+
+        async def run_claude():
+            async with self._provider_slot("claude"):
+                return await loop.run_in_executor(
+                    None, lambda: self._call_with_retry(self._call_claude, plan["claude_key"], prompt)
+                )
+
+        async def run_gemini():
+            async with self._provider_slot("gemini"):
+                return await loop.run_in_executor(
+                    None, lambda: self._call_with_retry(self._call_gemini, plan["gemini_key"], prompt)
+                )
+
+        log(f"[LLM] {label}: using {plan['name']}")
+        if plan["type"] != "claude":
+            return await run_gemini(), plan["name"]
+        try:
+            return await run_claude(), plan["name"]
+        except Exception as e:
+            if not plan["fallback"]:
+                raise
+            log(f"[LLM] {label} Claude error ({e}), fallback to Gemini")
+            return await run_gemini(), "Gemini 2.5 Flash (Fallback)"
+
+    @staticmethod
+    def _strip_code_fence(text: str) -> str:
+        cleaned = text.strip()
+        if cleaned.startswith("```"):
+            cleaned = cleaned.split("```")[1]
+            if cleaned.startswith("json"):
+                cleaned = cleaned[4:]
+        return cleaned.strip()
+
+    @staticmethod
+    def _resolve_spec_ids(spec_id: Optional[int] = None, spec_ids: Optional[list] = None) -> List[int]:
+        """Lista specjalizacji (spec_ids ma priorytet nad spec_id)."""
         if spec_ids is not None:
-            active_spec_ids = spec_ids
-        elif spec_id is not None:
-            active_spec_ids = [spec_id]
-        elif SPEC_MANAGER_AVAILABLE:
-            spec_manager = get_specialization_manager()
-            active_spec_ids = spec_manager.get_active_ids()
-        else:
-            active_spec_ids = [1]  # Fallback do stomatologii
+            return spec_ids
+        if spec_id is not None:
+            return [spec_id]
+        if SPEC_MANAGER_AVAILABLE:
+            return get_specialization_manager().get_active_ids()
+        return [1]  # Fallback do stomatologii
 
-        # 1. Pobierz wiedzę z bazy (merge jeśli multi-select)
+    @staticmethod
+    def _load_knowledge_context(spec_ids: List[int]) -> Tuple[str, str]:
+        """Słowniki ICD-10 / ICD-9 z bazy wiedzy (merge jeśli multi-select) - blokujące."""
         km = KnowledgeManager()
-        if len(active_spec_ids) == 1:
-            context_data = km.get_context_for_specialization(active_spec_ids[0])
+        if len(spec_ids) == 1:
+            context_data = km.get_context_for_specialization(spec_ids[0])
         else:
-            context_data = km.get_context_for_specializations(active_spec_ids)
+            context_data = km.get_context_for_specializations(spec_ids)
 
         # Ogranicz kontekst dla promptu
         icd10_list = context_data.get("icd10", [])[:300]
@@ -197,15 +437,22 @@ class LLMService:
 
         icd_context = json.dumps(icd10_list, indent=2, ensure_ascii=False)
         proc_context = json.dumps(icd9_list, indent=2, ensure_ascii=False)
+        return icd_context, proc_context
 
-        # 2. Buduj prompt
+    def _build_description_prompt(
+        self,
+        transcript: str,
+        icd_context: str,
+        proc_context: str,
+        spec_ids: List[int]
+    ) -> str:
         if SPEC_MANAGER_AVAILABLE:
             spec_manager = get_specialization_manager()
-            prompt = spec_manager.build_description_prompt(
+            return spec_manager.build_description_prompt(
                 transcript=transcript,
                 icd_context=icd_context,
                 proc_context=proc_context,
-                spec_ids=active_spec_ids
+                spec_ids=spec_ids
             )
         else:
             # Fallback
@@ -241,110 +488,43 @@ Transkrypcja wywiadu:
 {transcript}
 
 Odpowiedz TYLKO poprawnym kodem JSON."""
+            return prompt
 
-        # 3. Pobranie kluczy i preferencji
-        gemini_key = config.get("api_key", "")
-        session_key = config.get("session_key", "")
-        claude_token = self._load_claude_token()
-        preferred_model = config.get("generation_model", "Auto")
-
-        has_session_key = bool(session_key and session_key.startswith("sk-") and CLAUDE_AVAILABLE)
-        has_gemini_key = bool(gemini_key and GENAI_AVAILABLE)
-        has_oauth_token = bool(claude_token and CLAUDE_AVAILABLE)
-        
-        model_type = None
-        model_name = "Nieznany"
-
-        # A. Wymuszone przez uĹĽytkownika
-        if preferred_model == "Gemini" and has_gemini_key:
-            model_type = "gemini"
-            model_name = "Gemini 2.5 Flash"
-        elif preferred_model == "Claude" and (has_session_key or has_oauth_token):
-            model_type = "claude"
-            model_name = "Claude (Session Key)" if has_session_key else "Claude (OAuth)"
-        
-        # B. Tryb AUTO
-        if not model_type:
-            if has_session_key and PROXY_AVAILABLE:
-                model_type = "claude"
-                model_name = "Claude (Session Key)"
-            elif has_gemini_key:
-                model_type = "gemini"
-                model_name = "Gemini 2.5 Flash"
-            elif has_oauth_token:
-                model_type = "claude"
-                model_name = "Claude (OAuth)"
-
-        if not model_type:
-            # Nie rzucamy bĹ‚edu, prĂłbujemy zwrĂłciÄ‡ pusty wynik z info
-            print("[LLM] Brak kluczy API. Generowanie niemoĹĽliwe.", flush=True)
-            return {"diagnozy": [], "procedury": []}, "Brak API"
-
-        # 4. Wykonanie
-        loop = asyncio.get_event_loop()
-        result_text = None
-        used_model = model_name
-
-        async def run_claude():
-            auth_key = session_key if session_key and session_key.startswith("sk-") else claude_token
-            return await loop.run_in_executor(None, lambda: self._call_with_retry(self._call_claude, auth_key, prompt))
-
-        async def run_gemini():
-            return await loop.run_in_executor(None, lambda: self._call_with_retry(self._call_gemini, gemini_key, prompt))
-
-        if model_type == "claude":
-            try:
-                print(f"[LLM] PrĂłba uĹĽycia: {model_name}", flush=True)
-                result_text = await run_claude()
-            except Exception as e:
-                if preferred_model == "Auto" and has_gemini_key:
-                    print(f"[LLM] Claude error ({e}), fallback to Gemini...", flush=True)
-                    used_model = "Gemini Flash (Fallback)"
-                    result_text = await run_gemini()
-                else:
-                    raise e
-        else:
-            print(f"[LLM] PrĂłba uĹĽycia: {model_name}", flush=True)
-            result_text = await run_gemini()
-
-        # 5. Parsowanie JSON
-        print(f"[LLM] Raw result: {result_text!r}", flush=True)
-        cleaned = result_text
-        if cleaned.startswith("```"):
-            cleaned = cleaned.split("```")[1]
-            if cleaned.startswith("json"):
-                cleaned = cleaned[4:]
-        cleaned = cleaned.strip()
-
-        try:
-            result_json = json.loads(cleaned)
-            return result_json, used_model
-        except json.JSONDecodeError as e:
-            print(f"[LLM] JSON Error: {e}", flush=True)
-            # PrĂłba naprawy prostego JSONA
-            return {"diagnozy": [], "procedury": []}, f"BĹ‚Ä…d JSON ({used_model})"
-
-
-    async def generate_soap(
+    def _build_soap_prompt(
         self,
         transcript: str,
-        config: Dict,
         diagnoses: Optional[List[Dict]] = None,
-        procedures: Optional[List[Dict]] = None
-    ) -> Tuple[Dict[str, Any], str]:
-        """Generate SOAP summary from transcript."""
-        transcript = transcript or ""
-        if not transcript.strip():
-            return {}, "No transcript"
-
+        procedures: Optional[List[Dict]] = None,
+        previous: Optional[Dict[str, Any]] = None
+    ) -> str:
         diag_context = json.dumps(diagnoses or [], ensure_ascii=False, indent=2)
         proc_context = json.dumps(procedures or [], ensure_ascii=False, indent=2)
 
-        prompt = f"""Jestes lekarzem. Na podstawie transkrypcji przygotuj podsumowanie SOAP.
+        if previous and not transcript.strip():
+            draft_context = json.dumps(previous, ensure_ascii=False, indent=2)
+            source_section = f"""Dotychczasowy szkic SOAP (z calej rozmowy):
+{draft_context}
+
+Brak nowego fragmentu rozmowy. Uzupelnij ocene (assessment) i plan szkicu
+o podane nizej rozpoznania i procedury. Pozostale pola zachowaj bez zmian."""
+        elif previous:
+            draft_context = json.dumps(previous, ensure_ascii=False, indent=2)
+            source_section = f"""Dotychczasowy szkic SOAP (z wczesniejszej czesci wizyty):
+{draft_context}
+
+Zaktualizuj szkic o informacje z NOWEGO fragmentu rozmowy. Zachowaj
+dotychczasowe informacje, popraw je tylko jesli nowy fragment im przeczy.
+
+Nowy fragment transkrypcji:
+{transcript}"""
+        else:
+            source_section = f"""Transkrypcja:
+{transcript}"""
+
+        return f"""Jestes lekarzem. Na podstawie transkrypcji przygotuj podsumowanie SOAP.
 Nie wymyslaj faktow. Jesli brak informacji, zwroc pusty string.
 
-Transkrypcja:
-{transcript}
+{source_section}
 
 Rozpoznania (opcjonalnie):
 {diag_context}
@@ -368,78 +548,149 @@ Zwroc TYLKO poprawny JSON z kluczami:
 }}
 """
 
-        gemini_key = config.get("api_key", "")
-        session_key = config.get("session_key", "")
-        claude_token = self._load_claude_token()
-        preferred_model = config.get("generation_model", "Auto")
+    async def _describe(
+        self,
+        transcript: str,
+        knowledge: Tuple[str, str],
+        spec_ids: List[int],
+        plan: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], str]:
+        icd_context, proc_context = knowledge
+        prompt = self._build_description_prompt(transcript, icd_context, proc_context, spec_ids)
+        result_text, used_model = await self._run_generation(prompt, plan, "Description")
 
-        has_session_key = bool(session_key and session_key.startswith("sk-") and CLAUDE_AVAILABLE)
-        has_gemini_key = bool(gemini_key and GENAI_AVAILABLE)
-        has_oauth_token = bool(claude_token and CLAUDE_AVAILABLE)
+        print(f"[LLM] Raw result: {result_text!r}", flush=True)
+        try:
+            return json.loads(self._strip_code_fence(result_text)), used_model
+        except json.JSONDecodeError as e:
+            print(f"[LLM] JSON Error: {e}", flush=True)
+            return {"diagnozy": [], "procedury": []}, f"Błąd JSON ({used_model})"
 
-        model_type = None
-        model_name = "Unknown"
+    async def _soap(
+        self,
+        transcript: str,
+        plan: Dict[str, Any],
+        diagnoses: Optional[List[Dict]] = None,
+        procedures: Optional[List[Dict]] = None,
+        previous: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        prompt = self._build_soap_prompt(transcript, diagnoses, procedures, previous)
+        result_text, used_model = await self._run_generation(prompt, plan, "SOAP")
+        try:
+            return json.loads(self._strip_code_fence(result_text)), used_model
+        except json.JSONDecodeError as e:
+            log(f"[LLM] SOAP JSON error: {e}")
+            return {}, f"JSON error ({used_model})"
 
-        if preferred_model == "Gemini" and has_gemini_key:
-            model_type = "gemini"
-            model_name = "Gemini 2.5 Flash"
-        elif preferred_model == "Claude" and (has_session_key or has_oauth_token):
-            model_type = "claude"
-            model_name = "Claude (Session Key)" if has_session_key else "Claude (OAuth)"
+    async def generate_description(
+        self,
+        transcript: str,
+        icd10_codes: Dict, # Deprecated, kept for compat but unused
+        config: Dict,
+        spec_id: int = None,  # Backward compat - pojedyncza specjalizacja
+        spec_ids: list = None  # Multi-select - lista specjalizacji
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Główna metoda generująca opis.
+        Używa dynamicznych promptów ze SpecializationManager jeśli dostępny.
+        Obsługuje multi-select specjalizacji (spec_ids ma priorytet nad spec_id).
+        """
+        active_spec_ids = self._resolve_spec_ids(spec_id, spec_ids)
+        plan = self._select_generation_model(config)
+        if not plan:
+            # Nie rzucamy błędu, zwracamy pusty wynik z info
+            print("[LLM] Brak kluczy API. Generowanie niemożliwe.", flush=True)
+            return {"diagnozy": [], "procedury": []}, "Brak API"
 
-        if not model_type:
-            if has_session_key and PROXY_AVAILABLE:
-                model_type = "claude"
-                model_name = "Claude (Session Key)"
-            elif has_gemini_key:
-                model_type = "gemini"
-                model_name = "Gemini 2.5 Flash"
-            elif has_oauth_token:
-                model_type = "claude"
-                model_name = "Claude (OAuth)"
+        loop = asyncio.get_event_loop()
+        knowledge = await loop.run_in_executor(None, self._load_knowledge_context, active_spec_ids)
+        return await self._describe(transcript, knowledge, active_spec_ids, plan)
 
-        if not model_type:
+    async def generate_soap(
+        self,
+        transcript: str,
+        config: Dict,
+        diagnoses: Optional[List[Dict]] = None,
+        procedures: Optional[List[Dict]] = None,
+        previous: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Generate SOAP summary from transcript.
+
+        previous: gotowy szkic SOAP - wtedy transcript to tylko NOWY fragment
+        rozmowy (może być pusty - wtedy szkic uzupełniany jest tylko o
+        rozpoznania i procedury), a model aktualizuje szkic zamiast pisać
+        go od zera.
+        """
+        transcript = transcript or ""
+        if not transcript.strip() and not previous:
+            return {}, "No transcript"
+
+        plan = self._select_generation_model(config)
+        if not plan:
             log("[LLM] No API keys available. SOAP generation skipped.")
             return {}, "No API"
 
-        loop = asyncio.get_event_loop()
-        result_text = None
-        used_model = model_name
+        return await self._soap(transcript, plan, diagnoses, procedures, previous)
 
-        async def run_claude():
-            auth_key = session_key if session_key and session_key.startswith("sk-") else claude_token
-            return await loop.run_in_executor(None, lambda: self._call_with_retry(self._call_claude, auth_key, prompt))
+    def generate_visit_documentation(
+        self,
+        transcript: str,
+        config: Dict,
+        spec_id: int = None,
+        spec_ids: list = None,
+        include_soap: bool = True,
+        soap_transcript: Optional[str] = None,
+        previous_soap: Optional[Dict[str, Any]] = None
+    ) -> "VisitDocumentation":
+        """
+        Opis (kody ICD) i SOAP wizyty liczone równolegle.
 
-        async def run_gemini():
-            return await loop.run_in_executor(None, lambda: self._call_with_retry(self._call_gemini, gemini_key, prompt))
+        Wybór dostawcy i lista specjalizacji ustalane raz; słowniki z bazy
+        wiedzy ładują się w executorze, gdy SOAP już czeka na model. Oba
+        wywołania idą pod limitem PROVIDER_CONCURRENCY, więc koniec wizyty
+        trwa tyle co dłuższe z nich, a nie ich suma.
 
-        if model_type == "claude":
-            try:
-                log(f"[LLM] SOAP: using {model_name}")
-                result_text = await run_claude()
-            except Exception as e:
-                if preferred_model == "Auto" and has_gemini_key:
-                    log(f"[LLM] SOAP Claude error ({e}), fallback to Gemini")
-                    used_model = "Gemini 2.5 Flash (Fallback)"
-                    result_text = await run_gemini()
-                else:
-                    raise e
-        else:
-            log(f"[LLM] SOAP: using {model_name}")
-            result_text = await run_gemini()
+        Musi być wołane w pętli zdarzeń - zwraca od razu.
 
-        cleaned = result_text.strip()
-        if cleaned.startswith("```"):
-            cleaned = cleaned.split("```")[1]
-            if cleaned.startswith("json"):
-                cleaned = cleaned[4:]
-        cleaned = cleaned.strip()
+        Args:
+            soap_transcript: Tekst dla SOAP, jeśli inny niż transcript
+                (np. sam nowy fragment przy aktualizacji previous_soap)
+            include_soap: False - tylko opis (documentation.soap = None)
 
-        try:
-            return json.loads(cleaned), used_model
-        except json.JSONDecodeError as e:
-            log(f"[LLM] SOAP JSON error: {e}")
-            return {}, f"JSON error ({used_model})"
+        Returns:
+            VisitDocumentation z zadaniami description / soap - każde daje
+            (wynik, model) gdy tylko się skończy; gather() czeka na oba
+        """
+        loop = asyncio.get_running_loop()
+        active_spec_ids = self._resolve_spec_ids(spec_id, spec_ids)
+        plan = self._select_generation_model(config)
+        knowledge = (
+            loop.run_in_executor(None, self._load_knowledge_context, active_spec_ids)
+            if plan else None
+        )
+
+        async def describe():
+            if not plan:
+                print("[LLM] Brak kluczy API. Generowanie niemożliwe.", flush=True)
+                return {"diagnozy": [], "procedury": []}, "Brak API"
+            return await self._describe(transcript, await knowledge, active_spec_ids, plan)
+
+        async def soap():
+            text = transcript if soap_transcript is None else soap_transcript
+            if not (text or "").strip():
+                return {}, "No transcript"
+            if not plan:
+                return {}, "No API"
+            return await self._soap(text, plan, previous=previous_soap)
+
+        documentation = VisitDocumentation(
+            description=loop.create_task(describe()),
+            soap=loop.create_task(soap()) if include_soap else None,
+        )
+        for task in documentation.tasks.values():
+            task.add_done_callback(_log_documentation_error)
+        return documentation
 
     async def generate_suggestions(
         self,
@@ -454,35 +705,7 @@ Zwroc TYLKO poprawny JSON z kluczami:
         Obsługuje multi-select specjalizacji (spec_ids ma priorytet nad spec_id).
         """
 
-        # Ustal listę specjalizacji
-        if spec_ids is not None:
-            active_spec_ids = spec_ids
-        elif spec_id is not None:
-            active_spec_ids = [spec_id]
-        elif SPEC_MANAGER_AVAILABLE:
-            spec_manager = get_specialization_manager()
-            active_spec_ids = spec_manager.get_active_ids()
-        else:
-            active_spec_ids = [1]
-
-        if SPEC_MANAGER_AVAILABLE:
-            spec_manager = get_specialization_manager()
-            prompt = spec_manager.build_suggestions_prompt(
-                transcript=transcript,
-                exclude_questions=exclude_questions,
-                spec_ids=active_spec_ids
-            )
-        else:
-            exclude_section = ""
-            if exclude_questions:
-                exclude_list = "\n".join([f"- {q}" for q in exclude_questions])
-                exclude_section = f"PYTANIA JUĹ» ZADANE:\n{exclude_list}"
-
-            prompt = f"""JesteĹ› doĹ›wiadczonym lekarzem. Zasugeruj 3 pytania dla pacjenta.
-Kontekst:
-{transcript}
-{exclude_section}
-Format JSON: ["Pytanie 1?", "Pytanie 2?", "Pytanie 3?"]"""
+        prompt = self._build_suggestions_prompt(transcript, exclude_questions, spec_id, spec_ids)
 
         gemini_key = config.get("api_key", "")
         loop = asyncio.get_event_loop()
@@ -514,6 +737,68 @@ Format JSON: ["Pytanie 1?", "Pytanie 2?", "Pytanie 3?"]"""
             print(f"[LLM] Suggestion error: {e}", flush=True)
             return []
 
+    async def stream_suggestions(
+        self,
+        transcript: str,
+        config: Dict,
+        exclude_questions: Optional[List[str]] = None,
+        spec_id: int = None,
+        spec_ids: list = None
+    ) -> AsyncIterator[str]:
+        """
+        Strumieniowa wersja generate_suggestions - kazde pytanie oddawane,
+        gdy tylko jego string w tablicy JSON sie zamknie.
+        """
+        prompt = self._build_suggestions_prompt(transcript, exclude_questions, spec_id, spec_ids)
+        try:
+            async for event, payload in self.stream_json(prompt, config):
+                if event != "item":
+                    continue
+                key, item = payload
+                if key is None and isinstance(item, str) and item.strip():
+                    yield item.strip()
+        except Exception as e:
+            print(f"[LLM] Suggestion error: {e}", flush=True)
+
+    def _build_suggestions_prompt(
+        self,
+        transcript: str,
+        exclude_questions: Optional[List[str]],
+        spec_id: Optional[int],
+        spec_ids: Optional[list]
+    ) -> str:
+        # Ustal listę specjalizacji
+        if spec_ids is not None:
+            active_spec_ids = spec_ids
+        elif spec_id is not None:
+            active_spec_ids = [spec_id]
+        elif SPEC_MANAGER_AVAILABLE:
+            spec_manager = get_specialization_manager()
+            active_spec_ids = spec_manager.get_active_ids()
+        else:
+            active_spec_ids = [1]
+
+        if SPEC_MANAGER_AVAILABLE:
+            spec_manager = get_specialization_manager()
+            prompt = spec_manager.build_suggestions_prompt(
+                transcript=transcript,
+                exclude_questions=exclude_questions,
+                spec_ids=active_spec_ids
+            )
+        else:
+            exclude_section = ""
+            if exclude_questions:
+                exclude_list = "\n".join([f"- {q}" for q in exclude_questions])
+                exclude_section = f"PYTANIA JUĹ» ZADANE:\n{exclude_list}"
+
+            prompt = f"""JesteĹ› doĹ›wiadczonym lekarzem. Zasugeruj 3 pytania dla pacjenta.
+Kontekst:
+{transcript}
+{exclude_section}
+Format JSON: ["Pytanie 1?", "Pytanie 2?", "Pytanie 3?"]"""
+
+        return prompt
+
     async def classify_conversation_mode(
         self,
         transcript: str,
@@ -587,6 +872,195 @@ Zwróć WYŁĄCZNIE poprawny JSON:
             print(f"[LLM] Intent classify error: {e}", flush=True)
         return None
 
+    async def generate_live_cards(
+        self,
+        transcript: str,
+        config: Dict,
+        exclude_questions: Optional[List[str]] = None,
+        spec_ids: list = None,
+        mode_hint: Optional[str] = None,
+        cards_kind: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Jedno wywolanie: klasyfikacja trybu rozmowy + karty dla tego trybu.
+
+        Args:
+            mode_hint: Wstepny tryb z heurystyki (podpowiedz dla modelu)
+            cards_kind: "questions" / "decision" wymusza rodzaj kart (None = wg trybu)
+
+        Zwraca dict: {"mode": "...", "confidence": 0..1, "reason": "...",
+                      "cards": [{"type": "question|check|script", "text": "..."}]}
+        albo None przy bledzie.
+        """
+        result = None
+        async for event, payload in self.stream_live_cards(
+            transcript,
+            config,
+            exclude_questions=exclude_questions,
+            spec_ids=spec_ids,
+            mode_hint=mode_hint,
+            cards_kind=cards_kind
+        ):
+            if event == "done":
+                result = payload
+        return result
+
+    async def stream_live_cards(
+        self,
+        transcript: str,
+        config: Dict,
+        exclude_questions: Optional[List[str]] = None,
+        spec_ids: list = None,
+        mode_hint: Optional[str] = None,
+        cards_kind: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Strumieniowa wersja generate_live_cards.
+
+        Zwraca zdarzenia w kolejnosci:
+            ("header", {"mode", "confidence", "reason"}) - przed pierwsza karta
+            ("card", {"type", "text"}) - kazda karta, gdy tylko sie zamknie
+            ("done", wynik jak z generate_live_cards albo None)
+        """
+        if not transcript:
+            yield "done", None
+            return
+
+        prompt = self._build_live_cards_prompt(transcript, exclude_questions, spec_ids, mode_hint, cards_kind)
+        parser = StreamingJSONParser()
+        header_sent = False
+        streamed = 0
+
+        try:
+            async for chunk in self._stream_text(prompt, config):
+                for key, item in parser.feed(chunk):
+                    card = self._normalize_live_card(item) if key == "cards" else None
+                    if card is None or streamed >= 3:
+                        continue
+                    if not header_sent:
+                        # Pola trybu sa w JSON-ie przed "cards" - juz kompletne
+                        header_sent = True
+                        yield "header", self._live_cards_header(parser.partial())
+                    streamed += 1
+                    yield "card", card
+                if parser.finished:
+                    break
+        except Exception as e:
+            print(f"[LLM] Live cards error: {e}", flush=True)
+            yield "done", None
+            return
+
+        data = parser.result()
+        if not isinstance(data, dict):
+            yield "done", None
+            return
+
+        cards = [c for c in (self._normalize_live_card(item) for item in data.get("cards") or []) if c]
+        result = self._live_cards_header(data)
+        result["cards"] = cards[:3]
+        if not header_sent:
+            yield "header", {k: result[k] for k in ("mode", "confidence", "reason")}
+        yield "done", result
+
+    @staticmethod
+    def _normalize_live_card(item: Any) -> Optional[Dict[str, Any]]:
+        """Karta z odpowiedzi modelu -> {"type", "text"} (None gdy niepoprawna)."""
+        if isinstance(item, str):
+            item = {"type": "question", "text": item}
+        if not isinstance(item, dict):
+            return None
+        text = (item.get("text") or "").strip()
+        ctype = (item.get("type") or "question").strip().lower()
+        if not text or ctype not in ("check", "script", "question"):
+            return None
+        return {"type": ctype, "text": text}
+
+    @staticmethod
+    def _live_cards_header(data: Any) -> Dict[str, Any]:
+        """Tryb rozmowy z (czesciowego) JSON-a odpowiedzi."""
+        data = data if isinstance(data, dict) else {}
+        try:
+            confidence = float(data.get("confidence", 0.0) or 0.0)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return {
+            "mode": (data.get("mode") or "general").strip().lower(),
+            "confidence": confidence,
+            "reason": data.get("reason", "") or "llm",
+        }
+
+    def _build_live_cards_prompt(
+        self,
+        transcript: str,
+        exclude_questions: Optional[List[str]],
+        spec_ids: Optional[list],
+        mode_hint: Optional[str],
+        cards_kind: Optional[str]
+    ) -> str:
+        spec_label = ""
+        focus_section = ""
+        system = "Jestes asystentem lekarza prowadzacym go przez wywiad z pacjentem."
+        if SPEC_MANAGER_AVAILABLE:
+            spec_manager = get_specialization_manager()
+            ids = spec_ids if spec_ids else spec_manager.get_active_ids()
+            names = []
+            for sid in ids or []:
+                spec = spec_manager.get_by_id(sid)
+                if spec:
+                    names.append(spec.name)
+            if names:
+                spec_label = f"Specjalizacja: {', '.join(names)}"
+            prompts = spec_manager.get_merged_prompts(ids)
+            if prompts.suggestions_system:
+                system = prompts.suggestions_system
+            if prompts.suggestions_focus_areas:
+                focus_areas = "\n".join([f"- {area}" for area in prompts.suggestions_focus_areas])
+                focus_section = f"Obszary na ktore zwracaj uwage:\n{focus_areas}\n"
+
+        exclude_section = ""
+        if exclude_questions:
+            exclude_list = "\n".join([f"- {q}" for q in exclude_questions])
+            exclude_section = f"PYTANIA JUZ ZADANE (NIE POWTARZAJ ICH):\n{exclude_list}\n"
+
+        hint_section = f"Wstepna ocena heurystyczna trybu: {mode_hint}\n" if mode_hint else ""
+
+        if cards_kind == "decision":
+            cards_rule = "Niezaleznie od trybu wygeneruj karty wsparcia decyzji (check/script/question)."
+        elif cards_kind == "questions":
+            cards_rule = "Niezaleznie od trybu wygeneruj 3 pytania (type: \"question\")."
+        else:
+            cards_rule = (
+                "Jesli tryb to decision - wygeneruj karty wsparcia decyzji (check/script/question).\n"
+                "W pozostalych trybach - 3 pytania do pacjenta (type: \"question\")."
+            )
+
+        prompt = f"""{system}
+{spec_label}
+{focus_section}
+Oto dotychczasowy przebieg rozmowy:
+---
+{transcript}
+---
+{exclude_section}{hint_section}
+Zadanie 1: Okresl TRYB rozmowy:
+- symptom: rozmowa objawowa/diagnostyczna (dolegliwosci)
+- decision: rozmowa poradnicza/wybor opcji (np. decyzja o metodzie)
+- followup: kontrola po leczeniu / wizyta kontrolna
+- admin: formalnosci (zaswiadczenia, recepty, skierowania)
+- general: niejasne / brak danych
+
+Zadanie 2: Wygeneruj DOKLADNIE 3 krotkie karty dla lekarza.
+{cards_rule}
+Karty wsparcia decyzji:
+- type: "check" (rzecz do sprawdzenia/odhaczenia),
+- type: "script" (krotki fragment, co lekarz ma powiedziec),
+- type: "question" (pytanie tylko jesli konieczne).
+
+Zwróć WYŁĄCZNIE poprawny JSON:
+{{"mode":"symptom","confidence":0.0,"reason":"krotkie uzasadnienie","cards":[{{"type":"question","text":"..."}},{{"type":"question","text":"..."}},{{"type":"question","text":"..."}}]}}
+"""
+        return prompt
+
     async def generate_decision_cards(
         self,
         transcript: str,
@@ -689,9 +1163,11 @@ Zwróć WYŁĄCZNIE JSON w formacie:
         if not script:
             return ""
 
+        # Kontekst przychodzi z ConversationContextBuilder (budżet "script",
+        # podsumowanie na początku) - tu tylko bezpiecznik na końcówce
         transcript = transcript or ""
-        if len(transcript) > 2000:
-            transcript = transcript[-2000:]
+        if len(transcript) > 8000:
+            transcript = transcript[-8000:]
 
         spec_label = ""
         if SPEC_MANAGER_AVAILABLE:
@@ -751,6 +1227,53 @@ Zwrac tylko tekst skryptu, bez cudzyslowow i bez dodatkowych naglowkow.
             print(f"[LLM] Script expansion error: {e}", flush=True)
             return ""
 
+    async def summarize_dialogue(
+        self,
+        previous_summary: str,
+        new_dialogue: str,
+        config: Dict,
+        max_words: int = 120
+    ) -> str:
+        """
+        Aktualizuje zwiezle podsumowanie rozmowy o nowy fragment transkryptu.
+        Zwraca czysty tekst (pusty przy bledzie).
+        """
+        if not new_dialogue:
+            return previous_summary or ""
+
+        previous_section = ""
+        if previous_summary:
+            previous_section = f"Dotychczasowe podsumowanie:\n{previous_summary}\n"
+
+        prompt = f"""Jestes asystentem lekarza. Aktualizujesz robocze podsumowanie wizyty.
+{previous_section}
+Nowy fragment rozmowy:
+{new_dialogue}
+
+Napisz zaktualizowane podsumowanie (maksymalnie {max_words} slow): zgloszone objawy,
+istotne fakty z wywiadu, ustalenia i otwarte watki. Bez wstepow i bez formatowania.
+"""
+
+        gemini_key = config.get("api_key", "")
+        loop = asyncio.get_event_loop()
+
+        try:
+            if gemini_key and GENAI_AVAILABLE:
+                response = await loop.run_in_executor(None, lambda: self._call_with_retry(self._call_gemini, gemini_key, prompt))
+            else:
+                session_key = config.get("session_key", "")
+                claude_token = self._load_claude_token()
+                if (session_key or claude_token) and CLAUDE_AVAILABLE:
+                    auth_key = session_key if session_key and session_key.startswith("sk-") else claude_token
+                    response = await loop.run_in_executor(None, lambda: self._call_with_retry(self._call_claude, auth_key, prompt))
+                else:
+                    return ""
+
+            return response.strip()
+        except Exception as e:
+            print(f"[LLM] Summary error: {e}", flush=True)
+            return ""
+
     async def generate_patient_answers(
         self,
         question: str,
@@ -872,3 +1395,96 @@ JSON: {{"corrected_text": "...", "needs_newline": true/false}}"""
             print(f"[LLM] Validation error: {e}", flush=True)
             return {"corrected_text": segment, "needs_newline": False}
 
+
+# === PROXY CLAUDE (wspólne dla wszystkich instancji LLMService) ===
+
+_proxy_lock = threading.Lock()
+_proxy_port: Optional[int] = None
+_proxy_token: Optional[str] = None
+_proxy_metrics: Dict[str, Any] = {
+    "prestarted": False,          # Start w tle przy uruchomieniu aplikacji
+    "startup_s": None,            # Czas startu proxy (do gotowości /health)
+    "first_call_wait_s": None,    # Ile pierwsze zapytanie czekało na proxy
+}
+
+
+class _ThreadStdoutCapture(io.TextIOBase):
+    """Przechwytuje print() tylko z bieżącego wątku - inne piszą normalnie."""
+
+    def __init__(self, target):
+        self._target = target
+        self._thread = threading.get_ident()
+        self.captured = io.StringIO()
+
+    def write(self, text):
+        if threading.get_ident() == self._thread:
+            return self.captured.write(text)
+        return self._target.write(text)
+
+    def flush(self):
+        self._target.flush()
+
+
+def ensure_claude_proxy(auth_token: str) -> int:
+    """
+    Uruchamia lokalne proxy Claude (raz na proces i token) i czeka na jego
+    gotowość (/health). Zwraca port.
+    """
+    global _proxy_port, _proxy_token
+    if not PROXY_AVAILABLE:
+        raise RuntimeError("Moduł proxy nie jest dostępny")
+
+    with _proxy_lock:
+        if _proxy_port and _proxy_token == auth_token:
+            return _proxy_port
+
+        from proxy import start_proxy_server, get_proxy_base_url
+
+        started = time.perf_counter()
+        # Przechwytywanie stdout zeby proxy nie smiecilo
+        capture = _ThreadStdoutCapture(sys.stdout)
+        old_stdout, sys.stdout = sys.stdout, capture
+        try:
+            success, port = start_proxy_server(
+                auth_token, port=8765, pool_size=LLMService.PROXY_CONVERSATION_POOL
+            )
+        finally:
+            sys.stdout = old_stdout
+
+        if not success:
+            detail = capture.captured.getvalue().strip()
+            if detail:
+                raise Exception(f"Nie udalo sie uruchomic proxy: {detail}")
+            raise Exception("Nie udalo sie uruchomic proxy")
+
+        _proxy_port, _proxy_token = port, auth_token
+        os.environ["ANTHROPIC_BASE_URL"] = get_proxy_base_url(port)
+        _proxy_metrics["startup_s"] = time.perf_counter() - started
+        log(f"[LLM] Claude proxy ready on port {port} in {_proxy_metrics['startup_s']:.2f}s")
+        return port
+
+
+def prestart_claude_proxy(config: Dict) -> Optional[threading.Thread]:
+    """
+    Startuje proxy w tle przy uruchomieniu aplikacji, jeśli generowanie
+    pójdzie przez Claude - pierwsze zapytanie nie płaci za start proxy.
+    """
+    plan = LLMService()._select_generation_model(config)
+    if not plan or plan["type"] != "claude":
+        return None
+
+    def run():
+        try:
+            ensure_claude_proxy(plan["claude_key"])
+        except Exception as e:
+            log(f"[LLM] Claude proxy prestart failed: {e}")
+
+    _proxy_metrics["prestarted"] = True
+    thread = threading.Thread(target=run, daemon=True, name="claude-proxy-prestart")
+    thread.start()
+    return thread
+
+
+def get_proxy_metrics() -> Dict[str, Any]:
+    """Metryki startu proxy Claude (m.in. opóźnienie pierwszego zapytania)."""
+    return dict(_proxy_metrics)
@@ -2,13 +2,19 @@
 PDF report generator based on ReportLab (pure Python, no system deps).
 """
 
+import multiprocessing
 import os
+import shutil
 import tempfile
+import threading
+import time
 import urllib.request
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from datetime import datetime
-from typing import Optional
-from dataclasses import dataclass, asdict
+from datetime import datetime, date
+from typing import Optional, List, Dict, Tuple, Callable
+from dataclasses import dataclass, asdict, field
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -19,10 +25,122 @@ from xml.sax.saxutils import escape as xml_escape
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
-from core.models import Visit
-from core.repositories import PatientRepository
+from core.models import Visit, Patient, VisitStatus
+from core.repositories import PatientRepository, VisitRepository
 from core.log_utils import log
 
+# Scalanie wielu PDF w jeden plik (opcjonalne)
+try:
+    from pypdf import PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PdfWriter = None
+    PYPDF_AVAILABLE = False
+
+
+FONTS_DIR = (Path(__file__).parent.parent / "assets" / "fonts").resolve()
+# Pobrane fonty - w katalogu użytkownika (assets/ bywa tylko do odczytu, np. w exe)
+FONT_CACHE_DIR = Path(os.environ.get("LOCALAPPDATA") or Path.home() / ".cache") / "Wizyta" / "fonts"
+FONT_URLS = {
+    "DejaVuSans.ttf": "https://raw.githubusercontent.com/dejavu-fonts/dejavu-fonts/version-2.37/ttf/DejaVuSans.ttf",
+    "DejaVuSans-Bold.ttf": "https://raw.githubusercontent.com/dejavu-fonts/dejavu-fonts/version-2.37/ttf/DejaVuSans-Bold.ttf",
+}
+FONT_DOWNLOAD_TIMEOUT = 10.0
+_TTF_SIGNATURES = (b"\x00\x01\x00\x00", b"true", b"OTTO")
+
+# Wynik rozwiązania fontów (base, bold) - raz na proces
+_resolved_fonts: Optional[Tuple[str, str]] = None
+_fonts_lock = threading.Lock()
+
+
+def _is_font_file(path: Path) -> bool:
+    """Czy plik to prawdziwy TTF/OTF (a nie np. strona HTML z nieudanego pobrania)."""
+    try:
+        if not path.exists() or path.stat().st_size < 100_000:
+            return False
+        with open(path, "rb") as f:
+            return f.read(4) in _TTF_SIGNATURES
+    except OSError:
+        return False
+
+
+def _download_font(path: Path, url: str) -> bool:
+    """Pobiera font do lokalnego cache (atomowo - plik .part, potem rename)."""
+    tmp_path = path.with_suffix(path.suffix + ".part")
+    try:
+        log(f"[PDF] Downloading font: {path}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with urllib.request.urlopen(url, timeout=FONT_DOWNLOAD_TIMEOUT) as response:
+            tmp_path.write_bytes(response.read())
+        if not _is_font_file(tmp_path):
+            log(f"[PDF] Downloaded file is not a font: {url}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        log(f"[PDF] Font download failed for {path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return False
+
+
+def _register_font(font_name: str, path: Path) -> bool:
+    if not _is_font_file(path):
+        return False
+    try:
+        pdfmetrics.registerFont(TTFont(font_name, str(path)))
+        return True
+    except Exception as e:
+        log(f"[PDF] Font register failed for {path}: {e}")
+        return False
+
+
+def resolve_fonts(allow_download: bool = True) -> Tuple[str, str]:
+    """
+    Rejestruje fonty z polskimi znakami i zwraca (base, bold).
+
+    Kolejność: DejaVu z assets/fonts, wcześniej pobrane do FONT_CACHE_DIR,
+    systemowe DejaVu, Arial z Windows. Pobranie (z timeoutem, do cache
+    użytkownika) tylko gdy żaden lokalny font się nie zarejestruje; na
+    końcu Helvetica. Wynik zapamiętany na cały proces.
+    """
+    global _resolved_fonts
+    with _fonts_lock:
+        if _resolved_fonts is not None:
+            return _resolved_fonts
+
+        started = time.perf_counter()
+        win_fonts = Path(os.environ.get("WINDIR", "C:\\Windows")) / "Fonts"
+        candidates = [
+            ("DejaVuSans", FONTS_DIR / "DejaVuSans.ttf", "DejaVuSans-Bold", FONTS_DIR / "DejaVuSans-Bold.ttf"),
+            ("DejaVuSans", FONT_CACHE_DIR / "DejaVuSans.ttf", "DejaVuSans-Bold", FONT_CACHE_DIR / "DejaVuSans-Bold.ttf"),
+            ("DejaVuSans", Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"),
+             "DejaVuSans-Bold", Path("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")),
+            # Windows fallback (local system fonts)
+            ("Arial", win_fonts / "arial.ttf", "Arial-Bold", win_fonts / "arialbd.ttf"),
+        ]
+        fonts = _register_first(candidates)
+        if fonts is None and allow_download:
+            for filename, url in FONT_URLS.items():
+                if not _is_font_file(FONT_CACHE_DIR / filename):
+                    _download_font(FONT_CACHE_DIR / filename, url)
+            fonts = _register_first(candidates[1:2])
+
+        _resolved_fonts = fonts or ("Helvetica", "Helvetica-Bold")
+        log(f"[PDF] Using fonts: base={_resolved_fonts[0]}, bold={_resolved_fonts[1]} "
+            f"({time.perf_counter() - started:.2f}s)")
+        return _resolved_fonts
+
+
+def _register_first(candidates: List[Tuple[str, Path, str, Path]]) -> Optional[Tuple[str, str]]:
+    """Pierwsza para (regular, bold), której regular się rejestruje."""
+    for regular_name, regular_path, bold_name, bold_path in candidates:
+        if not _register_font(regular_name, regular_path):
+            continue
+        # Use regular for bold to preserve Polish glyphs
+        return regular_name, (bold_name if _register_font(bold_name, bold_path) else regular_name)
+    return None
+
 
 @dataclass
 class ClinicConfig:
@@ -42,78 +160,34 @@ class ClinicConfig:
         return asdict(self)
 
 
+@dataclass
+class BatchExportResult:
+    """Wynik eksportu zbiorczego."""
+    output_path: str                 # Katalog, archiwum ZIP albo scalony PDF
+    visits: int = 0
+    pages: int = 0
+    elapsed: float = 0.0
+    files: List[str] = field(default_factory=list)
+    failed: List[Tuple[str, str]] = field(default_factory=list)   # (visit_id, błąd)
+
+    @property
+    def pages_per_second(self) -> float:
+        return self.pages / self.elapsed if self.elapsed > 0 else 0.0
+
+
 class PDFGenerator:
     """PDF report generator for visits (ReportLab)."""
 
+    EXPORT_FORMATS = ("dir", "zip", "merged")
+    MIN_POOL_VISITS = 4   # Mniej wizyt - renderowanie w bieżącym procesie
+
     def __init__(self, clinic_config: Optional[ClinicConfig] = None):
         self.clinic_config = clinic_config or ClinicConfig()
         self.styles = getSampleStyleSheet()
+        self.last_page_count = 0
 
-        # Register Unicode fonts (Polish diacritics)
-        fonts_dir = (Path(__file__).parent.parent / "assets" / "fonts").resolve()
-        regular_path = fonts_dir / "DejaVuSans.ttf"
-        bold_path = fonts_dir / "DejaVuSans-Bold.ttf"
-        font_urls = {
-            "DejaVuSans.ttf": "https://raw.githubusercontent.com/dejavu-fonts/dejavu-fonts/version-2.37/ttf/DejaVuSans.ttf",
-            "DejaVuSans-Bold.ttf": "https://raw.githubusercontent.com/dejavu-fonts/dejavu-fonts/version-2.37/ttf/DejaVuSans-Bold.ttf",
-        }
-        self.base_font = "Helvetica"
-        self.bold_font = "Helvetica-Bold"
-
-        def _maybe_download(path: Path, url: str) -> None:
-            try:
-                if not path.exists() or path.stat().st_size < 100_000:
-                    log(f"[PDF] Downloading font: {path}")
-                    urllib.request.urlretrieve(url, str(path))
-            except Exception as e:
-                log(f"[PDF] Font download failed for {path}: {e}")
-
-        def _register_font(font_name: str, path: Path) -> bool:
-            try:
-                if path.exists():
-                    size = path.stat().st_size
-                    log(f"[PDF] Font candidate: {path} ({size} bytes)")
-                    pdfmetrics.registerFont(TTFont(font_name, str(path)))
-                    return True
-                log(f"[PDF] Missing font: {path}")
-                return False
-            except Exception as e:
-                log(f"[PDF] Font register failed for {path}: {e}")
-                return False
-
-        try:
-            fonts_dir.mkdir(parents=True, exist_ok=True)
-            _maybe_download(regular_path, font_urls["DejaVuSans.ttf"])
-            _maybe_download(bold_path, font_urls["DejaVuSans-Bold.ttf"])
-
-            has_regular = _register_font("DejaVuSans", regular_path)
-            has_bold = _register_font("DejaVuSans-Bold", bold_path)
-
-            if has_regular:
-                self.base_font = "DejaVuSans"
-            if has_bold:
-                self.bold_font = "DejaVuSans-Bold"
-            elif has_regular:
-                # Use regular for bold to preserve Polish glyphs
-                self.bold_font = self.base_font
-
-            if not has_regular:
-                # Windows fallback (local system fonts)
-                win_fonts = Path(os.environ.get("WINDIR", "C:\\Windows")) / "Fonts"
-                arial = win_fonts / "arial.ttf"
-                arial_bold = win_fonts / "arialbd.ttf"
-                if _register_font("Arial", arial):
-                    self.base_font = "Arial"
-                if _register_font("Arial-Bold", arial_bold):
-                    self.bold_font = "Arial-Bold"
-                elif self.base_font == "Arial":
-                    self.bold_font = self.base_font
-        except Exception as e:
-            log(f"[PDF] Font initialization error: {e}")
-            self.base_font = "Helvetica"
-            self.bold_font = "Helvetica-Bold"
-
-        log(f"[PDF] Using fonts: base={self.base_font}, bold={self.bold_font}")
+        # Unicode fonts (Polish diacritics) - registered once per process
+        self.base_font, self.bold_font = resolve_fonts()
 
         # Apply fonts to base styles
         self.styles["Normal"].fontName = self.base_font
@@ -221,8 +295,11 @@ class PDFGenerator:
         visit: Visit,
         output_path: Optional[str] = None,
         open_after: bool = False,
+        patient: Optional[Patient] = None,
+        sync_config: bool = True,
     ) -> str:
-        self._sync_clinic_config()
+        if sync_config:
+            self._sync_clinic_config()
         visit_dict = visit.to_dict()
         diagnoses = [d.to_dict() for d in visit.diagnoses]
         procedures = [p.to_dict() for p in visit.procedures]
@@ -332,11 +409,9 @@ class PDFGenerator:
 
         visit_date = visit.visit_date if hasattr(visit, "visit_date") else None
         visit_date_str = self._format_datetime(visit_date) if isinstance(visit_date, datetime) else str(visit_date or "")
-        patient_repo = PatientRepository()
-        patient = None
-        if getattr(visit, "patient_id", None):
+        if patient is None and getattr(visit, "patient_id", None):
             try:
-                patient = patient_repo.get_by_id(visit.patient_id)
+                patient = PatientRepository().get_by_id(visit.patient_id)
             except Exception:
                 patient = None
 
@@ -527,12 +602,143 @@ class PDFGenerator:
         story.append(Paragraph(footer, self.styles["Small"]))
 
         doc.build(story)
+        self.last_page_count = doc.page
 
         if open_after:
             self._open_file(output_path)
 
         return output_path
 
+    def export_visits(
+        self,
+        output_path: str,
+        visit_ids: Optional[List[str]] = None,
+        output_format: str = "zip",
+        status: Optional[VisitStatus] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        patient_id: Optional[int] = None,
+        search: Optional[str] = None,
+        workers: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> BatchExportResult:
+        """
+        Eksport zbiorczy (np. miesięczne archiwum) - wizyty i pacjenci
+        ładowani hurtowo, PDF-y renderowane w puli procesów. Każdy proces
+        rejestruje fonty i style raz, przy starcie.
+
+        Args:
+            output_path: Katalog (dir), plik .zip (zip) albo .pdf (merged)
+            visit_ids: Konkretne wizyty; None - wszystkie pasujące do filtrów
+            output_format: "dir", "zip" lub "merged" (wymaga pypdf)
+            workers: Liczba procesów (domyślnie liczba rdzeni)
+            on_progress: Callback (gotowe, wszystkie) po każdej wizycie
+
+        Blokujące - z UI wołać przez asyncio.to_thread().
+        """
+        if output_format not in self.EXPORT_FORMATS:
+            raise ValueError(f"Nieznany format eksportu: {output_format}")
+        if output_format == "merged" and not PYPDF_AVAILABLE:
+            raise RuntimeError("Scalanie PDF wymaga pakietu pypdf (pip install pypdf)")
+
+        started = time.perf_counter()
+        self._sync_clinic_config()
+        visits = VisitRepository().find_full(
+            visit_ids=visit_ids,
+            patient_id=patient_id,
+            status=status,
+            date_from=date_from,
+            date_to=date_to,
+            search=search,
+        )
+        patients = PatientRepository().get_by_ids([v.patient_id for v in visits])
+        result = BatchExportResult(output_path=output_path, visits=len(visits))
+        log(f"[PDF] Batch export: {len(visits)} visits -> {output_format} ({time.perf_counter() - started:.2f}s load)")
+
+        if output_format == "dir":
+            work_dir = Path(output_path)
+            work_dir.mkdir(parents=True, exist_ok=True)
+        else:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            work_dir = Path(tempfile.mkdtemp(prefix="wizyty_pdf_"))
+
+        jobs = [
+            (visit, patients.get(visit.patient_id), str(work_dir / self._batch_filename(visit)))
+            for visit in visits
+        ]
+        rendered: Dict[str, str] = {}
+        archive = zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) if output_format == "zip" else None
+
+        def on_rendered(visit_id: str, path: str, pages: int) -> None:
+            result.pages += pages
+            rendered[visit_id] = path
+            if archive is not None:
+                # Strumieniowo do archiwum - plik tymczasowy od razu znika
+                archive.write(path, arcname=Path(path).name)
+                os.remove(path)
+            if on_progress:
+                on_progress(len(rendered) + len(result.failed), len(jobs))
+
+        def on_failed(visit_id: str, error: Exception) -> None:
+            log(f"[PDF] Batch export failed for visit {visit_id}: {error}")
+            result.failed.append((visit_id, str(error)))
+            if on_progress:
+                on_progress(len(rendered) + len(result.failed), len(jobs))
+
+        try:
+            workers = workers or os.cpu_count() or 1
+            if workers <= 1 or len(jobs) < self.MIN_POOL_VISITS:
+                for visit, patient, path in jobs:
+                    try:
+                        self.generate_visit_report(visit, path, patient=patient, sync_config=False)
+                        on_rendered(visit.id, path, self.last_page_count)
+                    except Exception as e:
+                        on_failed(visit.id, e)
+            else:
+                # spawn wszędzie, jak na Windows i w exe - fork kopiowałby wątki
+                # aplikacji (NiceGUI, kolejka zapisów) razem z ich blokadami
+                with ProcessPoolExecutor(
+                    max_workers=min(workers, len(jobs)),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_export_worker,
+                    initargs=(self.clinic_config.to_dict(),),
+                ) as pool:
+                    futures = {pool.submit(_render_export_job, *job): job[0].id for job in jobs}
+                    for future in as_completed(futures):
+                        try:
+                            on_rendered(futures[future], *future.result())
+                        except Exception as e:
+                            on_failed(futures[future], e)
+
+            if output_format == "merged":
+                writer = PdfWriter()
+                for visit, _, _ in jobs:
+                    if visit.id in rendered:
+                        writer.append(rendered[visit.id])
+                with open(output_path, "wb") as f:
+                    writer.write(f)
+            if output_format == "dir":
+                result.files = [rendered[v.id] for v, _, _ in jobs if v.id in rendered]
+            else:
+                result.files = [output_path]
+        finally:
+            if archive is not None:
+                archive.close()
+            if output_format != "dir":
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        result.elapsed = time.perf_counter() - started
+        log(
+            f"[PDF] Batch export done: {len(rendered)}/{len(jobs)} visits, {result.pages} pages "
+            f"in {result.elapsed:.1f}s ({result.pages_per_second:.1f} pages/s)"
+        )
+        return result
+
+    @staticmethod
+    def _batch_filename(visit: Visit) -> str:
+        stamp = visit.visit_date.strftime("%Y%m%d_%H%M") if isinstance(visit.visit_date, datetime) else "wizyta"
+        return f"wizyta_{stamp}_{str(visit.id)[:8]}.pdf"
+
     def _open_file(self, path: str) -> None:
         """Open file in default app."""
         import subprocess
@@ -555,12 +761,38 @@ class PDFGenerator:
                 setattr(self.clinic_config, key, value)
 
 
+# Generator procesu roboczego eksportu zbiorczego (fonty i style rejestrowane raz)
+_worker_generator: Optional[PDFGenerator] = None
+
+
+def _init_export_worker(clinic_config: dict) -> None:
+    global _worker_generator
+    # Proces główny już pobrał fonty (albo nie da się ich pobrać)
+    resolve_fonts(allow_download=False)
+    _worker_generator = PDFGenerator(ClinicConfig(**clinic_config))
+
+
+def _render_export_job(visit: Visit, patient: Optional[Patient], output_path: str) -> Tuple[str, int]:
+    _worker_generator.generate_visit_report(visit, output_path, patient=patient, sync_config=False)
+    return output_path, _worker_generator.last_page_count
+
+
 _pdf_generator: Optional[PDFGenerator] = None
 
 
+_pdf_generator_lock = threading.Lock()
+
+
 def get_pdf_generator() -> PDFGenerator:
-    """Return singleton PDFGenerator."""
+    """
+    Return singleton PDFGenerator.
+
+    Pierwsze wywołanie rejestruje fonty (może pobierać) - aplikacja robi to
+    w wątku startowym, więc eksport z UI dostaje gotowy generator.
+    """
     global _pdf_generator
     if _pdf_generator is None:
-        _pdf_generator = PDFGenerator()
+        with _pdf_generator_lock:
+            if _pdf_generator is None:
+                _pdf_generator = PDFGenerator()
     return _pdf_generator
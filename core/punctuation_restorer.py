@@ -0,0 +1,255 @@
+"""
+Punctuation Restorer - lokalna interpunkcja i wielkie litery dla transkrypcji.
+
+Pierwszy etap walidacji segmentów Live (zamiast wysyłania każdego segmentu
+do LLM): reguły polskiej interpunkcji + mały model przecinków uczony na
+tekstach poprawionych przez LLM. Działa offline, w ułamku milisekundy.
+
+Zasada jak w walidacji LLM: NIE ZMIENIA SŁÓW - tylko znaki interpunkcyjne
+i wielkość pierwszej litery zdania.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class PunctuationResult:
+    """Wynik lokalnej interpunkcji."""
+    text: str
+    needs_newline: bool = False
+    confidence: float = 1.0   # 0..1 - poniżej progu warto dopytać LLM
+    changed: bool = False
+
+
+class PunctuationRestorer:
+    """
+    Reguły:
+    - przecinek przed spójnikami i zaimkami względnymi ("że", "który", "bo"...)
+      chyba że poprzedza je wyrażenie bez przecinka ("mimo że", "od kiedy")
+    - znak zapytania dla zdań zaczynających się słowem pytającym
+    - kropka na końcu segmentu, wielka litera na początku zdania
+
+    Model przecinków: observe() zlicza, przed którymi słowami w poprawionych
+    tekstach stoi przecinek; słowa z wysokim udziałem dochodzą do reguł.
+    """
+
+    # Przecinek przed tymi słowami (polskie zdania podrzędne / przeciwstawne)
+    COMMA_BEFORE = frozenset({
+        "że", "żeby", "aby", "bo", "ponieważ", "gdyż", "ale", "lecz", "jednak",
+        "więc", "czyli", "chociaż", "choć", "jeśli", "jeżeli", "gdy", "kiedy",
+        "który", "która", "które", "którego", "której", "któremu", "którym",
+        "których", "którzy", "którą", "dlatego", "zanim", "dopóki",
+    })
+    # Po tych słowach przecinka przed spójnikiem nie stawiamy ("mimo że")
+    NO_COMMA_AFTER = frozenset({
+        "mimo", "chyba", "tylko", "zwłaszcza", "podczas", "tak", "i", "oraz",
+        "albo", "lub", "ani", "a", "bo", "że", "od", "do", "na", "za", "o",
+        "w", "z", "po", "przez", "dla", "przy", "nawet", "właśnie", "jak",
+    })
+    QUESTION_WORDS = frozenset({
+        "czy", "jak", "jaki", "jaka", "jakie", "jakich", "jakim", "gdzie",
+        "kiedy", "dlaczego", "czemu", "ile", "co", "kto", "skąd", "dokąd",
+        "który", "która", "które", "którego", "której", "czyj",
+    })
+    # Zaczynają też zdania oznajmujące ("jak mówiłem...") - niższa pewność
+    AMBIGUOUS_QUESTION_WORDS = frozenset({"jak", "co", "kiedy", "który", "która", "które"})
+    # "od kiedy", "po co" - pytające tylko w parze
+    QUESTION_PAIRS = frozenset({("od", "kiedy"), ("od", "jak"), ("po", "co"), ("od", "ilu")})
+    QUESTION_TAGS = frozenset({"prawda"})
+
+    # Model przecinków
+    LEARN_MIN_COUNT = 5       # Min wystąpień słowa, by ufać statystyce
+    LEARN_MIN_RATIO = 0.7     # Min udział wystąpień z przecinkiem
+    LEARN_MAX_VOCAB = 5000    # Limit słownika (najrzadsze słowa są usuwane)
+
+    # Pewność
+    LONG_SENTENCE_WORDS = 18  # Dłuższe zdanie bez przecinka - pewnie brak podziału
+
+    _SPACE_BEFORE_PUNCT = re.compile(r"\s+([,.!?:;])")
+    _MISSING_SPACE = re.compile(r"([,.!?:;])(?=[^\W\d_])")
+    _MULTI_SPACE = re.compile(r"\s{2,}")
+    _WORD_STRIP = ".,!?:;\"'()…-"
+
+    def __init__(self):
+        # słowo -> [wystąpienia z przecinkiem przed, wszystkie wystąpienia]
+        self._comma_stats: Dict[str, List[int]] = {}
+        self._learned: frozenset = frozenset()
+
+    # === PUBLIC API ===
+
+    def restore(self, text: str, context: str = "") -> PunctuationResult:
+        """
+        Przywraca interpunkcję i wielkie litery w segmencie.
+
+        Args:
+            text: Surowy segment (jeden lub kilka sfinalizowanych fragmentów)
+            context: Koniec już zwalidowanego tekstu (do decyzji o nowej linii)
+
+        Returns:
+            PunctuationResult z tekstem i oceną pewności
+        """
+        original = text.strip()
+        if not original:
+            return PunctuationResult(text="", confidence=1.0)
+
+        if self.is_punctuated(original):
+            cleaned = self._normalize_spacing(original)
+            return PunctuationResult(
+                text=cleaned,
+                needs_newline=self._needs_newline(cleaned, context),
+                confidence=0.95,
+                changed=cleaned != original
+            )
+
+        sentences = self._split_sentences(self._normalize_spacing(original))
+        restored: List[str] = []
+        confidence = 0.9
+        for words, terminal in sentences:
+            words = self._insert_commas(words)
+            if not terminal:
+                terminal = "?" if self._is_question(words) else "."
+            sentence = " ".join(words).rstrip(",;:") + terminal
+            restored.append(self._capitalize(sentence))
+            confidence = min(confidence, self._sentence_confidence(words, terminal))
+
+        result = " ".join(restored)
+        return PunctuationResult(
+            text=result,
+            needs_newline=self._needs_newline(result, context),
+            confidence=confidence,
+            changed=result != original
+        )
+
+    def is_punctuated(self, text: str) -> bool:
+        """
+        Czy tekst już ma interpunkcję (np. z modelu finalnego): zaczyna się
+        wielką literą, kończy znakiem końca zdania, a dłuższe zdania mają
+        przecinki.
+        """
+        text = text.strip()
+        if not text or not text[0].isupper() or text[-1] not in ".?!…":
+            return False
+        for sentence in re.split(r"[.?!…]+", text):
+            if len(sentence.split()) > self.LONG_SENTENCE_WORDS * 2 // 3 and "," not in sentence:
+                return False
+        return True
+
+    def observe(self, corrected_text: str) -> None:
+        """Uczy model przecinków na tekście poprawionym (np. przez LLM)."""
+        prev_comma = False
+        for raw in corrected_text.split():
+            word = raw.strip(self._WORD_STRIP).lower()
+            if word:
+                stats = self._comma_stats.setdefault(word, [0, 0])
+                stats[1] += 1
+                if prev_comma:
+                    stats[0] += 1
+            prev_comma = raw.endswith(",")
+
+        if len(self._comma_stats) > self.LEARN_MAX_VOCAB:
+            ranked = sorted(self._comma_stats.items(), key=lambda item: item[1][1], reverse=True)
+            self._comma_stats = dict(ranked[:self.LEARN_MAX_VOCAB // 2])
+        self._learned = frozenset(
+            word for word, (with_comma, total) in self._comma_stats.items()
+            if total >= self.LEARN_MIN_COUNT and with_comma / total >= self.LEARN_MIN_RATIO
+        )
+
+    @property
+    def learned_words(self) -> frozenset:
+        """Słowa, przed którymi model nauczył się stawiać przecinek."""
+        return self._learned
+
+    # === RULES ===
+
+    def _normalize_spacing(self, text: str) -> str:
+        text = self._SPACE_BEFORE_PUNCT.sub(r"\1", text)
+        text = self._MISSING_SPACE.sub(r"\1 ", text)
+        return self._MULTI_SPACE.sub(" ", text)
+
+    @staticmethod
+    def _split_sentences(text: str) -> List[Tuple[List[str], str]]:
+        """Dzieli na zdania wg istniejącej interpunkcji: [(słowa, znak końca)]."""
+        sentences: List[Tuple[List[str], str]] = []
+        words: List[str] = []
+        for raw in text.split():
+            if raw[-1] in ".?!…" and len(raw.rstrip(".?!…")) > 0:
+                words.append(raw.rstrip(".?!…"))
+                sentences.append((words, raw[len(raw.rstrip(".?!…")):]))
+                words = []
+            elif raw.strip(".?!…"):
+                words.append(raw)
+        if words:
+            sentences.append((words, ""))
+        return sentences
+
+    def _insert_commas(self, words: List[str]) -> List[str]:
+        result = list(words)
+        for i in range(1, len(result)):
+            word = result[i].strip(self._WORD_STRIP).lower()
+            if word not in self.COMMA_BEFORE and word not in self._learned:
+                continue
+            prev = result[i - 1]
+            if prev[-1] in ",;:-":
+                continue
+            if prev.strip(self._WORD_STRIP).lower() in self.NO_COMMA_AFTER:
+                continue
+            result[i - 1] = prev + ","
+        return result
+
+    def _is_question(self, words: List[str]) -> bool:
+        if not words:
+            return False
+        first = words[0].strip(self._WORD_STRIP).lower()
+        second = words[1].strip(self._WORD_STRIP).lower() if len(words) > 1 else ""
+        if (first, second) in self.QUESTION_PAIRS:
+            return True
+        if first in self.QUESTION_WORDS:
+            return True
+        return words[-1].lower() in self.QUESTION_TAGS
+
+    @staticmethod
+    def _capitalize(sentence: str) -> str:
+        for i, ch in enumerate(sentence):
+            if ch.isalpha():
+                return sentence[:i] + ch.upper() + sentence[i + 1:]
+        return sentence
+
+    def _needs_newline(self, text: str, context: str) -> bool:
+        """Nowa linia na granicy pytanie/odpowiedź (zmiana mówiącego)."""
+        context = context.rstrip()
+        if not context:
+            return False
+        return context.endswith("?") or text.endswith("?")
+
+    def _sentence_confidence(self, words: List[str], terminal: str) -> float:
+        """Pewność reguł dla jednego zdania."""
+        n = len(words)
+        if n <= 3:
+            return 0.9
+        has_comma = any(w.endswith(",") for w in words)
+        if n > self.LONG_SENTENCE_WORDS and not has_comma:
+            # Pewnie kilka zdań bez podziału - reguły tego nie rozstrzygną
+            return 0.4
+        # Słowo pytające w środku zdania ("a czy to boli") - niejednoznaczne
+        if terminal == "." and any(
+            w.strip(self._WORD_STRIP).lower() in ("czy", "dlaczego", "ile") for w in words[1:]
+        ):
+            return 0.5
+        if terminal == "?" and words[0].strip(self._WORD_STRIP).lower() in self.AMBIGUOUS_QUESTION_WORDS:
+            return 0.6
+        if n > self.LONG_SENTENCE_WORDS:
+            return 0.65
+        return 0.8
+
+
+_punctuation_restorer: Optional[PunctuationRestorer] = None
+
+
+def get_punctuation_restorer() -> PunctuationRestorer:
+    """Return singleton PunctuationRestorer (model przecinków współdzielony między sesjami)."""
+    global _punctuation_restorer
+    if _punctuation_restorer is None:
+        _punctuation_restorer = PunctuationRestorer()
+    return _punctuation_restorer
@@ -1,6 +1,6 @@
 """Repozytorium pacjentów."""
 
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict
 from datetime import datetime
 
 from .base import BaseRepository
@@ -69,6 +69,15 @@ class PatientRepository(BaseRepository):
         )
         return Patient.from_dict(dict(row)) if row else None
 
+    def get_by_ids(self, patient_ids: List[int]) -> Dict[int, Patient]:
+        """Pobiera wielu pacjentów jednym zapytaniem: {id: Patient}."""
+        ids = sorted({pid for pid in patient_ids if pid is not None})
+        if not ids:
+            return {}
+        placeholders = ', '.join('?' for _ in ids)
+        rows = self._fetch_all(f'SELECT * FROM patients WHERE id IN ({placeholders})', tuple(ids))
+        return {row['id']: Patient.from_dict(dict(row)) for row in rows}
+
     def get_by_identifier(self, identifier_hash: str) -> Optional[Patient]:
         """Pobiera pacjenta po hashu identyfikatora (np. PESEL)."""
         row = self._fetch_one(
@@ -204,30 +204,7 @@ class VisitRepository(BaseRepository):
         Returns:
             Tuple (lista_wizyt, całkowita_liczba)
         """
-        conditions = []
-        params = []
-
-        if patient_id is not None:
-            conditions.append('v.patient_id = ?')
-            params.append(patient_id)
-
-        if status is not None:
-            conditions.append('v.status = ?')
-            params.append(str(status))
-
-        if date_from is not None:
-            conditions.append('DATE(v.visit_date) >= ?')
-            params.append(date_from.isoformat())
-
-        if date_to is not None:
-            conditions.append('DATE(v.visit_date) <= ?')
-            params.append(date_to.isoformat())
-
-        if search:
-            conditions.append('(v.transcript LIKE ? OR v.patient_name LIKE ?)')
-            params.extend([f'%{search}%', f'%{search}%'])
-
-        where_clause = ' AND '.join(conditions) if conditions else '1=1'
+        where_clause, params = self._build_filters(patient_id, status, date_from, date_to, search)
 
         with self._get_conn() as conn:
             # Całkowita liczba
@@ -262,6 +239,102 @@ class VisitRepository(BaseRepository):
 
             return visits, total
 
+    def find_full(
+        self,
+        visit_ids: Optional[List[str]] = None,
+        patient_id: Optional[int] = None,
+        status: Optional[VisitStatus] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        search: Optional[str] = None
+    ) -> List[Visit]:
+        """
+        Pobiera wizyty wraz z diagnozami i procedurami jednym zapytaniem
+        (eksport zbiorczy - bez osobnych zapytań na każdą wizytę).
+
+        Returns:
+            Lista wizyt posortowana chronologicznie
+        """
+        where_clause, params = self._build_filters(patient_id, status, date_from, date_to, search)
+        if visit_ids is not None:
+            if not visit_ids:
+                return []
+            placeholders = ', '.join('?' for _ in visit_ids)
+            where_clause += f' AND v.id IN ({placeholders})'
+            params.extend(visit_ids)
+
+        query = f'''
+            SELECT v.*,
+                (SELECT json_group_array(json_object(
+                    'id', d.id, 'visit_id', d.visit_id,
+                    'icd10_code', d.icd10_code, 'icd10_name', d.icd10_name,
+                    'location', d.location, 'description', d.description,
+                    'display_order', d.display_order))
+                 FROM (SELECT * FROM visit_diagnoses
+                       WHERE visit_id = v.id ORDER BY display_order) d) as diagnoses_json,
+                (SELECT json_group_array(json_object(
+                    'id', p.id, 'visit_id', p.visit_id,
+                    'procedure_code', p.procedure_code, 'procedure_name', p.procedure_name,
+                    'location', p.location, 'description', p.description,
+                    'display_order', p.display_order))
+                 FROM (SELECT * FROM visit_procedures
+                       WHERE visit_id = v.id ORDER BY display_order) p) as procedures_json
+            FROM visits v
+            WHERE {where_clause}
+            ORDER BY v.visit_date ASC
+        '''
+
+        with self._get_conn() as conn:
+            rows = conn.execute(query, tuple(params)).fetchall()
+
+        visits = []
+        for row in rows:
+            data = dict(row)
+            visit = self._row_to_visit(data)
+            visit.diagnoses = [
+                VisitDiagnosis.from_dict(d) for d in json.loads(data.get('diagnoses_json') or '[]')
+            ]
+            visit.procedures = [
+                VisitProcedure.from_dict(p) for p in json.loads(data.get('procedures_json') or '[]')
+            ]
+            visits.append(visit)
+        return visits
+
+    @staticmethod
+    def _build_filters(
+        patient_id: Optional[int] = None,
+        status: Optional[VisitStatus] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        search: Optional[str] = None
+    ) -> Tuple[str, list]:
+        """Warunek WHERE (alias v) i parametry dla filtrów listy wizyt."""
+        conditions = []
+        params = []
+
+        if patient_id is not None:
+            conditions.append('v.patient_id = ?')
+            params.append(patient_id)
+
+        if status is not None:
+            conditions.append('v.status = ?')
+            params.append(str(status))
+
+        if date_from is not None:
+            conditions.append('DATE(v.visit_date) >= ?')
+            params.append(date_from.isoformat())
+
+        if date_to is not None:
+            conditions.append('DATE(v.visit_date) <= ?')
+            params.append(date_to.isoformat())
+
+        if search:
+            conditions.append('(v.transcript LIKE ? OR v.patient_name LIKE ?)')
+            params.extend([f'%{search}%', f'%{search}%'])
+
+        where_clause = ' AND '.join(conditions) if conditions else '1=1'
+        return where_clause, params
+
     def delete(self, visit_id: str) -> bool:
         """
         Usuwa wizytę (CASCADE usuwa też diagnozy i procedury).
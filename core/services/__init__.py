@@ -1,5 +1,10 @@
 """Serwisy biznesowe."""
 
 from .visit_service import VisitService
+from .visit_write_queue import VisitWriteQueue, get_visit_write_queue
+from .visit_draft_service import VisitDraft, VisitDraftService, hand_off_visit_drafts, claim_visit_drafts
 
-__all__ = ['VisitService']
+__all__ = [
+    'VisitService', 'VisitWriteQueue', 'get_visit_write_queue',
+    'VisitDraft', 'VisitDraftService', 'hand_off_visit_drafts', 'claim_visit_drafts',
+]
@@ -0,0 +1,316 @@
+"""
+Szkice dokumentacji wizyty liczone w tle.
+
+W trakcie wizyty Live, co kilka zwalidowanych segmentów, serwis aktualizuje
+szkic SOAP (przyrostowo - model dostaje poprzedni szkic i tylko nowy tekst)
+oraz kandydatów kodów ICD (generate_description). Po zakończeniu wywiadu
+dialog zapisu i ekran opisu dostają gotowe szkice; dla tekstu, który
+przybył po ostatnim przebiegu, wystarcza krótki przebieg delta.
+
+Szkice należą do jednej wizyty (jednego widoku Live) - nie ma singletonu.
+Widok Live przekazuje je ekranowi głównemu przez hand_off_visit_drafts()
+(klucz w app.storage.user), a ten - dialogowi zapisu.
+"""
+
+import asyncio
+import re
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+from core.log_utils import log
+
+
+# Nagłówek sekcji Q+A doklejanej do transkryptu po wywiadzie Live -
+# pary są wyciągnięte z rozmowy, więc nie wymagają nowego kodowania
+QA_SECTION_HEADER = "=== ZEBRANE PYTANIA I ODPOWIEDZI ==="
+
+
+@dataclass
+class VisitDraft:
+    """Szkic dokumentacji bieżącej wizyty."""
+    soap: Dict[str, Any] = field(default_factory=dict)
+    soap_source: str = ""          # Transkrypt objęty szkicem SOAP
+    soap_model: str = ""
+    codes: Optional[Dict[str, Any]] = None   # {"diagnozy": [...], "procedury": [...]}
+    codes_source: str = ""
+    codes_model: str = ""
+    passes: int = 0
+    updated_at: Optional[datetime] = None
+
+    @property
+    def has_soap(self) -> bool:
+        return any((v or "").strip() for v in self.soap.values() if isinstance(v, str))
+
+
+class VisitDraftService:
+    """
+    Pipeline szkiców: on_text_validated() z kontrolera Live, odczyt przez
+    soap_for() / codes_for() po wizycie.
+
+    Jeden przebieg naraz; kolejny najwcześniej po DRAFT_EVERY_SEGMENTS
+    segmentach i MIN_NEW_CHARS nowego tekstu.
+    """
+
+    DRAFT_EVERY_SEGMENTS = 10     # Przebieg najwyżej co tyle segmentów
+    MIN_NEW_CHARS = 300           # ...i gdy przybyło co najmniej tyle tekstu
+    FINAL_DELTA_MIN_CHARS = 20    # Krótsza reszta nie wymaga przebiegu delta
+
+    def __init__(self):
+        self.draft = VisitDraft()
+        self._llm_service = None
+        self._config: Dict[str, Any] = {}
+        self._spec_ids: Optional[List[int]] = None
+        self._segments_since_pass = 0
+        self._task: Optional[asyncio.Task] = None
+        self._queued: Optional[str] = None   # Przebieg zlecony w trakcie innego
+        self._session = 0
+        # Transkrypt pokazany po wizycie (np. z mówcami) -> tekst zwalidowany
+        self._display: Optional[Tuple[str, str]] = None
+
+    # === SESJA ===
+
+    def start_session(self, llm_service, config, spec_ids: Optional[List[int]] = None) -> None:
+        """Nowa wizyta - porzuca poprzedni szkic."""
+        self.cancel()
+        self._session += 1
+        self.draft = VisitDraft()
+        self._queued = None
+        self._display = None
+        self._llm_service = llm_service
+        self._config = config if config is not None else {}
+        self._spec_ids = spec_ids
+        self._segments_since_pass = 0
+
+    def set_spec_ids(self, spec_ids: Optional[List[int]]) -> None:
+        self._spec_ids = spec_ids
+
+    def cancel(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    # === AKTUALIZACJE W TLE ===
+
+    def on_text_validated(self, transcript: str, segments: int = 1) -> None:
+        """
+        Wołane po walidacji segmentów (w pętli zdarzeń). Uruchamia przebieg
+        w tle, gdy uzbierało się dość nowego tekstu.
+        """
+        self._segments_since_pass += segments
+        if not self._llm_service or self.is_running:
+            return
+        if self._segments_since_pass < self.DRAFT_EVERY_SEGMENTS:
+            return
+        if len(self._delta(self.draft.soap_source, transcript)) < self.MIN_NEW_CHARS:
+            return
+        self.schedule_pass(transcript)
+
+    def schedule_pass(self, transcript: str) -> Optional[asyncio.Task]:
+        """Uruchamia przebieg (np. po zakończeniu wywiadu); w trakcie innego - po nim."""
+        if not self._llm_service or not transcript.strip():
+            return self._task
+        if self.is_running:
+            self._queued = transcript
+            return self._task
+        self._segments_since_pass = 0
+        try:
+            self._task = asyncio.create_task(self._run_pass(transcript, self._session))
+        except RuntimeError:
+            log("[DRAFT] Cannot schedule draft pass - no event loop")
+            self._task = None
+        return self._task
+
+    async def wait_idle(self, timeout: Optional[float] = None) -> None:
+        """Czeka na trwające (i zakolejkowane) przebiegi - bez anulowania ich."""
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while self.is_running:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                return
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), remaining)
+            except asyncio.TimeoutError:
+                return
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def adopt_soap(self, transcript: str, soap_task: asyncio.Task) -> None:
+        """
+        Przejmuje SOAP liczony równolegle z opisem (generate_visit_documentation
+        na ekranie głównym) - dialog zapisu odczyta go przez soap_for().
+        """
+        self.cancel()
+        self._queued = None
+        self._task = asyncio.create_task(self._adopt_soap(transcript, soap_task, self._session))
+
+    async def _adopt_soap(self, transcript: str, soap_task: asyncio.Task, session: int) -> None:
+        try:
+            soap, soap_model = await soap_task
+        except asyncio.CancelledError:
+            soap_task.cancel()
+            raise
+        except Exception:
+            return  # Zalogowane przez LLMService
+        if session == self._session and isinstance(soap, dict) and soap:
+            self.draft.soap = soap
+            self.draft.soap_source = transcript
+            self.draft.soap_model = soap_model
+            self.draft.updated_at = datetime.now()
+
+    async def _run_pass(self, transcript: str, session: int) -> None:
+        draft = self.draft
+        new_text = self._delta(draft.soap_source, transcript)
+        started = datetime.now()
+        try:
+            if new_text.strip():
+                # SOAP (delta) i kody ICD (cały transkrypt) równolegle
+                documentation = self._llm_service.generate_visit_documentation(
+                    transcript,
+                    self._config,
+                    spec_ids=self._spec_ids,
+                    include_soap=True,
+                    soap_transcript=new_text,
+                    previous_soap=draft.soap or None,
+                )
+                results = await documentation.gather()
+            elif transcript != draft.codes_source:
+                results = {"description": await self._llm_service.generate_description(
+                    transcript,
+                    {},
+                    self._config,
+                    spec_ids=self._spec_ids
+                )}
+            else:
+                results = {}
+
+            if session == self._session and "soap" in results:
+                soap, soap_model = results["soap"]
+                if isinstance(soap, dict) and soap:
+                    draft.soap = soap
+                    draft.soap_source = transcript
+                    draft.soap_model = soap_model
+
+            if session == self._session and "description" in results:
+                codes, codes_model = results["description"]
+                if isinstance(codes, dict) and (codes.get("diagnozy") or codes.get("procedury")):
+                    draft.codes = codes
+                    draft.codes_source = transcript
+                    draft.codes_model = codes_model
+
+            if session == self._session:
+                draft.passes += 1
+                draft.updated_at = datetime.now()
+                elapsed = (draft.updated_at - started).total_seconds()
+                log(f"[DRAFT] Pass {draft.passes} done in {elapsed:.1f}s ({len(new_text)} new chars)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log(f"[DRAFT] Draft pass error: {e}")
+
+        queued, self._queued = self._queued, None
+        if queued and session == self._session:
+            self._task = asyncio.create_task(self._run_pass(queued, session))
+
+    # === ODCZYT PO WIZYCIE ===
+
+    def set_display_transcript(self, display: str, plain: str) -> None:
+        """
+        Zapamiętuje, że po wizycie pokazano inny tekst niż zwalidowany (np.
+        "Lekarz: ...\nPacjent: ..." z diaryzacji) - soap_for() / codes_for()
+        dopasują go do szkicu przez tekst zwalidowany.
+        """
+        if self._normalize(display) == self._normalize(plain):
+            self._display = None
+        else:
+            self._display = (self._normalize(display), plain)
+
+    def _source_text(self, transcript: str) -> str:
+        """Tekst zwalidowany dla transkryptu z dialogu (bez zmian, jeśli nieznany)."""
+        if self._display and self._normalize(transcript) == self._display[0]:
+            return self._display[1]
+        return transcript
+
+    def soap_for(self, transcript: str) -> Tuple[Dict[str, Any], str, str]:
+        """
+        Szkic SOAP dla transkryptu z dialogu zapisu.
+
+        Returns:
+            (szkic SOAP, model, tekst nieobjęty szkicem) - pusty szkic gdy brak
+            albo gdy transkrypt nie pochodzi z tej wizyty
+        """
+        draft = self.draft
+        if not draft.has_soap:
+            return {}, "", transcript
+        source_text = self._source_text(transcript)
+        if not self._covers(draft.soap_source, source_text):
+            log("[DRAFT] SOAP draft dropped - transcript is not a continuation of the drafted text")
+            return {}, "", transcript
+        return dict(draft.soap), draft.soap_model, self._remainder(draft.soap_source, source_text)
+
+    def codes_for(self, transcript: str) -> Optional[Tuple[Dict[str, Any], str]]:
+        """Kody ICD ze szkicu, jeśli objęły cały transkrypt (poza sekcją Q+A)."""
+        draft = self.draft
+        if not draft.codes:
+            return None
+        source_text = self._source_text(transcript)
+        if not self._covers(draft.codes_source, source_text):
+            log("[DRAFT] Coding draft dropped - transcript is not a continuation of the drafted text")
+            return None
+        if self._remainder(draft.codes_source, source_text):
+            log("[DRAFT] Coding draft dropped - transcript has new text after the last pass")
+            return None
+        return draft.codes, draft.codes_model
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return re.sub(r"\s+", " ", text or "").strip()
+
+    def _covers(self, source: str, transcript: str) -> bool:
+        """Czy transkrypt zaczyna się tekstem, na którym liczono szkic."""
+        source = self._normalize(source)
+        return bool(source) and self._normalize(transcript).startswith(source)
+
+    def _remainder(self, source: str, transcript: str) -> str:
+        """Nowy tekst po szkicu, pomijając sekcję Q+A i drobne końcówki."""
+        remainder = self._delta(source, transcript)
+        if QA_SECTION_HEADER in remainder:
+            remainder = remainder.split(QA_SECTION_HEADER, 1)[0]
+        if len(remainder.strip()) < self.FINAL_DELTA_MIN_CHARS:
+            return ""
+        return remainder.strip()
+
+    def _delta(self, source: str, transcript: str) -> str:
+        """Tekst dopisany po source (cały transkrypt, jeśli nie jest kontynuacją)."""
+        if not self._covers(source, transcript):
+            return transcript
+        return self._normalize(transcript)[len(self._normalize(source)):].strip()
+
+
+# Szkice czekające na odebranie przez kolejną stronę (Live -> ekran główny)
+MAX_HANDOFFS = 8
+_handoffs: "OrderedDict[str, VisitDraftService]" = OrderedDict()
+
+
+def hand_off_visit_drafts(drafts: VisitDraftService) -> str:
+    """Zostawia szkice wizyty do odebrania przez claim_visit_drafts(); zwraca klucz."""
+    key = uuid.uuid4().hex
+    _handoffs[key] = drafts
+    while len(_handoffs) > MAX_HANDOFFS:
+        _, dropped = _handoffs.popitem(last=False)
+        dropped.cancel()
+    return key
+
+
+def claim_visit_drafts(key: Optional[str]) -> Optional[VisitDraftService]:
+    """Odbiera szkice przekazane przez hand_off_visit_drafts() (jednorazowo)."""
+    if not key:
+        return None
+    return _handoffs.pop(key, None)
@@ -4,12 +4,14 @@ Serwis wizyt - logika biznesowa.
 Łączy repozytoria z logiką aplikacji.
 """
 
+import asyncio
 from typing import Optional, List, Tuple, Dict, Any
 from datetime import datetime, date
 from pathlib import Path
 
 from core.models import Visit, Patient, VisitStatus, VisitDiagnosis, VisitProcedure
 from core.repositories import VisitRepository, PatientRepository
+from .visit_write_queue import VisitWriteQueue, get_visit_write_queue
 
 
 class VisitService:
@@ -20,9 +22,10 @@ class VisitService:
     z logiką biznesową.
     """
 
-    def __init__(self):
+    def __init__(self, write_queue: Optional[VisitWriteQueue] = None):
         self.visit_repo = VisitRepository()
         self.patient_repo = PatientRepository()
+        self.write_queue = write_queue or get_visit_write_queue()
 
     def create_visit_from_llm_result(
         self,
@@ -219,6 +222,50 @@ class VisitService:
 
         return self.visit_repo.save(visit)
 
+    # === Operacje async (dla handlerów UI) ===
+
+    async def save_visit_async(self, **kwargs) -> Visit:
+        """
+        Zapisuje wizytę w wątku zapisującym (nie blokuje event loop).
+
+        Przyjmuje te same argumenty co save_visit(). Kolejne zapisy tej samej
+        wizyty (visit_id), które czekają jeszcze w kolejce, są scalane.
+        """
+        return await self.write_queue.run(
+            self.save_visit,
+            key=kwargs.get("visit_id"),
+            **kwargs
+        )
+
+    async def delete_visit_async(self, visit_id: str) -> bool:
+        """Usuwa wizytę w wątku zapisującym."""
+        return await self.write_queue.run(self.delete_visit, visit_id)
+
+    async def get_visit_async(self, visit_id: str) -> Optional[Visit]:
+        """Pobiera wizytę po ID (w wątku roboczym)."""
+        return await asyncio.to_thread(self.get_visit, visit_id)
+
+    async def get_visits_async(self, **kwargs) -> Tuple[List[Visit], int, int]:
+        """Wersja async get_visits()."""
+        return await asyncio.to_thread(lambda: self.get_visits(**kwargs))
+
+    async def get_statistics_async(self) -> Dict[str, Any]:
+        """Wersja async get_statistics()."""
+        return await asyncio.to_thread(self.get_statistics)
+
+    async def get_recent_patients_async(self, limit: int = 10) -> List[Patient]:
+        """Wersja async get_recent_patients()."""
+        return await asyncio.to_thread(self.get_recent_patients, limit)
+
+    async def get_patient_async(self, patient_id: int) -> Optional[Patient]:
+        """Pobiera pacjenta po ID (w wątku roboczym)."""
+        return await asyncio.to_thread(self.patient_repo.get_by_id, patient_id)
+
+    @property
+    def write_queue_depth(self) -> int:
+        """Liczba oczekujących zapisów."""
+        return self.write_queue.depth
+
     def get_visit(self, visit_id: str) -> Optional[Visit]:
         """Pobiera wizytę po ID."""
         return self.visit_repo.get_by_id(visit_id)
@@ -0,0 +1,184 @@
+"""
+Kolejka zapisów wizyt.
+
+Jeden wątek zapisujący obsługuje wszystkie operacje na SQLite, dzięki czemu
+handlery UI (event loop NiceGUI) nigdy nie czekają na dysk. Kolejne zapisy
+tego samego szkicu wizyty, które nie zdążyły się jeszcze wykonać, są scalane
+w jeden - wykonywany jest tylko najnowszy.
+"""
+
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Callable, Any, Dict, Hashable
+
+from core.log_utils import log
+
+
+class _WriteJob:
+    """Pojedyncze zadanie zapisu (może być nadpisane przed wykonaniem)."""
+
+    __slots__ = ("func", "args", "kwargs", "future", "coalesced")
+
+    def __init__(self, func: Callable, args: tuple, kwargs: dict):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future: Future = Future()
+        self.coalesced = 0
+
+
+class VisitWriteQueue:
+    """
+    Kolejka zapisów z jednym wątkiem roboczym.
+
+    - submit() zwraca concurrent.futures.Future (do użycia z wątków)
+    - run() to wersja async dla handlerów UI
+    - zadania z tym samym kluczem (np. ID szkicu wizyty) są scalane,
+      jeśli poprzednie jeszcze czeka w kolejce
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[Hashable, _WriteJob]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._seq = 0
+        self._busy = False
+
+        # Statystyki
+        self.completed_count = 0
+        self.coalesced_count = 0
+        self.failed_count = 0
+
+    def _ensure_thread(self) -> None:
+        """Uruchamia wątek zapisujący przy pierwszym użyciu."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(
+            target=self._worker,
+            name="VisitWriteQueue",
+            daemon=True
+        )
+        self._thread.start()
+
+    def submit(
+        self,
+        func: Callable,
+        *args,
+        key: Optional[Hashable] = None,
+        **kwargs
+    ) -> Future:
+        """
+        Dodaje zadanie do kolejki.
+
+        Args:
+            func: Funkcja wykonywana w wątku zapisującym
+            key: Klucz scalania (None = bez scalania)
+
+        Returns:
+            Future z wynikiem funkcji
+        """
+        with self._cond:
+            self._ensure_thread()
+
+            if key is not None:
+                job_key = ("key", key)
+                pending = self._jobs.get(job_key)
+                if pending is not None and pending.future.cancelled():
+                    # Anulowany (np. wołający porzucił await) - nowy zapis nie
+                    # może dostać jego Future, bo dostałby CancelledError
+                    del self._jobs[job_key]
+                    pending = None
+                if pending is not None:
+                    # Nadpisz argumenty - wykona się tylko najnowszy zapis,
+                    # wszyscy oczekujący dostaną jego wynik
+                    pending.func = func
+                    pending.args = args
+                    pending.kwargs = kwargs
+                    pending.coalesced += 1
+                    self.coalesced_count += 1
+                    return pending.future
+            else:
+                self._seq += 1
+                job_key = ("seq", self._seq)
+
+            job = _WriteJob(func, args, kwargs)
+            self._jobs[job_key] = job
+            self._cond.notify()
+            return job.future
+
+    async def run(
+        self,
+        func: Callable,
+        *args,
+        key: Optional[Hashable] = None,
+        **kwargs
+    ) -> Any:
+        """Wersja async submit() - czeka na wynik bez blokowania event loop."""
+        future = self.submit(func, *args, key=key, **kwargs)
+        return await asyncio.wrap_future(future)
+
+    @property
+    def depth(self) -> int:
+        """Liczba zadań oczekujących (+1 jeśli trwa zapis)."""
+        with self._cond:
+            return len(self._jobs) + (1 if self._busy else 0)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Zwraca statystyki kolejki."""
+        return {
+            "depth": self.depth,
+            "completed": self.completed_count,
+            "coalesced": self.coalesced_count,
+            "failed": self.failed_count,
+        }
+
+    def _worker(self) -> None:
+        """Pętla wątku zapisującego."""
+        while True:
+            with self._cond:
+                while self._running and not self._jobs:
+                    self._cond.wait()
+                if not self._jobs:
+                    break
+                _, job = self._jobs.popitem(last=False)
+                self._busy = True
+
+            if job.future.set_running_or_notify_cancel():
+                try:
+                    result = job.func(*job.args, **job.kwargs)
+                except Exception as e:
+                    self.failed_count += 1
+                    log(f"[VISIT-QUEUE] Write error: {e}")
+                    job.future.set_exception(e)
+                else:
+                    self.completed_count += 1
+                    job.future.set_result(result)
+
+            with self._cond:
+                self._busy = False
+
+    def stop(self, wait: bool = True, timeout: float = 5.0) -> None:
+        """Zatrzymuje wątek po opróżnieniu kolejki."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if wait and self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+
+# Singleton instance
+_write_queue: Optional[VisitWriteQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_visit_write_queue() -> VisitWriteQueue:
+    """Zwraca singleton VisitWriteQueue."""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = VisitWriteQueue()
+        return _write_queue
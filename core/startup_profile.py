@@ -0,0 +1,172 @@
+"""
+Profil startu aplikacji (--profile-startup albo WYWIAD_PROFILE_STARTUP=1).
+
+Mierzy czasy importów i etapów inicjalizacji od startu skryptu do pierwszego
+połączenia klienta (strona główna wyrenderowana w przeglądarce). Raport trafia
+do logu i do logs/startup_profile.json.
+
+Wyłączony profil nic nie mierzy: phase() zwraca pusty kontekst, mark() wraca
+od razu, a hook importów nie jest instalowany.
+"""
+
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List
+
+from core.log_utils import LOG_DIR, log
+
+
+ENABLED = "--profile-startup" in sys.argv or os.environ.get("WYWIAD_PROFILE_STARTUP") == "1"
+REPORT_FILE = LOG_DIR / "startup_profile.json"
+REPORT_TOP_IMPORTS = 25
+REPORT_MIN_IMPORT_MS = 5.0
+
+_T0 = time.perf_counter()
+_lock = threading.Lock()
+_local = threading.local()
+_imports: List[Dict[str, Any]] = []
+_phases: List[Dict[str, Any]] = []
+_marks: List[Dict[str, Any]] = []
+_original_import = None
+_reported = False
+
+
+def _since_start() -> float:
+    return time.perf_counter() - _T0
+
+
+# === IMPORTY ===
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    loaded_before = len(sys.modules)
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _local.depth = depth
+        # Zapisujemy tylko importy, które faktycznie załadowały nowe moduły
+        if len(sys.modules) > loaded_before:
+            elapsed = time.perf_counter() - started
+            importer = (globals or {}).get("__name__", "?")
+            label = ("." * level) + name
+            if fromlist and name in sys.modules and level == 0:
+                label = f"{name} ({', '.join(fromlist)})"
+            with _lock:
+                _imports.append({
+                    "module": label,
+                    "importer": importer,
+                    "depth": depth,
+                    "start_s": round(started - _T0, 4),
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "thread": threading.current_thread().name,
+                })
+
+
+def install_import_hook() -> None:
+    """Włącza pomiar importów (tylko przy włączonym profilu)."""
+    global _original_import
+    if not ENABLED or _original_import is not None:
+        return
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+
+
+def _remove_import_hook() -> None:
+    global _original_import
+    if _original_import is not None and builtins.__import__ is _timed_import:
+        builtins.__import__ = _original_import
+    _original_import = None
+
+
+# === ETAPY ===
+
+@contextmanager
+def _timed_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phases.append({
+                "phase": name,
+                "start_s": round(started - _T0, 4),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "thread": threading.current_thread().name,
+            })
+
+
+def phase(name: str):
+    """Kontekst mierzący etap inicjalizacji (np. with phase("migrations"): ...)."""
+    if not ENABLED:
+        return nullcontext()
+    return _timed_phase(name)
+
+
+def mark(name: str) -> None:
+    """Punkt w czasie od startu (np. "ui.run", "first client connected")."""
+    if not ENABLED or _reported:
+        return
+    with _lock:
+        _marks.append({"mark": name, "at_s": round(_since_start(), 4)})
+
+
+# === RAPORT ===
+
+def report() -> None:
+    """Loguje zestawienie i zapisuje je do logs/startup_profile.json (raz)."""
+    global _reported
+    if not ENABLED or _reported:
+        return
+    _reported = True
+    _remove_import_hook()
+
+    with _lock:
+        imports = list(_imports)
+        phases = list(_phases)
+        marks = list(_marks)
+    total = _since_start()
+
+    # Importy najwyższego poziomu w danym wątku - czasy skumulowane (z zależnościami)
+    top_level = sorted(
+        (i for i in imports if i["depth"] == 0 and i["duration_ms"] >= REPORT_MIN_IMPORT_MS),
+        key=lambda i: i["duration_ms"],
+        reverse=True,
+    )
+    import_total_ms = sum(i["duration_ms"] for i in imports if i["depth"] == 0 and i["thread"] == "MainThread")
+
+    log(f"[STARTUP] Profile: {total:.2f}s since start, main-thread imports {import_total_ms / 1000:.2f}s")
+    log("[STARTUP] Imports (cumulative, top-level):")
+    for item in top_level[:REPORT_TOP_IMPORTS]:
+        log(
+            f"[STARTUP]   {item['duration_ms']:8.1f} ms  {item['module']}"
+            f"  <- {item['importer']} [{item['thread']}]"
+        )
+    log("[STARTUP] Init phases:")
+    for item in sorted(phases, key=lambda p: p["start_s"]):
+        log(
+            f"[STARTUP]   +{item['start_s']:.2f}s {item['duration_ms']:8.1f} ms  {item['phase']}"
+            f" [{item['thread']}]"
+        )
+    for item in marks:
+        log(f"[STARTUP]   +{item['at_s']:.2f}s  * {item['mark']}")
+
+    try:
+        LOG_DIR.mkdir(parents=True, exist_ok=True)
+        REPORT_FILE.write_text(
+            json.dumps(
+                {"total_s": round(total, 4), "imports": imports, "phases": phases, "marks": marks},
+                ensure_ascii=False,
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+        log(f"[STARTUP] Profile saved: {REPORT_FILE}")
+    except Exception as e:
+        log(f"[STARTUP] Could not save profile: {e}")
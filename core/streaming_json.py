@@ -0,0 +1,149 @@
+"""
+Streaming JSON Parser - przyrostowe parsowanie odpowiedzi LLM.
+
+Odpowiedź modelu przychodzi kawałkami (tokeny); parser śledzi strukturę
+JSON znak po znaku i oddaje każdy element tablicy (obiekt lub string),
+gdy tylko się zamknie - np. kolejne karty z {"cards": [{...}, {...}]}.
+
+Tolerancyjny: pomija tekst przed JSON-em (```json, komentarze modelu),
+ignoruje to co po nim, a partial() zwraca najlepsze możliwe domknięcie
+niekompletnego dokumentu.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+
+class StreamingJSONParser:
+    """
+    Użycie:
+        parser = StreamingJSONParser()
+        for chunk in stream:
+            for key, value in parser.feed(chunk):
+                ...  # key = nazwa pola tablicy ("cards"), None dla tablicy głównej
+        data = parser.result()
+    """
+
+    _CLOSERS = {"{": "}", "[": "]"}
+
+    def __init__(self):
+        self._text: List[str] = []       # Znaki od początku JSON-a
+        self._pos = 0                    # Długość przetworzonego tekstu
+        self._started = False
+        self._finished = False
+        # Stos kontenerów: (znak otwarcia, pozycja, klucz w rodzicu)
+        self._stack: List[Tuple[str, int, Optional[str]]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        # Ostatnie miejsce, w którym dokument da się poprawnie domknąć
+        self._safe_pos = 0
+        self._safe_closers = ""
+
+    @property
+    def finished(self) -> bool:
+        """Czy główny obiekt/tablica JSON już się zamknęły."""
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Tuple[Optional[str], Any]]:
+        """
+        Dokłada fragment odpowiedzi.
+
+        Returns:
+            Lista nowo zamkniętych elementów tablic: (klucz tablicy, wartość)
+        """
+        completed: List[Tuple[Optional[str], Any]] = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if ch not in "{[":
+                    continue
+                self._started = True
+
+            self._text.append(ch)
+            pos = self._pos
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(completed)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch in "{[":
+                key = self._last_key if self._stack and self._stack[-1][0] == "{" else None
+                self._stack.append((ch, pos, key))
+                self._last_key = None
+                self._mark_safe(self._pos)
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                opener, start, key = self._stack.pop()
+                if not self._stack:
+                    self._finished = True
+                elif self._stack[-1][0] == "[":
+                    self._emit(start, pos + 1, completed)
+                self._last_key = None
+                self._mark_safe(self._pos)
+            elif ch == ",":
+                self._mark_safe(pos)
+        return completed
+
+    def partial(self) -> Any:
+        """Najlepsze domknięcie dotychczasowego tekstu (None jeśli brak)."""
+        if not self._started:
+            return None
+        text = "".join(self._text)
+        if self._finished:
+            return self._loads(text)
+
+        full = text + ('"' if self._in_string else "") + self._closers()
+        data = self._loads(full)
+        if data is not None:
+            return data
+        return self._loads(text[:self._safe_pos] + self._safe_closers)
+
+    def result(self) -> Any:
+        """Sparsowany dokument (lub jego najlepsze domknięcie przy urwanym strumieniu)."""
+        return self.partial()
+
+    def _close_string(self, completed: List[Tuple[Optional[str], Any]]) -> None:
+        if not self._stack:
+            return
+        parent = self._stack[-1][0]
+        if parent == "[":
+            self._emit(self._string_start, self._pos, completed)
+            self._mark_safe(self._pos)
+        elif parent == "{":
+            # String w obiekcie: klucz albo wartość - klucz przyda się,
+            # jeśli zaraz po nim otworzy się kontener
+            raw = "".join(self._text[self._string_start:self._pos])
+            self._last_key = self._loads(raw)
+
+    def _emit(self, start: int, end: int, completed: List[Tuple[Optional[str], Any]]) -> None:
+        value = self._loads("".join(self._text[start:end]))
+        if value is not None:
+            completed.append((self._stack[-1][2], value))
+
+    def _mark_safe(self, pos: int) -> None:
+        self._safe_pos = pos
+        self._safe_closers = self._closers()
+
+    def _closers(self) -> str:
+        return "".join(self._CLOSERS[opener] for opener, _, _ in reversed(self._stack))
+
+    @staticmethod
+    def _loads(text: str) -> Any:
+        try:
+            return json.loads(text)
+        except (json.JSONDecodeError, ValueError):
+            return None
@@ -4,7 +4,9 @@ import time
 from pathlib import Path
 import numpy as np
 import sounddevice as sd
+from core import latency_trace
 from core.hallucination_filter import is_hallucination
+from core.diarization.word_store import WordTimestampStore
 try:
     from faster_whisper import WhisperModel
     _FASTER_WHISPER_IMPORT_ERROR = None
@@ -121,6 +123,10 @@ class StreamingTranscriber:
         self.finalized_samples = 0
         self.last_improved_samples = 0
 
+        # Timestampy słów z warstwy finalnej (do przypisania mówców)
+        self.collect_word_timestamps = True
+        self.word_store = WordTimestampStore(sample_rate=self.sample_rate)
+
         # Timing
         self.last_improved_time = 0
         self.improved_interval = improved_interval
@@ -257,6 +263,7 @@ class StreamingTranscriber:
         self.full_audio_samples = 0
         self.finalized_samples = 0
         self.last_improved_samples = 0
+        self.word_store = WordTimestampStore(sample_rate=self.sample_rate)
         self.last_improved_time = time.time()
         self._cancel_silence_timer()
         self.last_voice_time = time.time()
@@ -299,11 +306,42 @@ class StreamingTranscriber:
             return np.array([], dtype=np.float32)
         return np.concatenate(self.full_audio_buffer, axis=0).flatten()
 
+    def get_audio_slice(self, start_sample: int, end_sample: int | None = None):
+        """
+        Zwraca fragment bufora audio [start_sample, end_sample).
+
+        Skleja tylko bloki z końca bufora, które obejmują fragment - bez
+        kopiowania całego nagrania jak get_full_audio().
+        """
+        buffer = list(self.full_audio_buffer)
+        # Długość liczona z migawki - licznik próbek jest aktualizowany po append
+        pos = sum(len(c) for c in buffer)
+        if end_sample is None or end_sample > pos:
+            end_sample = pos
+        if end_sample <= start_sample or not buffer:
+            return np.array([], dtype=np.float32)
+
+        parts = []
+        for chunk in reversed(buffer):
+            chunk_start = pos - len(chunk)
+            if chunk_start < end_sample:
+                parts.append(chunk[max(0, start_sample - chunk_start):end_sample - chunk_start])
+            pos = chunk_start
+            if pos <= start_sample:
+                break
+        parts.reverse()
+        return np.concatenate(parts, axis=0).flatten() if parts else np.array([], dtype=np.float32)
+
     def _audio_callback(self, indata, frames, time_info, status):
-        """Callback od sounddevice - wrzuca audio do kolejki."""
+        """Callback od sounddevice - wrzuca audio do kolejki (z czasem przechwycenia)."""
+        captured_ns = latency_trace.now()
         if status:
             print(f"[STREAM] Audio status: {status}", flush=True)
-        self.audio_queue.put(indata.copy())
+        self.audio_queue.put((indata.copy(), captured_ns))
+        if latency_trace.ENABLED:
+            # Blok audio to ~250 ms nagrania czekającego w sterowniku na callback
+            block_ns = int(frames * 1e9 / self.sample_rate)
+            latency_trace.complete("capture", captured_ns - block_ns, captured_ns, frames=frames)
 
     def _process_audio(self):
         """Główna pętla real-time (warstwa 1 - provisional)."""
@@ -313,7 +351,8 @@ class StreamingTranscriber:
 
         while self.is_running:
             try:
-                chunk = self.audio_queue.get(timeout=0.5)
+                chunk, captured_ns = self.audio_queue.get(timeout=0.5)
+                latency_trace.complete("queue_wait", captured_ns, samples=self.full_audio_samples)
 
                 chunk_rms = float(np.sqrt(np.mean(chunk**2))) if len(chunk) else 0.0
                 if chunk_rms >= self.voice_rms_threshold:
@@ -332,7 +371,7 @@ class StreamingTranscriber:
                 # Jeśli mamy 2s, transkrybuj (provisional)
                 if chunk_samples >= min_samples:
                     start_sample = self.full_audio_samples - chunk_samples
-                    self._transcribe_provisional(chunk_buffer, start_sample)
+                    self._transcribe_provisional(chunk_buffer, start_sample, captured_ns)
                     chunk_buffer = []
                     chunk_samples = 0
 
@@ -341,8 +380,13 @@ class StreamingTranscriber:
             except Exception as e:
                 print(f"[STREAM] Worker error: {e}", flush=True)
 
-    def _transcribe_provisional(self, buffer_list, start_sample):
-        """Warstwa 1: Real-time transkrypcja małych chunków."""
+    def _transcribe_provisional(self, buffer_list, start_sample, captured_ns: int = 0):
+        """
+        Warstwa 1: Real-time transkrypcja małych chunków.
+
+        captured_ns: czas przechwycenia ostatniego bloku (latency_trace.now())
+        - do pomiaru audio -> tekst.
+        """
         audio_data = np.concatenate(buffer_list, axis=0).flatten()
         end_sample = start_sample + len(audio_data)
 
@@ -362,25 +406,35 @@ class StreamingTranscriber:
             self._cancel_silence_timer()
 
         try:
-            segments, info = self.model_tiny.transcribe(
-                audio_data,
-                beam_size=1,
-                language="pl",
-                vad_filter=True
-            )
+            with latency_trace.span("decode.provisional", start=start_sample, end=end_sample):
+                segments, info = self.model_tiny.transcribe(
+                    audio_data,
+                    beam_size=1,
+                    language="pl",
+                    vad_filter=True
+                )
 
-            text = " ".join([s.text for s in segments]).strip()
+                text = " ".join([s.text for s in segments]).strip()
 
             # Filtruj halucynacje przed callbackiem
-            if text and is_hallucination(text):
+            if text and self._is_hallucination(text, "provisional"):
                 return
 
             if text and self.callback_provisional:
                 self.callback_provisional(text, start_sample, end_sample)
+                latency_trace.complete("audio_to_text", captured_ns, layer="provisional", start=start_sample)
 
         except Exception as e:
             print(f"[STREAM] Provisional error: {e}", flush=True)
     
+    def _is_hallucination(self, text: str, layer: str) -> bool:
+        """Filtr halucynacji z pomiarem czasu (etap hallucination_filter)."""
+        with latency_trace.span("hallucination_filter", layer=layer):
+            blocked = is_hallucination(text)
+        if blocked:
+            latency_trace.instant("hallucination_blocked", layer=layer)
+        return blocked
+
     def _start_silence_timer(self, delay: float | None = None):
         """Uruchamia async timer dla ciszy (bulletproof - odpala się niezależnie)."""
         with self._silence_lock:
@@ -489,17 +543,18 @@ class StreamingTranscriber:
             # Użyj medium model jeśli dostępny, inaczej tiny
             model = self.model_medium if self.model_medium else self.model_tiny
 
-            segments, info = model.transcribe(
-                segment_audio,
-                beam_size=3,  # Lepszy beam dla jakości
-                language="pl",
-                vad_filter=True
-            )
+            with latency_trace.span("decode.improved", start=start_sample, end=self.full_audio_samples):
+                segments, info = model.transcribe(
+                    segment_audio,
+                    beam_size=3,  # Lepszy beam dla jakości
+                    language="pl",
+                    vad_filter=True
+                )
 
-            text = " ".join([s.text for s in segments]).strip()
+                text = " ".join([s.text for s in segments]).strip()
 
             # Filtruj halucynacje przed callbackiem
-            if text and is_hallucination(text):
+            if text and self._is_hallucination(text, "improved"):
                 return
 
             try:
@@ -553,23 +608,40 @@ class StreamingTranscriber:
             backend_name = f"OpenVINO {model_name}" if self.use_openvino else f"Faster-Whisper {model_name}"
             print(f"[STREAM] Final ({backend_name}): {duration:.1f}s audio", flush=True)
 
-            segments, info = model.transcribe(
-                segment_audio,
-                beam_size=beam,
-                language="pl",
-                vad_filter=True,
-                word_timestamps=False
-            )
-            text = " ".join([s.text for s in segments]).strip()
+            with latency_trace.span(
+                "decode.final",
+                model=model_name,
+                start=self.finalized_samples,
+                end=self.finalized_samples + len(segment_audio)
+            ):
+                segments, info = model.transcribe(
+                    segment_audio,
+                    beam_size=beam,
+                    language="pl",
+                    vad_filter=True,
+                    word_timestamps=self.collect_word_timestamps
+                )
+                segments = list(segments)
+                text = " ".join([s.text for s in segments]).strip()
 
             if text:
                 # Filtruj halucynacje przed callbackiem
-                if is_hallucination(text):
+                if self._is_hallucination(text, "final"):
                     print(f"[STREAM] Final BLOCKED hallucination: '{text[:40]}...'", flush=True)
                     # Oznacz jako sfinalizowane żeby nie retryować
                     self.finalized_samples = self.full_audio_samples
                     return
 
+                # Słowa z czasami (OpenVINO nie zwraca słów - wtedy pusto)
+                self.word_store.append_words(
+                    (
+                        (w.word, w.start, w.end)
+                        for s in segments
+                        for w in (getattr(s, "words", None) or [])
+                    ),
+                    offset_samples=self.finalized_samples
+                )
+
                 try:
                     if self.callback_final:
                         self.callback_final(text, self.finalized_samples, self.full_audio_samples)
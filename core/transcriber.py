@@ -3,6 +3,7 @@ Moduł transkrypcji audio z obsługą wielu backendów.
 Wspiera: Gemini Cloud, faster-whisper, openai-whisper
 """
 
+import importlib.util
 import os
 
 # Wyłącz telemetrię OpenVINO (może powodować konflikty z huggingface_hub)
@@ -11,12 +12,13 @@ import shutil
 import subprocess
 import sys
 import threading
+import time
 import zipfile
 import urllib.request
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Callable, Optional, Tuple, List, Dict
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from enum import Enum
 
 # Ścieżka do modeli i narzędzi
@@ -277,13 +279,16 @@ class GeminiCloudTranscriber(TranscriberBackend):
         return response.text.strip()
 
     def is_available(self) -> Tuple[bool, Optional[str]]:
+        # Bez importu SDK (~0.5 s) - ładowane dopiero przy pierwszej transkrypcji
         try:
-            from google import genai
-            if not self.api_key:
-                return False, "Brak API key"
-            return True, None
-        except ImportError:
+            installed = importlib.util.find_spec("google.genai") is not None
+        except (ImportError, ValueError):
+            installed = False
+        if not installed:
             return False, "Brak biblioteki google-genai"
+        if not self.api_key:
+            return False, "Brak API key"
+        return True, None
 
     def get_models(self) -> List[ModelInfo]:
         return [ModelInfo("gemini-2.0-flash", 0, "Cloud API - nie wymaga pobierania", True)]
@@ -932,13 +937,85 @@ class TranscriberManager:
         self._backends[TranscriberType.OPENAI_WHISPER] = OpenAIWhisperTranscriber()
         self._backends[TranscriberType.OPENVINO_WHISPER] = OpenVINOWhisperTranscriber()
 
+        # Snapshot dostępności (pakiety, ffmpeg) - sondowanie importuje ciężkie
+        # biblioteki, więc liczone raz (w tle przy starcie) i ponownie tylko po
+        # instalacji (refresh_availability). Odczyty nie dotykają dysku.
+        self._availability: Optional[Dict[TranscriberType, TranscriberInfo]] = None
+        self._backend_status: Dict[TranscriberType, Tuple[bool, Optional[str]]] = {}
+        self._ffmpeg_status: Tuple[bool, str] = (False, "ffmpeg nie sprawdzony")
+        self._probe_lock = threading.Lock()      # Jedno sondowanie naraz
+        self._snapshot_lock = threading.Lock()   # Krótka podmiana snapshotu
+        self._availability_ready = threading.Event()
+
+    # === DOSTĘPNOŚĆ BACKENDÓW (SNAPSHOT) ===
+
     def get_available_backends(self) -> List[TranscriberInfo]:
-        """Zwraca listę wszystkich backendów z informacją o dostępności."""
+        """Zwraca listę wszystkich backendów z informacją o dostępności (snapshot)."""
+        snapshot = self._availability
+        if snapshot is None:
+            # Przed pierwszym sondowaniem (albo w trakcie) - czekamy na wynik
+            with self._probe_lock:
+                if self._availability is None:
+                    self._probe_availability()
+            snapshot = self._availability
+        return list(snapshot.values())
+
+    def get_availability_snapshot(self) -> Optional[List[TranscriberInfo]]:
+        """Snapshot bez sondowania (do renderu UI) - None, jeśli jeszcze niepoliczony."""
+        snapshot = self._availability
+        return list(snapshot.values()) if snapshot is not None else None
+
+    def wait_for_availability(self, timeout: Optional[float] = None) -> bool:
+        """Czeka na pierwszy snapshot (wołać poza pętlą zdarzeń)."""
+        return self._availability_ready.wait(timeout)
+
+    def refresh_availability(self) -> List[TranscriberInfo]:
+        """Sonduje backendy od nowa - po instalacji/odinstalowaniu pakietów lub ffmpeg."""
+        with self._probe_lock:
+            self._probe_availability()
+        return list(self._availability.values())
+
+    def refresh_availability_async(self) -> threading.Thread:
+        """refresh_availability() w wątku w tle (start aplikacji)."""
+        thread = threading.Thread(target=self.refresh_availability, name="backend-availability", daemon=True)
+        thread.start()
+        return thread
+
+    def _probe_availability(self) -> None:
+        """Wolne sondowanie (importy pakietów, PATH, dysk). Wołane z _probe_lock."""
+        started = time.perf_counter()
+        importlib.invalidate_caches()
+        ffmpeg_ok = FFmpegManager.is_installed()  # Dodaje też lokalny ffmpeg do PATH
+        ffmpeg_status = FFmpegManager.get_install_status()
+        backend_status = {t: backend.is_available() for t, backend in self._backends.items()}
+        infos = self._build_backend_infos(backend_status, ffmpeg_ok)
+
+        with self._snapshot_lock:
+            # Gemini zależy od klucza API, który mógł się zmienić w trakcie sondowania
+            gemini_status = self._backends[TranscriberType.GEMINI_CLOUD].is_available()
+            backend_status[TranscriberType.GEMINI_CLOUD] = gemini_status
+            availability = {info.type: info for info in infos}
+            availability[TranscriberType.GEMINI_CLOUD] = replace(
+                availability[TranscriberType.GEMINI_CLOUD],
+                is_available=gemini_status[0],
+                unavailable_reason=gemini_status[1],
+            )
+            self._backend_status = backend_status
+            self._ffmpeg_status = ffmpeg_status
+            self._availability = availability
+        self._availability_ready.set()
+        print(f"[TRANSCRIBER] Backend availability probed in {time.perf_counter() - started:.2f}s", flush=True)
+
+    def _build_backend_infos(
+        self,
+        backend_status: Dict[TranscriberType, Tuple[bool, Optional[str]]],
+        ffmpeg_ok: bool
+    ) -> List[TranscriberInfo]:
+        """Buduje TranscriberInfo z wyników sondowania."""
         infos = []
-        ffmpeg_ok = FFmpegManager.is_installed()
 
         for t, backend in self._backends.items():
-            available, reason = backend.is_available()
+            available, reason = backend_status[t]
 
             if t == TranscriberType.GEMINI_CLOUD:
                 info = TranscriberInfo(
@@ -1094,10 +1171,11 @@ class TranscriberManager:
             returncode = process.wait(timeout=300)
 
             if returncode == 0:
+                # Odśwież cache importów i snapshot dostępności po instalacji
+                importlib.invalidate_caches()
+                self.refresh_availability()
                 if progress_callback:
                     progress_callback("Zainstalowano!")
-                # Odśwież cache importów po instalacji
-                importlib.invalidate_caches()
                 return True, f"Zainstalowano {info.pip_package}"
             else:
                 return False, f"Błąd instalacji (kod {returncode})"
@@ -1119,7 +1197,14 @@ class TranscriberManager:
     def set_current_backend(self, backend_type: TranscriberType) -> bool:
         """Ustawia aktualny backend."""
         if backend_type in self._backends:
-            available, _ = self._backends[backend_type].is_available()
+            if backend_type == TranscriberType.GEMINI_CLOUD:
+                available, _ = self._backends[backend_type].is_available()
+            elif self._availability is None:
+                # Snapshot jeszcze niepoliczony (start) - backend z konfiguracji;
+                # _load_model_async sprawdzi instalację po sondowaniu
+                available = True
+            else:
+                available, _ = self._backend_status.get(backend_type, (False, None))
             if available:
                 self._current_type = backend_type
                 return True
@@ -1138,15 +1223,38 @@ class TranscriberManager:
         gemini = self._backends[TranscriberType.GEMINI_CLOUD]
         if isinstance(gemini, GeminiCloudTranscriber):
             gemini.set_api_key(api_key)
+            self._update_gemini_availability()
+
+    def _update_gemini_availability(self) -> None:
+        """Dostępność Gemini zależy tylko od klucza - aktualizacja bez sondowania."""
+        with self._snapshot_lock:
+            if self._availability is None:
+                return
+            status = self._backends[TranscriberType.GEMINI_CLOUD].is_available()
+            availability = dict(self._availability)
+            availability[TranscriberType.GEMINI_CLOUD] = replace(
+                availability[TranscriberType.GEMINI_CLOUD],
+                is_available=status[0],
+                unavailable_reason=status[1],
+            )
+            self._backend_status = {**self._backend_status, TranscriberType.GEMINI_CLOUD: status}
+            self._availability = availability
 
     def install_ffmpeg(self, progress_callback: Optional[Callable[[str], None]] = None) -> Tuple[bool, str]:
         """Instaluje ffmpeg."""
-        return FFmpegManager.install(progress_callback)
+        success, message = FFmpegManager.install(progress_callback)
+        if success:
+            self.refresh_availability()
+        return success, message
 
     def is_ffmpeg_installed(self) -> bool:
-        """Sprawdza czy ffmpeg jest zainstalowany."""
-        return FFmpegManager.is_installed()
+        """Sprawdza czy ffmpeg jest zainstalowany (snapshot)."""
+        if self._availability is None:
+            self.get_available_backends()
+        return self._ffmpeg_status[0]
 
     def get_ffmpeg_status(self) -> Tuple[bool, str]:
-        """Zwraca status ffmpeg."""
-        return FFmpegManager.get_install_status()
+        """Zwraca status ffmpeg (snapshot)."""
+        if self._availability is None:
+            self.get_available_backends()
+        return self._ffmpeg_status
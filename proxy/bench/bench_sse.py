@@ -0,0 +1,168 @@
+"""Benchmark of SSE handling in the claude.ai proxy.
+
+Replays fixtures/claude_ai_stream.sse (a claude.ai-format stream: 1500
+text deltas of Polish text, "event:" lines and a ``message_limit`` event)
+and measures:
+
+- offline: SSETranslator vs the previous per-event decode + JSON round trip
+  (``legacy_translate`` below), in microseconds per token
+- end to end: anthropic client -> proxy -> replay server, TTFT and
+  microseconds per token
+
+Usage:
+    python -m proxy.bench.bench_sse [--runs 10] [--skip-e2e]
+    # compare with the proxy from another commit (needs ClaudeAIProxyServer
+    # with base_url, i.e. the pooled-mode proxy or newer):
+    git worktree add /tmp/proxy-before <commit>
+    python -m proxy.bench.bench_sse --proxy-root /tmp/proxy-before
+"""
+
+import argparse
+import codecs
+import importlib
+import json
+import logging
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from proxy.bench.replay_server import DEFAULT_FIXTURE, ReplayServer
+from proxy.sse_translator import SSETranslator
+
+TEXT_DELTA = b'"text_delta"'
+
+
+def legacy_translate(data: bytes, chunk_size: int = 64) -> list:
+    """Previous proxy loop: 64 B chunks, UTF-8 decoder and json.loads/dumps per event."""
+    frames = []
+    text_parts = []
+    buffer = b""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for i in range(0, len(data), chunk_size):
+        buffer += data[i:i + chunk_size]
+        while b"\n" in buffer:
+            line_bytes, buffer = buffer.split(b"\n", 1)
+            if not line_bytes:
+                continue
+            line = decoder.decode(line_bytes, final=False).strip()
+            if line.startswith("data: "):
+                event = json.loads(line[6:])
+                event_type = event.get("type")
+                if event_type == "content_block_delta" and event["delta"].get("type") == "text_delta":
+                    text_parts.append(event["delta"]["text"])
+                if event_type == "message_limit":
+                    continue
+                if event_type == "message_delta" and "usage" not in event:
+                    event["usage"] = {"output_tokens": len(text_parts)}
+                frames.append(f"data: {json.dumps(event)}\n\n".encode())
+            elif line.startswith("event: "):
+                frames.append(f"{line}\n".encode())
+    return frames
+
+
+def translate(data: bytes, chunk_size: int = 1400) -> list:
+    """SSETranslator fed with network-sized chunks."""
+    translator = SSETranslator()
+    frames = []
+    for i in range(0, len(data), chunk_size):
+        frames += translator.feed(data[i:i + chunk_size])
+    return frames + translator.finish()
+
+
+def bench_offline(data: bytes, tokens: int, runs: int) -> None:
+    for name, func in (("legacy", legacy_translate), ("translator", translate)):
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            func(data)
+            timings.append(time.perf_counter() - start)
+        print(f"offline {name:>10}: {statistics.median(timings) / tokens * 1e6:6.2f} us/token")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _load_proxy(proxy_root: Path):
+    """proxy.local_proxy from the given checkout (sys.modules swapped for the import)."""
+    saved = {name: module for name, module in sys.modules.items() if name == "proxy" or name.startswith("proxy.")}
+    for name in saved:
+        del sys.modules[name]
+    sys.path.insert(0, str(proxy_root))
+    try:
+        return importlib.import_module("proxy.local_proxy")
+    finally:
+        sys.path.remove(str(proxy_root))
+        sys.modules.update(saved)
+
+
+def bench_e2e(proxy_root: Path, replay: ReplayServer, expected: str, tokens: int, runs: int) -> None:
+    import anthropic
+
+    local_proxy = _load_proxy(proxy_root)
+    port = _free_port()
+    proxy = local_proxy.ClaudeAIProxyServer("sk-ant-sid01-bench", port=port, base_url=replay.url)
+    proxy.start_server()
+    time.sleep(1.0)
+
+    client = anthropic.Anthropic(api_key="bench", base_url=f"http://127.0.0.1:{port}")
+    ttft, total = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        first = None
+        text = ""
+        with client.messages.stream(model="bench", max_tokens=10,
+                                    messages=[{"role": "user", "content": "q"}]) as stream:
+            for delta in stream.text_stream:
+                if first is None:
+                    first = time.perf_counter() - start
+                text += delta
+        if text != expected:
+            raise AssertionError(f"stream mismatch: {len(text)} vs {len(expected)} chars")
+        ttft.append(first)
+        total.append(time.perf_counter() - start)
+
+    median_total = statistics.median(total)
+    print(f"e2e {proxy_root}: TTFT {statistics.median(ttft) * 1000:.1f} ms, "
+          f"stream {median_total * 1000:.0f} ms ({median_total / tokens * 1e6:.0f} us/token)")
+
+
+def _expected_text(data: bytes) -> str:
+    text = []
+    for line in data.split(b"\n"):
+        if line.startswith(b"data: ") and TEXT_DELTA in line:
+            text.append(json.loads(line[6:])["delta"]["text"])
+    return "".join(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="claude.ai proxy SSE benchmark")
+    parser.add_argument("--fixture", type=Path, default=DEFAULT_FIXTURE)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--skip-e2e", action="store_true")
+    parser.add_argument("--proxy-root", type=Path, default=Path(__file__).resolve().parents[2],
+                        help="checkout whose proxy package is measured end to end")
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    data = args.fixture.read_bytes()
+    tokens = data.count(TEXT_DELTA)
+    print(f"fixture {args.fixture.name}: {len(data)} bytes, {tokens} text deltas")
+
+    bench_offline(data, tokens, args.runs * 2)
+    if args.skip_e2e:
+        return
+
+    replay = ReplayServer(args.fixture).start()
+    try:
+        bench_e2e(args.proxy_root, replay, _expected_text(data), tokens, args.runs)
+    finally:
+        replay.stop()
+
+
+if __name__ == "__main__":
+    main()
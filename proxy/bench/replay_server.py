@@ -0,0 +1,107 @@
+"""Local fixture server replaying a claude.ai SSE stream.
+
+Emulates the upstream endpoints the proxy talks to (``/chats`` warmup,
+organizations, conversation create/delete and ``/completion``) and answers
+every completion with the bytes of a fixture file, so the proxy can be
+benchmarked without network access or a sessionKey.
+
+Usage:
+    python -m proxy.bench.replay_server [--port 18700] [--fixture PATH]
+    # then: ClaudeAIProxyServer(..., base_url="http://127.0.0.1:18700")
+"""
+
+import argparse
+import json
+import threading
+from pathlib import Path
+from typing import Optional
+
+from flask import Flask, Response
+from werkzeug.serving import make_server
+
+FIXTURE_DIR = Path(__file__).parent / "fixtures"
+DEFAULT_FIXTURE = FIXTURE_DIR / "claude_ai_stream.sse"
+
+
+def load_events(path: Path = DEFAULT_FIXTURE) -> list:
+    """Fixture split into SSE events (bytes, each ending with a blank line)."""
+    data = Path(path).read_bytes()
+    return [event + b"\n\n" for event in data.split(b"\n\n") if event.strip()]
+
+
+def create_app(events: list, chunk_events: int = 1) -> Flask:
+    """Flask app answering /completion with the given events.
+
+    Args:
+        events: SSE events (bytes) from load_events()
+        chunk_events: Events per written chunk (1 = one write per event,
+            like claude.ai sends tokens)
+    """
+    app = Flask("claude_ai_replay")
+
+    @app.get("/chats")
+    def chats():
+        return "ok"
+
+    @app.get("/api/organizations")
+    def organizations():
+        return json.dumps([{"uuid": "org-replay"}])
+
+    @app.post("/api/organizations/<org>/chat_conversations")
+    def create_conversation(org):
+        return json.dumps({"uuid": "conversation-replay"}), 201
+
+    @app.delete("/api/organizations/<org>/chat_conversations/<conversation_uuid>")
+    def delete_conversation(org, conversation_uuid):
+        return "", 204
+
+    @app.post("/api/organizations/<org>/chat_conversations/<conversation_uuid>/completion")
+    def completion(org, conversation_uuid):
+        def stream():
+            for i in range(0, len(events), chunk_events):
+                yield b"".join(events[i:i + chunk_events])
+
+        return Response(stream(), content_type="text/event-stream")
+
+    return app
+
+
+class ReplayServer:
+    """Replay server in a background thread (start() / stop())."""
+
+    def __init__(self, fixture: Path = DEFAULT_FIXTURE, port: int = 0, chunk_events: int = 1):
+        self.events = load_events(fixture)
+        self._server = make_server("127.0.0.1", port, create_app(self.events, chunk_events), threaded=True)
+        self.port = self._server.server_port
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--port", type=int, default=18700)
+    parser.add_argument("--fixture", type=Path, default=DEFAULT_FIXTURE)
+    parser.add_argument("--chunk-events", type=int, default=1)
+    args = parser.parse_args()
+
+    server = ReplayServer(args.fixture, args.port, args.chunk_events)
+    print(f"Replaying {args.fixture.name} ({len(server.events)} events) on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
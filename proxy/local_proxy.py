@@ -12,10 +12,14 @@ This is REVOLUTIONARY - full OAuth support with zero manual work!
 
 import asyncio
 import json
+import queue
+import time
 from typing import Optional, Dict, Any
 from pathlib import Path
 import threading
 
+from .sse_translator import SSETranslator
+
 try:
     from flask import Flask, request, Response, stream_with_context
 
@@ -34,12 +38,24 @@ except ImportError:
 class ClaudeAIProxyServer:
     """Local proxy server for claude.ai API with OAuth."""
 
-    def __init__(self, oauth_token: str, port: int = 8765):
+    def __init__(
+        self,
+        oauth_token: str,
+        port: int = 8765,
+        pool_size: int = 0,
+        base_url: str = "https://claude.ai",
+    ):
         """Initialize proxy server.
 
         Args:
             oauth_token: OAuth token or sessionKey for authentication
             port: Port to run proxy on (default 8765)
+            pool_size: Pooled mode - number of pre-created conversations kept
+                ready; every single-turn request gets a fresh one (and its own
+                HTTP session), so concurrent requests never share a chat.
+                Used conversations are deleted once the response finishes.
+                0 = one shared conversation (multi-turn CLI sessions)
+            base_url: Upstream URL (overridable for a local mock upstream)
         """
         self.oauth_token = oauth_token
         self.port = port
@@ -47,23 +63,46 @@ class ClaudeAIProxyServer:
         self.server_thread = None
         self.organization_id = None
         self.conversation_uuid = None
+        self.pool_size = max(0, pool_size)
+        self.base_url = base_url.rstrip("/")
 
         # Detect token type
         self.is_session_key = oauth_token.startswith("sk-ant-sid01-")
 
+        self._org_lock = threading.Lock()
+        self._conversation_lock = threading.Lock()
+        # Pooled mode: ready conversations (single-use) and idle HTTP sessions
+        self._conversations: "queue.Queue[str]" = queue.Queue()
+        self._sessions: "queue.Queue[Any]" = queue.Queue()
+        self._refill_lock = threading.Lock()
+        self._refill_running = False
+
+        self.session = self._create_session()
+        if self.is_session_key:
+            print(f"✅ Using sessionKey authentication (claude.ai)")
+        else:
+            # OAuth token handling
+            print(f"⚠️  Token doesn't look like sessionKey, trying anyway...")
+
+        # Pre-warm session to get Cloudflare cookies
+        self._warmup_session()
+
+        if self.pool_size:
+            # Org id + conversations + sessions ready before the first request
+            self._schedule_refill()
+
+    def _create_session(self):
+        """HTTP session with browser headers and sessionKey cookie."""
         # Initialize session with CloudScraper (bypasses Cloudflare!)
         if CLOUDSCRAPER_AVAILABLE:
-            self.session = cloudscraper.create_scraper(
+            session = cloudscraper.create_scraper(
                 browser={"browser": "chrome", "platform": "windows", "desktop": True}
             )
-            # Disable auto-decompression for streaming
-            # CloudScraper/requests might be eating the stream
-            print("⚙️  Configuring session for streaming...")
         else:
             # Fallback to requests
             import requests
 
-            self.session = requests.Session()
+            session = requests.Session()
 
         # Set headers (without Cookie - that goes in CookieJar)
         headers = {
@@ -75,19 +114,18 @@ class ClaudeAIProxyServer:
             "Referer": "https://claude.ai/new",
         }
 
-        self.session.headers.update(headers)
+        session.headers.update(headers)
 
         # Add sessionKey to CookieJar (not headers!)
         # This allows CloudScraper to manage all cookies properly
         if self.is_session_key:
             from http.cookiejar import Cookie
-            import time
 
             # Create a cookie object for sessionKey
             cookie = Cookie(
                 version=0,
                 name="sessionKey",
-                value=oauth_token,
+                value=self.oauth_token,
                 port=None,
                 port_specified=False,
                 domain=".claude.ai",
@@ -103,16 +141,8 @@ class ClaudeAIProxyServer:
                 rest={},
                 rfc2109=False,
             )
-            self.session.cookies.set_cookie(cookie)
-            print(f"✅ Using sessionKey authentication (claude.ai)")
-        else:
-            # OAuth token handling
-            print(f"⚠️  Token doesn't look like sessionKey, trying anyway...")
-
-        self.base_url = "https://claude.ai"
-
-        # Pre-warm session to get Cloudflare cookies
-        self._warmup_session()
+            session.cookies.set_cookie(cookie)
+        return session
 
     def _warmup_session(self) -> None:
         """Pre-warm session by visiting homepage to get Cloudflare cookies."""
@@ -131,34 +161,41 @@ class ClaudeAIProxyServer:
             print(f"⚠️  Session warmup failed: {e} (continuing anyway)")
 
     def _get_organization_id(self) -> Optional[str]:
-        """Get organization ID from OAuth token."""
+        """Get organization ID from OAuth token (fetched once, then cached)."""
         if self.organization_id:
             return self.organization_id
 
-        try:
-            response = self.session.get(f"{self.base_url}/api/organizations")
+        with self._org_lock:
+            if self.organization_id:
+                return self.organization_id
 
-            if response.status_code == 200:
-                data = response.json()
-                if isinstance(data, list) and len(data) > 0:
-                    self.organization_id = data[0].get("uuid")
-                    return self.organization_id
-        except Exception:
-            pass
+            try:
+                response = self.session.get(f"{self.base_url}/api/organizations")
 
-        # Fallback
-        self.organization_id = "0a3f3061-4469-49c7-b0af-80a5bf5dd9df"
-        return self.organization_id
+                if response.status_code == 200:
+                    data = response.json()
+                    if isinstance(data, list) and len(data) > 0:
+                        self.organization_id = data[0].get("uuid")
+                        return self.organization_id
+            except Exception:
+                pass
+
+            # Fallback
+            self.organization_id = "0a3f3061-4469-49c7-b0af-80a5bf5dd9df"
+            return self.organization_id
 
     def _create_conversation(self) -> Optional[str]:
-        """Create new conversation and return UUID."""
+        """Create the shared conversation (non-pooled mode) and return UUID."""
+        self.conversation_uuid = self._new_conversation(self.session)
+        return self.conversation_uuid
+
+    def _new_conversation(self, session) -> Optional[str]:
+        """Create new conversation on claude.ai and return its UUID."""
         org_id = self._get_organization_id()
         if not org_id:
             return None
 
         # Retry up to 3 times (Cloudflare may need warming up)
-        import time
-
         max_retries = 3
 
         for attempt in range(max_retries):
@@ -166,15 +203,14 @@ class ClaudeAIProxyServer:
                 if attempt > 0:
                     time.sleep(2**attempt)  # 2s, 4s
 
-                response = self.session.post(
+                response = session.post(
                     f"{self.base_url}/api/organizations/{org_id}/chat_conversations",
                     json={"name": "Python Session", "uuid": None},
                 )
 
                 if response.status_code == 201 or response.status_code == 200:
                     data = response.json()
-                    self.conversation_uuid = data.get("uuid")
-                    return self.conversation_uuid
+                    return data.get("uuid")
                 elif response.status_code == 403 and attempt < max_retries - 1:
                     continue
 
@@ -184,6 +220,81 @@ class ClaudeAIProxyServer:
 
         return None
 
+    # === POOLED MODE ===
+
+    def _lease_session(self):
+        """Idle pooled HTTP session (new one sharing Cloudflare cookies if none)."""
+        try:
+            return self._sessions.get_nowait()
+        except queue.Empty:
+            session = self._create_session()
+            session.cookies.update(self.session.cookies)
+            return session
+
+    def _release_session(self, session) -> None:
+        self._sessions.put(session)
+
+    def _lease_conversation(self, session) -> Optional[str]:
+        """Fresh conversation from the pool (created on the spot if pool is empty)."""
+        try:
+            conversation_uuid = self._conversations.get_nowait()
+        except queue.Empty:
+            conversation_uuid = self._new_conversation(session)
+        self._schedule_refill()
+        return conversation_uuid
+
+    def _discard_conversation(self, conversation_uuid: str) -> None:
+        """Delete a used pooled conversation in the background.
+
+        Every pooled request gets its own chat - without this the user's
+        claude.ai history would fill up with single-turn conversations.
+        """
+        threading.Thread(
+            target=self._delete_conversation, args=(conversation_uuid,), daemon=True
+        ).start()
+
+    def _delete_conversation(self, conversation_uuid: str) -> None:
+        org_id = self._get_organization_id()
+        session = self._lease_session()
+        try:
+            response = session.delete(
+                f"{self.base_url}/api/organizations/{org_id}/chat_conversations/{conversation_uuid}",
+                timeout=30,
+            )
+            if response.status_code not in (200, 202, 204):
+                print(f"⚠️  [Proxy] Could not delete conversation {conversation_uuid}: {response.status_code}")
+        except Exception as e:
+            print(f"⚠️  [Proxy] Could not delete conversation {conversation_uuid}: {e}")
+        finally:
+            self._release_session(session)
+
+    def _schedule_refill(self) -> None:
+        """Top up conversations and sessions in the background."""
+        with self._refill_lock:
+            if self._refill_running:
+                return
+            self._refill_running = True
+        threading.Thread(target=self._refill_pool, daemon=True).start()
+
+    def _refill_pool(self) -> None:
+        try:
+            self._get_organization_id()
+            while self._sessions.qsize() < self.pool_size:
+                session = self._create_session()
+                session.cookies.update(self.session.cookies)
+                self._sessions.put(session)
+            while self._conversations.qsize() < self.pool_size:
+                conversation_uuid = self._new_conversation(self.session)
+                if not conversation_uuid:
+                    print("⚠️  [Proxy] Could not pre-create conversation")
+                    break
+                self._conversations.put(conversation_uuid)
+        except Exception as e:
+            print(f"⚠️  [Proxy] Pool refill failed: {e}")
+        finally:
+            with self._refill_lock:
+                self._refill_running = False
+
     def _convert_document(self, file_content: bytes, file_name: str) -> Optional[str]:
         """Convert document/audio to text using claude.ai upload API.
 
@@ -290,17 +401,32 @@ class ClaudeAIProxyServer:
         stream = anthropic_request.get("stream", True)
         tools = anthropic_request.get("tools", None)  # Extract tools if provided
 
-        # Create new conversation if needed (first request of this proxy instance)
-        if not self.conversation_uuid:
-            self._create_conversation()
+        user_message_count = sum(1 for m in messages if m.get("role") == "user")
+        is_first_message = user_message_count == 1
 
-            if not self.conversation_uuid:
-                error_msg = (
-                    "Could not create conversation - check OAuth token and connection to claude.ai"
-                )
-                return Response(
-                    json.dumps({"error": error_msg}), status=500, content_type="application/json"
-                )
+        # Pooled mode: single-turn requests get their own fresh conversation and
+        # HTTP session; multi-turn ones continue the shared conversation
+        pooled = self.pool_size > 0 and is_first_message
+        if pooled:
+            session = self._lease_session()
+            conversation_uuid = self._lease_conversation(session)
+        else:
+            session = self.session
+            # Create new conversation if needed (first request of this proxy instance)
+            with self._conversation_lock:
+                if not self.conversation_uuid:
+                    self._create_conversation()
+            conversation_uuid = self.conversation_uuid
+
+        if not conversation_uuid:
+            if pooled:
+                self._release_session(session)
+            error_msg = (
+                "Could not create conversation - check OAuth token and connection to claude.ai"
+            )
+            return Response(
+                json.dumps({"error": error_msg}), status=500, content_type="application/json"
+            )
 
         # Convert to claude.ai format
         user_prompt = self._convert_messages_to_prompt(messages)
@@ -308,8 +434,6 @@ class ClaudeAIProxyServer:
         # CRITICAL: Prepend system prompt ONLY for first user message
         # Claude.ai doesn't have separate "system" field, so we add it to first prompt
         # After that, claude.ai remembers context from conversation
-        user_message_count = sum(1 for m in messages if m.get("role") == "user")
-        is_first_message = user_message_count == 1
         if system and is_first_message:
             prompt = f"{system}\n\n---\n\n{user_prompt}"
             print(f"📋 [Proxy] Including system prompt in first message ({len(system)} chars)")
@@ -337,10 +461,10 @@ class ClaudeAIProxyServer:
 
         try:
             # Use the /completion endpoint that we know works (returns 200)
-            endpoint = f"{self.base_url}/api/organizations/{org_id}/chat_conversations/{self.conversation_uuid}/completion"
+            endpoint = f"{self.base_url}/api/organizations/{org_id}/chat_conversations/{conversation_uuid}/completion"
 
             # Make request with streaming
-            response = self.session.post(
+            response = session.post(
                 endpoint,
                 json=claude_request,
                 headers={
@@ -360,6 +484,10 @@ class ClaudeAIProxyServer:
                 except:
                     pass
 
+                response.close()
+                if pooled:
+                    self._release_session(session)
+                    self._discard_conversation(conversation_uuid)
                 return Response(
                     json.dumps(
                         {
@@ -373,122 +501,39 @@ class ClaudeAIProxyServer:
 
             # Stream response back in Anthropic format (TRUE streaming!)
             def generate():
+                # claude.ai already sends Anthropic SSE - the translator passes
+                # events through as raw bytes and re-encodes only those it changes
+                translator = SSETranslator()
                 try:
-                    import codecs
-
-                    text_parts = []
-                    event_count = 0
-                    buffer = b""
-
-                    # Use incremental decoder to handle UTF-8 sequences split across chunks
-                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
-
-                    # Read from response stream directly for real-time streaming
-                    # chunk_size=64 for responsiveness without killing performance
-                    for chunk in response.iter_content(chunk_size=64, decode_unicode=False):
+                    # chunk_size=None yields data as soon as it arrives (no 64 B slicing),
+                    # every complete event is sent immediately
+                    for chunk in response.iter_content(chunk_size=None):
                         if not chunk:
                             continue
+                        for frame in translator.feed(chunk):
+                            yield frame
+                        if translator.finished:
+                            break
 
-                        buffer += chunk
-
-                        # Process complete lines as they arrive
-                        while b"\n" in buffer:
-                            line_bytes, buffer = buffer.split(b"\n", 1)
-
-                            if not line_bytes:
-                                continue
-
-                            # Use incremental decoder - handles incomplete UTF-8 sequences
-                            # This prevents UnicodeDecodeError when Polish chars (ą,ę,ć)
-                            # are split across chunk boundaries
-                            try:
-                                line = decoder.decode(line_bytes, final=False).strip()
-                            except Exception as e:
-                                # Should never happen with 'replace' errors, but just in case
-                                logger.error(f"Failed to decode line: {e}")
-                                continue
-
-                            if not line:
-                                continue
-
-                            # SSE format: "data: {json}" or "event: type"
-                            if line.startswith("data: "):
-                                event_count += 1
-                                data_str = line[6:]  # Remove "data: " prefix
-
-                                # Check for SSE end marker
-                                if data_str == "[DONE]":
-                                    break
-
-                                try:
-                                    data = json.loads(data_str)
-
-                                    # DEBUG: Log ONLY tool_use events
-                                    event_type = data.get("type", "")
-                                    if event_type == "content_block_start":
-                                        cb = data.get("content_block", {})
-                                        if cb.get("type") == "tool_use":
-                                            print(
-                                                f"🔍 [Proxy] tool_use detected: {cb.get('name', 'unknown')} (id: {cb.get('id', 'N/A')})"
-                                            )
-
-                                    # Claude.ai already sends Anthropic SSE format!
-                                    # Just check for text_delta in content_block_delta events
-                                    if data.get("type") == "content_block_delta":
-                                        delta = data.get("delta", {})
-                                        if delta.get("type") == "text_delta":
-                                            text = delta.get("text", "")
-                                            text_parts.append(text)
-
-                                    # Filter out claude.ai-specific events that SDK doesn't understand
-                                    event_type = data.get("type")
-                                    if event_type == "message_limit":
-                                        # Skip claude.ai specific event
-                                        continue
-
-                                    # Add usage stats to message_delta if missing (for SDK compatibility)
-                                    if event_type == "message_delta":
-                                        # usage should be at top level, not in delta!
-                                        if "usage" not in data:
-                                            data["usage"] = {
-                                                "output_tokens": len(text_parts)  # Approximate
-                                            }
-
-                                    # Pass through events to client
-                                    yield f"data: {json.dumps(data)}\n\n"
-
-                                    # Check for message_stop
-                                    if event_type == "message_stop":
-                                        # Send [DONE] marker so oauth_anthropic_client knows stream ended
-                                        yield "data: [DONE]\n\n"
-                                        break
-
-                                except json.JSONDecodeError as e:
-                                    # Silently skip bad JSON
-                                    continue
-
-                            elif line.startswith("event: "):
-                                # Pass through event lines too
-                                yield f"{line}\n"
-
-                    # Finalize decoder - process any remaining bytes
-                    if buffer:
-                        try:
-                            remaining = decoder.decode(buffer, final=True).strip()
-                            if remaining and remaining.startswith("data: "):
-                                # Process final line if it's valid SSE
-                                yield f"{remaining}\n\n"
-                        except Exception as e:
-                            logger.debug(f"Skipping final buffer: {e}")
+                    for frame in translator.finish():
+                        yield frame
 
                 except Exception as e:
                     import traceback
 
                     traceback.print_exc()
+                finally:
+                    response.close()
+                    if pooled:
+                        self._release_session(session)
+                        self._discard_conversation(conversation_uuid)
 
-            return Response(stream_with_context(generate()), content_type="text/event-stream")
+            return Response(stream_with_context(generate()), content_type="text/event-stream; charset=utf-8")
 
         except Exception as e:
+            if pooled:
+                self._release_session(session)
+                self._discard_conversation(conversation_uuid)
             return Response(
                 json.dumps({"error": str(e)}), status=500, content_type="application/json"
             )
@@ -537,7 +582,8 @@ class ClaudeAIProxyServer:
 
         # Run in background thread
         def run():
-            self.app.run(host="127.0.0.1", port=self.port, debug=False, use_reloader=False)
+            # threaded: concurrent requests (suggestions, validation, answers) don't queue
+            self.app.run(host="127.0.0.1", port=self.port, debug=False, use_reloader=False, threaded=True)
 
         self.server_thread = threading.Thread(target=run, daemon=True)
         self.server_thread.start()
@@ -550,12 +596,13 @@ class ClaudeAIProxyServer:
 _proxy_instance: Optional[ClaudeAIProxyServer] = None
 
 
-def start_proxy_server(oauth_token: str, port: int = 8765) -> tuple[bool, int]:
+def start_proxy_server(oauth_token: str, port: int = 8765, pool_size: int = 0) -> tuple[bool, int]:
     """Start proxy server in background with auto port selection.
 
     Args:
         oauth_token: OAuth token for authentication
         port: Preferred port to run on (will auto-increment if busy)
+        pool_size: Pre-created conversations for pooled mode (0 = shared conversation)
 
     Returns:
         Tuple of (success: bool, actual_port: int)
@@ -595,18 +642,18 @@ def start_proxy_server(oauth_token: str, port: int = 8765) -> tuple[bool, int]:
         )
         return (False, 0)
 
-    _proxy_instance = ClaudeAIProxyServer(oauth_token, port)
+    _proxy_instance = ClaudeAIProxyServer(oauth_token, port, pool_size=pool_size)
     started = _proxy_instance.start_server()
 
     if not started:
         return (False, 0)
 
     # Wait for Flask to be ready (health check loop)
-    import time
     import requests
 
     max_wait = 5  # seconds
     start_time = time.time()
+    delay = 0.02  # Short backoff: 20ms, 40ms, ... up to 250ms
 
     while time.time() - start_time < max_wait:
         try:
@@ -616,7 +663,8 @@ def start_proxy_server(oauth_token: str, port: int = 8765) -> tuple[bool, int]:
                 return (True, port)
         except:
             pass
-        time.sleep(0.1)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.25)
 
     print(f"⚠️  Proxy health check timeout - may not be ready")
     return (True, port)  # Continue anyway
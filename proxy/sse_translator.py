@@ -0,0 +1,144 @@
+"""Incremental claude.ai SSE -> Anthropic SSE translator.
+
+claude.ai already streams Anthropic-format events, so most of them are
+passed through as the raw bytes received from upstream - no decoding and
+no JSON round trip per token. Only events that need changes are parsed:
+
+- ``message_limit`` (claude.ai specific) is dropped
+- ``message_delta`` without ``usage`` gets an approximate one (SDK needs it)
+- ``message_stop`` is followed by ``data: [DONE]``
+
+Pass-through events are not fully validated: the type is read from the
+``{"type":"`` prefix and a payload is trusted only if it also ends with
+``}``. A truncated line falls back to ``json.loads`` and is skipped like
+any other bad JSON; malformed JSON with an intact prefix and closing brace
+is forwarded as received (claude.ai produces it with ``json.dumps``).
+
+Lines are split on bytes, so UTF-8 sequences split across network chunks
+(Polish diacritics) need no incremental decoder - ``\\n`` never occurs
+inside a multi-byte sequence.
+"""
+
+import json
+from typing import List, Optional, Tuple
+
+
+class SSETranslator:
+    """Feed upstream chunks, get ready-to-send SSE frames (one per event)."""
+
+    DONE_FRAME = b"data: [DONE]\n\n"
+
+    _DATA_PREFIX = b"data: "
+    _EVENT_PREFIX = b"event: "
+    # claude.ai serializes "type" first - lets us read it without parsing JSON
+    _TYPE_PREFIX = b'{"type":"'
+    _FRAME_END = b"\n\n"
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pending_event: Optional[bytes] = None   # "event:" line waiting for its data
+        self.finished = False
+        self.events = 0
+        self.text_deltas = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Process an upstream chunk; returns complete frames to send right away."""
+        frames: List[bytes] = []
+        if self.finished:
+            return frames
+
+        buffer = self._buffer
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end < 0:
+                break
+            if end > start:
+                frame = self._process_line(bytes(buffer[start:end]))
+                if frame:
+                    frames.append(frame)
+                    if self.finished:
+                        break
+            start = end + 1
+        del buffer[:start]
+        return frames
+
+    def finish(self) -> List[bytes]:
+        """Flush a trailing line without a newline (stream ended mid-line)."""
+        if self.finished or not self._buffer:
+            return []
+        line, self._buffer = bytes(self._buffer), bytearray()
+        frame = self._process_line(line)
+        return [frame] if frame else []
+
+    # === EVENTS ===
+
+    def _process_line(self, line: bytes) -> Optional[bytes]:
+        line = line.rstrip(b"\r")
+        if line.startswith(self._EVENT_PREFIX):
+            self._pending_event = line
+            return None
+        if not line.startswith(self._DATA_PREFIX):
+            return None
+
+        payload = line[len(self._DATA_PREFIX):]
+        self.events += 1
+        if payload == b"[DONE]":
+            self.finished = True
+            return None
+
+        event_type, data = self._event_type(payload)
+        if event_type is None:
+            # Silently skip bad JSON
+            self._pending_event = None
+            return None
+
+        if event_type == "content_block_delta":
+            if b'"text_delta"' in payload:
+                self.text_deltas += 1
+            return self._frame(line)
+
+        if event_type == "message_limit":
+            # Skip claude.ai specific event (with its "event:" line)
+            self._pending_event = None
+            return None
+
+        if event_type == "content_block_start" and b'"tool_use"' in payload:
+            data = data if data is not None else json.loads(payload)
+            cb = data.get("content_block", {})
+            print(f"🔍 [Proxy] tool_use detected: {cb.get('name', 'unknown')} (id: {cb.get('id', 'N/A')})")
+
+        if event_type == "message_delta" and b'"usage"' not in payload:
+            # usage should be at top level, not in delta! (SDK compatibility)
+            data = data if data is not None else json.loads(payload)
+            if "usage" not in data:
+                data["usage"] = {"output_tokens": self.text_deltas}  # Approximate
+                line = self._DATA_PREFIX + json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+        frame = self._frame(line)
+        if event_type == "message_stop":
+            # [DONE] marker so the client knows the stream ended
+            self.finished = True
+            frame += self.DONE_FRAME
+        return frame
+
+    def _event_type(self, payload: bytes) -> Tuple[Optional[str], Optional[dict]]:
+        """Event type - from the byte prefix when possible, JSON otherwise."""
+        if payload.startswith(self._TYPE_PREFIX) and payload.endswith(b"}"):
+            end = payload.find(b'"', len(self._TYPE_PREFIX))
+            if end > 0:
+                return payload[len(self._TYPE_PREFIX):end].decode("ascii", "replace"), None
+        try:
+            data = json.loads(payload)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None, None
+        if not isinstance(data, dict):
+            return None, None
+        return data.get("type", ""), data
+
+    def _frame(self, data_line: bytes) -> bytes:
+        event, self._pending_event = self._pending_event, None
+        if event is None:
+            return data_line + self._FRAME_END
+        return b"".join((event, b"\n", data_line, self._FRAME_END))
@@ -1,8 +1,23 @@
 """
 Wizyta v2 - NiceGUI Edition
 Nowoczesne GUI do generowania opisow stomatologicznych z wywiadu glosowego.
+
+Opcje: --profile-startup - raport czasow importow i inicjalizacji (logs/startup_profile.json)
+       --trace-latency   - opoznienia pipeline'u Live audio -> tekst -> karta
+                           (nakladka p50/p95, eksport logs/latency_trace.json)
 """
 
+import multiprocessing
+
+if __name__ == "__main__":
+    # Exe (PyInstaller): proces puli eksportu PDF uruchamia ten sam plik -
+    # freeze_support() wykonuje w nim zadanie i konczy proces, zanim ruszy aplikacja
+    multiprocessing.freeze_support()
+
+# Profil startu - przed pozostalymi importami, zeby objac ich czasy
+from core import startup_profile
+startup_profile.install_import_hook()
+
 import asyncio
 import sys
 
@@ -11,6 +26,7 @@ import sys
 if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 import concurrent.futures
+import importlib.util
 import json
 import os
 import subprocess
@@ -101,25 +117,19 @@ CONFIG_FILE = Path(__file__).parent / "config.json"
 ICD_FILE = Path(__file__).parent / "icd10.json"
 
 # === IMPORTY OPCJONALNE ===
+# Ciezkie biblioteki (audio, SDK Gemini) - przy starcie tylko sprawdzamy, czy sa
+# zainstalowane; import przy pierwszym uzyciu, zeby nie opozniac pierwszego renderu
 
 # Audio
 try:
-    import sounddevice as sd
-    import numpy as np
-    AUDIO_AVAILABLE = True
-except ImportError:
-    sd = None
-    np = None
+    AUDIO_AVAILABLE = all(importlib.util.find_spec(name) is not None for name in ("sounddevice", "numpy"))
+except (ImportError, ValueError):
     AUDIO_AVAILABLE = False
 
 # Google Gemini
 try:
-    from google import genai
-    from google.genai import types
-    GENAI_AVAILABLE = True
-except ImportError:
-    genai = None
-    types = None
+    GENAI_AVAILABLE = importlib.util.find_spec("google.genai") is not None
+except (ImportError, ValueError):
     GENAI_AVAILABLE = False
 
 # Transcriber
@@ -170,6 +180,13 @@ except ImportError as e:
     print(f"[WARN] SpecializationManager missing: {e}", flush=True)
     get_specialization_manager = None
 
+try:
+    from core.services.visit_draft_service import VisitDraftService, claim_visit_drafts
+except ImportError as e:
+    print(f"[WARN] VisitDraftService missing: {e}", flush=True)
+    VisitDraftService = None
+    claim_visit_drafts = None
+
 SERVICES_AVAILABLE = LLMService is not None
 
 # UI Components
@@ -178,7 +195,6 @@ try:
     from app_ui.components.settings import create_settings_section
     from app_ui.components.recording import create_recording_section
     from app_ui.components.results import create_results_section, _render_diagnosis_grid, _render_procedure_grid, _schedule_size_to_fit
-    from app_ui.live import LiveInterviewView
 except ImportError as e:
     print(f"[ERROR] Could not import UI components: {e}")
 
@@ -190,36 +206,31 @@ GLOBAL_TRANSCRIBER_MANAGER = None
 GLOBAL_LIVE_TRANSCRIPT = None
 # Windows Ctrl+C handler (musi być globalna żeby nie była garbage collectowana)
 _WIN_CTRL_HANDLER = None
+# Manager tworzony z wątku startowego (snapshot backendów) i z pierwszej strony
+_TRANSCRIBER_MANAGER_LOCK = threading.Lock()
 
 def get_transcriber_manager():
     global GLOBAL_TRANSCRIBER_MANAGER
     if not TRANSCRIBER_AVAILABLE:
         return None
-    
-    if GLOBAL_TRANSCRIBER_MANAGER is None:
-        try:
-            GLOBAL_TRANSCRIBER_MANAGER = TranscriberManager()
-        except Exception as e:
-            print(f"[ERROR] Could not initialize TranscriberManager: {e}", flush=True)
-            return None
-            
+
+    with _TRANSCRIBER_MANAGER_LOCK:
+        if GLOBAL_TRANSCRIBER_MANAGER is None:
+            try:
+                GLOBAL_TRANSCRIBER_MANAGER = TranscriberManager()
+            except Exception as e:
+                print(f"[ERROR] Could not initialize TranscriberManager: {e}", flush=True)
+                return None
+
     return GLOBAL_TRANSCRIBER_MANAGER
 
-# Claude Proxy
-import sys
+# Claude Proxy (importowany przez LLMService przy pierwszym uzyciu)
 _proxy_src = os.environ.get("WYWIAD_CLAUDE_PROXY_SRC") or r"C:\Users\guzic\Documents\GitHub\tools\claude-code-py\src"
 try:
     if _proxy_src and Path(_proxy_src).is_dir():
         sys.path.insert(0, _proxy_src)
 except Exception:
     pass
-try:
-    from proxy import start_proxy_server, get_proxy_base_url
-    from anthropic import Anthropic
-    PROXY_AVAILABLE = True
-except ImportError:
-    PROXY_AVAILABLE = False
-    Anthropic = None
 
 
 # === HELPERS ===
@@ -279,6 +290,19 @@ class DeviceInfo:
     recommended: bool = False
 
 
+_DEVICES: Optional[list] = None
+_DEVICES_LOCK = threading.Lock()
+
+
+def get_devices() -> list[DeviceInfo]:
+    """Urzadzenia wykryte raz na proces (OpenVINO Core jest wolny - nie przy kazdej stronie)."""
+    global _DEVICES
+    with _DEVICES_LOCK:
+        if _DEVICES is None:
+            _DEVICES = detect_devices()
+        return _DEVICES
+
+
 def detect_devices() -> list[DeviceInfo]:
     """Wykrywa dostepne urzadzenia (NPU/GPU/CPU)."""
     devices = []
@@ -400,6 +424,8 @@ class WywiadApp:
         # Last generation result (for saving visits)
         self.last_generation_result = None
         self.last_model_used = ""
+        # Szkice SOAP/ICD tej wizyty (przekazane z widoku Live albo własne strony)
+        self.visit_drafts = None
 
         # State variables
         self.is_recording = False
@@ -423,7 +449,7 @@ class WywiadApp:
         self.device_cards_container = None
 
         # Device detection
-        self.devices = detect_devices()
+        self.devices = get_devices()
         self.selected_device = self.config.get("selected_device", "auto")
 
         # Model download state
@@ -501,7 +527,8 @@ class WywiadApp:
             # Sprawdź czy backend jest zainstalowany / dostępny
             if self.transcriber_manager:
                 try:
-                    backends = self.transcriber_manager.get_available_backends()
+                    # Snapshot (przy starcie może jeszcze trwać sondowanie - poza pętlą zdarzeń)
+                    backends = await asyncio.to_thread(self.transcriber_manager.get_available_backends)
                     info = next((b for b in backends if b.type.value == backend_type), None)
                     if info and not info.is_installed:
                         self.model_state = ModelState.ERROR
@@ -538,7 +565,7 @@ class WywiadApp:
 
         # Sprawdź czy OpenVINO jest zainstalowane
         try:
-            backends = self.transcriber_manager.get_available_backends()
+            backends = await asyncio.to_thread(self.transcriber_manager.get_available_backends)
             info = next((b for b in backends if b.type.value == "openvino_whisper"), None)
             if info and not info.is_installed:
                 self.model_state = ModelState.ERROR
@@ -1245,8 +1272,11 @@ class WywiadApp:
         try:
             backend_type = TranscriberType(backend_value)
 
-            # Check if installed
-            backends = self.transcriber_manager.get_available_backends()
+            # Check if installed (snapshot - bez sondowania w wątku UI)
+            backends = self.transcriber_manager.get_availability_snapshot()
+            if backends is None:
+                ui.notify("Sprawdzanie dostępnych silników... Spróbuj za chwilę.", type='info')
+                return
             info = next((b for b in backends if b.type == backend_type), None)
 
             if info and not info.is_installed:
@@ -1425,14 +1455,14 @@ class WywiadApp:
         dialog.open()
 
     def refresh_backend_buttons(self):
-        """Odswieza przyciski backendow - wywolywane po zmianie."""
+        """Odswieza przyciski backendow - wywolywane po zmianie (render ze snapshotu, bez sondowania)."""
         if not hasattr(self, 'backend_buttons_container') or not self.backend_buttons_container:
             return
 
         # Pobierz info o backendach
         backends_info = {}
         if self.transcriber_manager:
-            for b in self.transcriber_manager.get_available_backends():
+            for b in self.transcriber_manager.get_availability_snapshot() or []:
                 backends_info[b.type.value] = b
 
         backend_options = [
@@ -1464,6 +1494,18 @@ class WywiadApp:
                         elif is_current:
                             ui.badge('Aktywny', color='green').classes('mt-1')
 
+    async def _refresh_backends_when_ready(self, client):
+        """
+        Przerysowuje przyciski backendow, gdy snapshot z tla bedzie gotowy.
+
+        client przekazany z build_ui - w zadaniu z create_task nie ma kontekstu
+        slotu, wiec ui.context.client rzucilby RuntimeError.
+        """
+        ready = await asyncio.to_thread(self.transcriber_manager.wait_for_availability, 120.0)
+        if ready and not client.is_deleted:
+            with client:
+                self.refresh_backend_buttons()
+
     # === RECORDING ===
 
     def toggle_recording(self):
@@ -1498,6 +1540,9 @@ class WywiadApp:
             self.record_status.text = "Nagrywanie..."
             self.record_status.classes(replace='text-red-600')
 
+        import numpy as np
+        import sounddevice as sd
+
         def audio_callback(indata, frames, time_info, status):
             if self.is_recording:
                 self.audio_data.append(indata.copy())
@@ -1536,6 +1581,7 @@ class WywiadApp:
                 self.record_status.classes(replace='text-orange-600')
 
             # Save to temp file
+            import numpy as np
             audio_array = np.concatenate(self.audio_data, axis=0)
             with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
                 temp_path = f.name
@@ -1574,6 +1620,8 @@ class WywiadApp:
                     raise ValueError("Brak API key lub biblioteki Gemini")
 
                 print("[DEBUG] Using Gemini fallback...")
+                from google import genai
+                from google.genai import types
                 client = genai.Client(api_key=api_key)
                 with open(audio_path, "rb") as f:
                     audio_bytes = f.read()
@@ -1692,13 +1740,36 @@ class WywiadApp:
                 spec_manager = get_specialization_manager()
                 spec_id = spec_manager.get_active().id
 
-            # Wywołanie serwisu (z nowym formatem JSON)
-            result_json, used_model = await self.llm_service.generate_description(
-                transcript,
-                self.icd10_codes, # Deprecated, ale musi być przekazane
-                self.config,
-                spec_id=spec_id
-            )
+            # Kody policzone w tle podczas wizyty Live (jeśli objęły cały transkrypt)
+            if self.visit_drafts is None and VisitDraftService:
+                self.visit_drafts = VisitDraftService()
+            drafts = self.visit_drafts
+            pass_running = drafts is not None and drafts.is_running
+            drafted = drafts.codes_for(transcript) if drafts and not pass_running else None
+
+            if drafted:
+                result_json, used_model = drafted
+                print(f"[UI] Using background coding draft ({used_model})", flush=True)
+            else:
+                # Opis i SOAP równolegle - SOAP trafia do szkicu, z którego
+                # korzysta dialog zapisu wizyty (trwający przebieg policzy go sam)
+                needs_soap = drafts is not None and not pass_running and not drafts.soap_for(transcript)[0]
+                documentation = self.llm_service.generate_visit_documentation(
+                    transcript,
+                    self.config,
+                    spec_id=spec_id,
+                    include_soap=needs_soap
+                )
+                if documentation.soap is not None:
+                    drafts.adopt_soap(transcript, documentation.soap)
+                if pass_running:
+                    # Ostatni przebieg szkicu i opis ścigają się - wygrywa szybszy
+                    drafted = await self._first_of_draft_or_description(drafts, transcript, documentation)
+                if drafted:
+                    result_json, used_model = drafted
+                    print(f"[UI] Using background coding draft ({used_model})", flush=True)
+                else:
+                    result_json, used_model = await documentation.description
 
             # Pobierz aktywną specjalizację
             spec_manager = None
@@ -1886,6 +1957,30 @@ class WywiadApp:
 
         self.copy_to_clipboard(json.dumps(data, indent=2, ensure_ascii=False), "Wybrane diagnozy i procedury")
 
+    async def _first_of_draft_or_description(self, drafts, transcript: str, documentation):
+        """
+        Czeka na trwający przebieg szkicu albo opis - co skończy się pierwsze.
+
+        Returns:
+            Kody ze szkicu (wtedy opis jest anulowany) albo None - wtedy
+            wynik daje documentation.description
+        """
+        pass_done = asyncio.ensure_future(drafts.wait_idle())
+        try:
+            done, _ = await asyncio.wait(
+                {pass_done, documentation.description},
+                return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            # wait_idle() nie anuluje samego przebiegu
+            pass_done.cancel()
+        if documentation.description in done:
+            return None
+        drafted = drafts.codes_for(transcript)
+        if drafted:
+            documentation.description.cancel()
+        return drafted
+
     async def _open_save_visit_dialog(self):
         """Otwiera dialog zapisywania wizyty z zaznaczonymi elementami."""
         if not self.last_generation_result:
@@ -1908,7 +2003,8 @@ class WywiadApp:
                 transcript=transcript,
                 diagnoses=diagnoses,
                 procedures=procedures,
-                model_used=self.last_model_used
+                model_used=self.last_model_used,
+                draft_service=self.visit_drafts
             )
         except ImportError as e:
             ui.notify(f"Moduł zapisywania niedostępny: {e}", type='negative')
@@ -2121,6 +2217,8 @@ class WywiadApp:
                         transcript_text = qa_section
 
                 self.transcript_area.value = transcript_text
+                if claim_visit_drafts:
+                    self.visit_drafts = claim_visit_drafts(app.storage.user.pop('live_drafts', None))
                 if 'live_transcript' in app.storage.user:
                     del app.storage.user['live_transcript']  # Wyczyść po użyciu
                 if 'live_qa_pairs' in app.storage.user:
@@ -2134,6 +2232,8 @@ class WywiadApp:
         # Initial Refresh
         self.refresh_device_cards()
         self.refresh_model_cards()
+        if self.transcriber_manager and self.transcriber_manager.get_availability_snapshot() is None:
+            asyncio.create_task(self._refresh_backends_when_ready(ui.context.client))
         
         # === AUTO-LOAD MODEL ===
         self._update_status_ui()
@@ -2150,6 +2250,11 @@ class WywiadApp:
 # === RUN ===
 
 def main():
+    # Proces potomny (spawn - pula eksportu PDF importuje ten plik jako
+    # __mp_main__): bez handlerow konsoli, migracji i serwera
+    if multiprocessing.current_process().name != "MainProcess":
+        return
+
     # Setup safe exit
     def handle_sigint(signum, frame):
         print("\n[APP] Otrzymano sygnał przerwania. Zamykanie...", flush=True)
@@ -2359,7 +2464,8 @@ def main():
     # === DATABASE MIGRATIONS ===
     try:
         from core.migrations import run_migrations
-        applied = run_migrations()
+        with startup_profile.phase("migrations"):
+            applied = run_migrations()
         if applied:
             print(f"[STARTUP] Applied {len(applied)} migration(s)", flush=True)
     except Exception as e:
@@ -2368,7 +2474,31 @@ def main():
     # === GLOBAL INITIALIZATION ===
     def init_global_state():
         """Inicjalizuje globalny stan (np. wczytuje modele)."""
-        # ... (kod init_global_state) ...
+        # Urządzenia (OpenVINO) - zwykle gotowe zanim otworzy się pierwsza strona
+        with startup_profile.phase("devices"):
+            get_devices()
+
+        # Snapshot dostępności backendów transkrypcji (importy pakietów, ffmpeg)
+        manager = get_transcriber_manager()
+        if manager:
+            manager.refresh_availability_async()
+
+        # Proxy Claude w tle (gdy są dane logowania) - pierwsze zapytanie nie czeka na start
+        try:
+            from core.llm_service import prestart_claude_proxy
+            if ConfigManager:
+                with startup_profile.phase("claude proxy prestart"):
+                    prestart_claude_proxy(ConfigManager())
+        except Exception as e:
+            print(f"[LLM] Proxy prestart failed: {e}", flush=True)
+
+        # Generator PDF: fonty i style gotowe przed pierwszym eksportem
+        try:
+            from core.pdf_generator import get_pdf_generator
+            with startup_profile.phase("pdf generator warm-up"):
+                get_pdf_generator()
+        except Exception as e:
+            print(f"[PDF] Warm-up failed: {e}", flush=True)
 
     # Force signal handler on startup
     def register_signal_handlers():
@@ -2384,18 +2514,30 @@ def main():
 
     app.on_startup(register_signal_handlers)
 
-    # Run initialization in background to not block startup
-    threading.Thread(target=init_global_state, daemon=True).start()
+    # Run initialization in background once the server is up (does not compete with startup)
+    app.on_startup(lambda: threading.Thread(target=init_global_state, daemon=True).start())
+
+    if startup_profile.ENABLED:
+        def _on_first_connect():
+            startup_profile.mark("first client connected")
+            startup_profile.report()
+
+        app.on_startup(lambda: startup_profile.mark("server started"))
+        app.on_connect(_on_first_connect)
 
     @ui.page('/')
     def index():
         """Strona główna."""
-        app_instance = WywiadApp()
-        app_instance.build_ui()
+        with startup_profile.phase("main page build"):
+            app_instance = WywiadApp()
+            app_instance.build_ui()
 
     @ui.page('/live')
     def live_page():
         """Strona trybu Live Interview."""
+        # Widok Live ciągnie streaming audio i diaryzację (numpy, sounddevice) - import przy wejściu
+        from app_ui.live import LiveInterviewView
+
         app_instance = WywiadApp()
         # W przyszłości można tu przekazać istniejący stan, jeśli chcemy
         view = LiveInterviewView(app_instance)
@@ -2646,6 +2788,7 @@ pause
     # Serve static assets (JS/CSS)
     app.add_static_files('/assets', 'assets')
 
+    startup_profile.mark("ui.run")
     ui.run(
         title='Wizyta v2',
         port=port,
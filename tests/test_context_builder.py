@@ -0,0 +1,46 @@
+"""Budżet kontekstu Live przy nieudanym podsumowaniu."""
+
+import asyncio
+
+from app_ui.live.context_builder import ConversationContextBuilder
+from app_ui.live.live_state import LiveState
+
+
+class FailingSummarizer:
+    """Pierwsze podsumowanie się udaje, każde kolejne zwraca pusty tekst."""
+    calls = 0
+
+    async def summarize_dialogue(self, **kwargs) -> str:
+        self.calls += 1
+        return "Pacjent zgłasza ból zęba." if self.calls == 1 else ""
+
+
+def _segment(i: int) -> str:
+    return f"Segment {i:03d}: pacjent opisuje dolegliwości i lekarz dopytuje o szczegóły."
+
+
+def test_context_stays_bounded_when_summary_keeps_failing():
+    state = LiveState()
+    llm = FailingSummarizer()
+    builder = ConversationContextBuilder(state, llm_service=llm)
+
+    sizes = {call_type: [] for call_type in builder.BUDGETS}
+    for i in range(400):
+        state.validated_rope.append(_segment(i), is_validated=True)
+        builder.on_segment_finalized()
+        if builder.needs_summary():
+            asyncio.run(builder.refresh_summary())
+        for call_type in builder.BUDGETS:
+            sizes[call_type].append(len(builder.build(call_type)))
+
+    # Podsumowanie utknęło na pierwszej granicy
+    assert llm.calls > 1 and builder._summary_upto < builder._window_start()
+    segment_chars = len(_segment(0)) + 1
+    for call_type, budget in builder.BUDGETS.items():
+        limit = (budget.recent_tokens + budget.summary_tokens) * builder.CHARS_PER_TOKEN
+        limit += (builder.SUMMARY_EVERY_SEGMENTS + 1) * segment_chars + 100   # + nagłówki
+        assert max(sizes[call_type]) <= limit, call_type
+    # "script" ma krótsze okno niż "suggestions"
+    assert sizes["script"][-1] < sizes["suggestions"][-1]
+    # Najnowszy segment zawsze w oknie
+    assert _segment(399) in builder.build("script")
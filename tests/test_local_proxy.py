@@ -0,0 +1,195 @@
+"""
+Testy proxy claude.ai (tryb puli) na lokalnym serwerze udającym upstream.
+
+Mock odtwarza endpointy używane przez proxy: /chats (rozgrzewka),
+/api/organizations, tworzenie i usuwanie rozmów oraz /completion
+zwracające strumień SSE w formacie Anthropic.
+"""
+
+import json
+import socket
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+flask = pytest.importorskip("flask")
+requests = pytest.importorskip("requests")
+from werkzeug.serving import make_server
+
+from proxy.local_proxy import ClaudeAIProxyServer
+
+
+TEXT_PARTS = ["Zażółć ", "gęślą ", "jaźń"]
+ORG_ID = "org-test"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class MockUpstream:
+    """Serwer udający claude.ai - zapisuje, które rozmowy użyto i usunięto."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = []
+        self.completions = Counter()
+        self.deleted = []
+        self.app = self._build_app()
+        self.port = _free_port()
+        self.server = make_server("127.0.0.1", self.port, self.app, threaded=True)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def _build_app(self):
+        app = flask.Flask("mock_upstream")
+
+        @app.get("/chats")
+        def chats():
+            return "ok"
+
+        @app.get("/api/organizations")
+        def organizations():
+            return flask.jsonify([{"uuid": ORG_ID}])
+
+        @app.post("/api/organizations/<org>/chat_conversations")
+        def create_conversation(org):
+            with self.lock:
+                conversation_uuid = f"conv-{len(self.created) + 1}"
+                self.created.append(conversation_uuid)
+            return flask.jsonify({"uuid": conversation_uuid}), 201
+
+        @app.delete("/api/organizations/<org>/chat_conversations/<conversation_uuid>")
+        def delete_conversation(org, conversation_uuid):
+            with self.lock:
+                self.deleted.append(conversation_uuid)
+            return "", 204
+
+        @app.post("/api/organizations/<org>/chat_conversations/<conversation_uuid>/completion")
+        def completion(org, conversation_uuid):
+            with self.lock:
+                self.completions[conversation_uuid] += 1
+
+            def stream():
+                yield _sse("message_start", {
+                    "type": "message_start",
+                    "message": {"id": "msg", "type": "message", "role": "assistant", "content": [],
+                                "model": "mock", "stop_reason": None, "stop_sequence": None,
+                                "usage": {"input_tokens": 1, "output_tokens": 0}},
+                })
+                yield _sse("content_block_start", {
+                    "type": "content_block_start", "index": 0,
+                    "content_block": {"type": "text", "text": ""},
+                })
+                for part in TEXT_PARTS:
+                    time.sleep(0.05)
+                    yield _sse("content_block_delta", {
+                        "type": "content_block_delta", "index": 0,
+                        "delta": {"type": "text_delta", "text": part},
+                    })
+                yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+                yield _sse("message_delta", {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                })
+                yield _sse("message_stop", {"type": "message_stop"})
+
+            return flask.Response(stream(), content_type="text/event-stream")
+
+        return app
+
+    def start(self) -> "MockUpstream":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+
+
+@pytest.fixture
+def upstream():
+    server = MockUpstream().start()
+    yield server
+    server.stop()
+
+
+def _start_proxy(upstream: MockUpstream, pool_size: int) -> str:
+    port = _free_port()
+    proxy = ClaudeAIProxyServer("sk-ant-sid01-test", port=port, pool_size=pool_size, base_url=upstream.url)
+    assert proxy.start_server()
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                return url
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    pytest.fail("proxy did not start")
+
+
+def _ask(url: str, question: str) -> str:
+    """Jedno zapytanie /v1/messages (stream) - zwraca złożony tekst odpowiedzi."""
+    response = requests.post(
+        f"{url}/v1/messages",
+        json={"model": "mock", "max_tokens": 10, "stream": True,
+              "messages": [{"role": "user", "content": question}]},
+        stream=True,
+        timeout=10,
+    )
+    assert response.status_code == 200
+    text = ""
+    for line in response.iter_lines(decode_unicode=False):
+        if not line.startswith(b"data: ") or line == b"data: [DONE]":
+            continue
+        event = json.loads(line[len(b"data: "):])
+        if event.get("type") == "content_block_delta":
+            text += event["delta"]["text"]
+    return text
+
+
+def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+def test_pooled_requests_use_separate_conversations_and_delete_them(upstream):
+    url = _start_proxy(upstream, pool_size=2)
+
+    with ThreadPoolExecutor(4) as executor:
+        answers = list(executor.map(lambda i: _ask(url, f"pytanie {i}"), range(4)))
+
+    assert answers == ["".join(TEXT_PARTS)] * 4
+    # Każde zapytanie we własnej rozmowie
+    assert len(upstream.completions) == 4
+    assert set(upstream.completions.values()) == {1}
+    # ...usuniętej po zakończeniu odpowiedzi
+    used = set(upstream.completions)
+    assert _wait_for(lambda: used <= set(upstream.deleted))
+
+
+def test_shared_conversation_is_kept(upstream):
+    url = _start_proxy(upstream, pool_size=0)
+
+    assert _ask(url, "pierwsze") == "".join(TEXT_PARTS)
+    assert _ask(url, "drugie") == "".join(TEXT_PARTS)
+
+    assert list(upstream.completions.values()) == [2]
+    time.sleep(0.2)
+    assert upstream.deleted == []
@@ -0,0 +1,55 @@
+"""
+Eksport zbiorczy PDF w puli procesów (spawn - jak na Windows i w exe).
+"""
+
+import multiprocessing
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("reportlab")
+
+from core import pdf_generator
+from core.models import Patient, Visit
+
+
+def _visits(count: int):
+    patient = Patient(id=1, display_name="Jan K.", birth_date="1980-01-01")
+    visits = [
+        Visit(
+            patient_id=1,
+            patient_name="Jan Kowalski",
+            visit_date=datetime(2026, 1, 1 + i, 10, 0),
+            transcript="Pacjent zgłasza ból zęba 36 przy nagryzaniu.",
+            assessment="Zapalenie miazgi",
+        )
+        for i in range(count)
+    ]
+    return visits, {1: patient}
+
+
+def test_spawn_pool_export(tmp_path, monkeypatch):
+    visits, patients = _visits(pdf_generator.PDFGenerator.MIN_POOL_VISITS)
+    monkeypatch.setattr(pdf_generator.VisitRepository, "find_full", lambda self, **kwargs: visits)
+    monkeypatch.setattr(pdf_generator.PatientRepository, "get_by_ids", lambda self, ids: patients)
+
+    result = pdf_generator.PDFGenerator().export_visits(str(tmp_path / "out"), output_format="dir", workers=2)
+
+    assert not result.failed
+    assert len(result.files) == len(visits)
+    for path in result.files:
+        with open(path, "rb") as f:
+            assert f.read(5) == b"%PDF-"
+
+
+def _run_app_main() -> None:
+    import stomatolog_nicegui
+    stomatolog_nicegui.main()
+
+
+def test_app_main_returns_in_child_process():
+    # Proces puli importuje plik aplikacji - main() nie może w nim nic uruchamiać
+    process = multiprocessing.get_context("spawn").Process(target=_run_app_main)
+    process.start()
+    process.join(timeout=60)
+    assert process.exitcode == 0
@@ -0,0 +1,45 @@
+"""Testy SSETranslator na nagranym strumieniu claude.ai (proxy/bench/fixtures)."""
+
+import json
+
+from proxy.bench.replay_server import DEFAULT_FIXTURE
+from proxy.sse_translator import SSETranslator
+
+
+def _translate(data: bytes, chunk_size: int) -> bytes:
+    translator = SSETranslator()
+    frames = []
+    for i in range(0, len(data), chunk_size):
+        frames += translator.feed(data[i:i + chunk_size])
+    return b"".join(frames + translator.finish())
+
+
+def _text(stream: bytes) -> str:
+    parts = []
+    for line in stream.split(b"\n"):
+        if line.startswith(b"data: {") and b'"text_delta"' in line:
+            parts.append(json.loads(line[6:])["delta"]["text"])
+    return "".join(parts)
+
+
+def test_fixture_passes_through_in_any_chunking():
+    data = DEFAULT_FIXTURE.read_bytes()
+    # 7 B kawałki dzielą polskie znaki UTF-8 między wywołania feed()
+    for chunk_size in (7, 64, 1400, len(data)):
+        out = _translate(data, chunk_size)
+        assert _text(out) == _text(data)
+        assert b"message_limit" not in out
+        assert b'"usage": {"output_tokens": 1500}' in out
+        assert out.endswith(b"data: [DONE]\n\n")
+
+
+def test_truncated_event_is_skipped():
+    translator = SSETranslator()
+    frames = translator.feed(
+        b'event: content_block_delta\n'
+        b'data: {"type":"content_block_delta","index":0,"delta":{"type":"text_del\n\n'
+        b'event: content_block_delta\n'
+        b'data: {"type":"content_block_delta","index":0,"delta":{"type":"text_delta","text":"ok"}}\n\n'
+    )
+    assert len(frames) == 1
+    assert b'"text":"ok"' in frames[0]